@@ -1,20 +1,33 @@
+import time
+STARTUP_T0 = time.perf_counter() # 启动耗时基准的起点，需早于其他导入
+
 import sys
 import os
-from PySide6.QtWidgets import (QApplication, QMainWindow, QFileDialog, QMessageBox,
-                               QWidget, QVBoxLayout, QListWidget, QLabel, QComboBox,
-                               QLineEdit, QPushButton, QHBoxLayout, QRadioButton,
-                               QGroupBox, QTextEdit)
-from PySide6.QtCore import Qt, QThread, Signal
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtWidgets import QApplication, QMainWindow, QFileDialog, QMessageBox
+from PySide6.QtCore import QEvent, QObject, Qt, QThread, QTimer, Signal
 from PySide6.QtGui import QIntValidator, QIcon
 
 # 导入 UI 文件（假设您已经通过 pyside6-uic 生成或直接使用我提供的 ui_main_window.py）
 from ui_main_window import Ui_MainWindow
 
 # 导入自定义工具模块
-from ffmpeg_utils import FFmpegProcessor
+# 首个窗口显示前只导入界面必需的模块；规划、缓存、队列、校验、暂存等模块在首次使用时才导入
+from ffmpeg_utils import KEEP_SOURCE, LOUDNORM_TARGET, FFmpegProcessor, resolve_time_window
 from logger_utils import AppLogger
+from file_list_model import FileListModel, summarize_tracks
+from trace_utils import enable_tracing_from_env, get_tracer, trace_span
+from watchdog_utils import STALL_TIMEOUT
 import logging
-import logging
+
+# Opus 编码支持的采样率 (Hz)
+OPUS_SAMPLERATES = ("48000", "24000", "16000", "12000", "8000")
+
+# 后台探测：同时运行的 ffprobe 数量，以及结果发往主线程的批量间隔 (秒)
+PROBE_WORKERS = min(8, os.cpu_count() or 4)
+PROBE_BATCH_INTERVAL = 0.2
 
 # 工具函数：兼容PyInstaller打包和源码运行的资源路径
 
@@ -25,6 +38,55 @@ def resource_path(relative_path):
     return os.path.join(os.path.abspath(os.path.dirname(__file__)), relative_path)
 
 # --- 工作线程定义 ---
+class PlanThread(QThread):
+    """在后台探测文件并构建试运行估算，避免大量文件时界面卡住。"""
+    plan_ready = Signal(object, object) # 估算结果，以及补充后的探测结果缓存
+
+    def __init__(self, files, processing_config, track_info_cache, parent=None):
+        super().__init__(parent)
+        self.files = list(files)
+        self.config = processing_config
+        self.track_info_cache = dict(track_info_cache)
+
+    def run(self):
+        from planner_utils import build_batch_plan
+        processor = FFmpegProcessor(log_callback=None)
+        with trace_span("试运行估算", "plan", files=len(self.files)):
+            plan = build_batch_plan(self.files, self.config, processor, track_info_cache=self.track_info_cache)
+        self.plan_ready.emit(plan, self.track_info_cache)
+
+
+class ProbeThread(QThread):
+    """
+    在后台并发探测文件音轨，避免数万个文件时界面卡住。
+    结果按批发给主线程，由主线程写入探测缓存并更新文件列表；请求中断后不再启动新的探测。
+    """
+    probed = Signal(object) # [(文件路径, 音轨信息，探测失败时为 None), ...]
+
+    def __init__(self, files, parent=None):
+        super().__init__(parent)
+        self.files = list(files)
+
+    def run(self):
+        from concurrent.futures import as_completed
+        # 探测失败在文件列表中显示为“探测失败”，这里不逐个输出日志
+        processor = FFmpegProcessor(log_callback=lambda message, level=logging.INFO: None)
+        batch, last_emit = [], time.monotonic()
+        with trace_span("后台探测", "probe", files=len(self.files)), \
+                ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix="probe") as executor:
+            futures = {executor.submit(processor.probe_audio_tracks, path): path for path in self.files}
+            for future in as_completed(futures):
+                if self.isInterruptionRequested():
+                    executor.shutdown(cancel_futures=True)
+                    return
+                batch.append((futures[future], future.result()))
+                if time.monotonic() - last_emit >= PROBE_BATCH_INTERVAL:
+                    self.probed.emit(batch)
+                    batch, last_emit = [], time.monotonic()
+        if batch:
+            self.probed.emit(batch)
+
+
 class ProcessingThread(QThread):
     """
     独立线程，用于执行耗时的文件处理操作，避免GUI卡顿。
@@ -34,118 +96,210 @@ class ProcessingThread(QThread):
     processing_started = Signal(str) # 发送当前处理的文件名
     processing_finished = Signal(str, bool) # 发送文件名和处理结果 (成功/失败)
     new_log_message = Signal(str, int) # 发送新的日志消息和级别，由MainWindow的logger接收
+    file_state_changed = Signal(str, dict) # 发送文件路径和状态字段，由文件列表模型合并显示
+    plan_rejected = Signal() # 试运行估算发现输出卷空间不足，未处理任何文件
 
-    def __init__(self, files_to_process, processing_config, log_callback, parent=None):
+    def __init__(self, files_to_process, processing_config, log_callback, parent=None, track_info_cache=None):
         super().__init__(parent)
+        from cache_utils import ResultCache
+        from concurrency_utils import ConcurrencyController
+        from loudness_utils import LoudnessAnalyzer, LoudnessCache
+        from planner_utils import ThroughputStats
+        from staging_utils import StagingCache
+        from verify_utils import OutputVerifier
         self.files_to_process = files_to_process
         self.config = processing_config
-        self.ffmpeg_processor = FFmpegProcessor(log_callback=None)
+        # 文件路径 -> 探测结果；界面已探测过的文件和试运行估算时探测的文件在处理时不再探测
+        self.track_info_cache = dict(track_info_cache or {})
+        stall_timeout = self.config.get('stall_timeout', STALL_TIMEOUT)
+        self.ffmpeg_processor = FFmpegProcessor(log_callback=None, stall_timeout=stall_timeout)
+        self.throughput_stats = ThroughputStats() # 记录实测吞吐量，供后续试运行估算耗时
+        # 内容寻址结果缓存：不同路径下的相同文件直接复用已有输出
+        self.result_cache = ResultCache() if self.config.get('result_cache') else None
+        # 源文件位于网络存储时先顺序复制到本地，并预取后续文件
+        self.staging = StagingCache(log=self._thread_log) if self.config.get('stage_inputs') else None
+        # 响度标准化：分析结果按文件指纹缓存，下一条音轨的分析与当前音轨的编码重叠
+        self.loudness = None
+        if self.config.get('loudnorm'):
+            self.loudness = LoudnessAnalyzer(FFmpegProcessor(log_callback=None, stall_timeout=stall_timeout), cache=LoudnessCache(),
+                                             target=self.config['loudnorm'], log=self._thread_log)
+        # 处理后校验在独立线程池中进行，与后续文件的编码重叠
+        self.verifier = None
+        if self.config.get('verify_outputs'):
+            self.verifier = OutputVerifier(FFmpegProcessor(log_callback=None, stall_timeout=stall_timeout), log=self._thread_log)
+        # 多个文件同时处理：固定并发数，或按系统负载自动调节；为空时逐个处理
+        self.concurrency = None
+        max_jobs = self.config.get('max_jobs') or 1
+        if max_jobs > 1:
+            self.concurrency = ConcurrencyController(max_jobs=max_jobs, auto=self.config.get('auto_concurrency', False),
+                                                     log=self._thread_log)
 
     def _thread_log(self, message, level=logging.INFO):
         self.new_log_message.emit(message, level)
 
     def run(self):
+        from planner_utils import summary_log_level
+        from verify_utils import format_verify_summary
+        threading.current_thread().name = "ProcessingThread" # 时间线追踪中的泳道名
         self._thread_log("处理线程启动。", level=logging.INFO)
-        for file_path in self.files_to_process:
-            self.processing_started.emit(f"开始处理: {os.path.basename(file_path)}")
-            self._thread_log(f"[INFO] 开始处理文件: {file_path}")
-            success = self.process_single_file(file_path)
-            self.processing_finished.emit(os.path.basename(file_path), success)
-            if not success:
-                self._thread_log(f"[ERROR] 文件处理失败: {file_path}")
-            else:
-                self._thread_log(f"[INFO] 文件处理完成: {file_path}")
-        self._thread_log("[INFO] 所有文件处理完毕。")
+        space_ok = self.check_output_space()
+        if not space_ok:
+            self._thread_log("[ERROR] 输出卷剩余空间不足，已取消处理。", logging.ERROR)
+            self.plan_rejected.emit()
+        elif self.concurrency:
+            self.concurrency.start()
+            with ThreadPoolExecutor(max_workers=self.concurrency.max_jobs, thread_name_prefix="job") as pool:
+                for i in range(len(self.files_to_process)):
+                    # 有空闲名额时才分派下一个文件，文件按列表顺序开始；等待时间是调度的主要空闲，记入时间线
+                    with trace_span("等待并发名额", "queue_wait", file=os.path.basename(self.files_to_process[i]),
+                                    limit=self.concurrency.limit):
+                        self.concurrency.acquire()
+                    pool.submit(self.process_file_at, i).add_done_callback(lambda _: self.concurrency.release())
+            self.concurrency.stop()
+        else:
+            for i in range(len(self.files_to_process)):
+                self.process_file_at(i)
+        self.throughput_stats.save()
+        if self.staging:
+            self.staging.close()
+        if self.loudness:
+            self.loudness.close()
+        if self.verifier:
+            self._thread_log("[INFO] 等待输出校验完成...")
+            with trace_span("等待校验完成", "queue_wait"):
+                summary = self.verifier.wait()
+            for line in format_verify_summary(summary):
+                self._thread_log(line, summary_log_level(line))
+        if space_ok:
+            self._thread_log("[INFO] 所有文件处理完毕。")
         self._thread_log("[INFO] 处理线程结束。")
 
+    def check_output_space(self):
+        """
+        试运行估算输出大小，在处理线程中进行以免探测大量文件时界面卡住。
+        探测结果存入 track_info_cache，处理时复用。
+        Returns:
+            bool: 输出卷空间是否充足；不足时已记录估算详情。
+        """
+        from planner_utils import build_batch_plan, format_plan_summary, summary_log_level
+        with trace_span("试运行估算", "plan", files=len(self.files_to_process)):
+            plan = build_batch_plan(self.files_to_process, self.config, self.ffmpeg_processor,
+                                    stats=self.throughput_stats, track_info_cache=self.track_info_cache)
+        if not plan['ok']:
+            for line in format_plan_summary(plan):
+                self._thread_log(line, summary_log_level(line))
+        return plan['ok']
+
+    def process_file_at(self, i):
+        """处理文件列表中的第 i 个文件，并发处理时在线程池中调用。"""
+        from staging_utils import PREFETCH_AHEAD
+        file_path = self.files_to_process[i]
+        if self.staging:
+            self.staging.prefetch(self.files_to_process[i + 1:i + 1 + PREFETCH_AHEAD])
+        self.processing_started.emit(f"开始处理: {os.path.basename(file_path)}")
+        self._thread_log(f"[INFO] 开始处理文件: {file_path}")
+        self.file_state_changed.emit(file_path, {'status': 'processing'})
+        with trace_span(os.path.basename(file_path), "file"):
+            success = self.process_single_file(file_path)
+        self.file_state_changed.emit(file_path, {'status': 'done' if success else 'failed'})
+        self.processing_finished.emit(os.path.basename(file_path), success)
+        if not success:
+            self._thread_log(f"[ERROR] 文件处理失败: {file_path}")
+        else:
+            self._thread_log(f"[INFO] 文件处理完成: {file_path}")
+
     def process_single_file(self, file_path):
+        from cache_utils import file_fingerprint
+        from planner_utils import build_file_jobs, run_track_job
+        from staging_utils import stage_job_inputs
+        input_path = file_path
         try:
-            tracks_info = self.ffmpeg_processor.probe_audio_tracks(file_path)
+            if self.staging:
+                with trace_span("暂存输入", "staging", file=os.path.basename(file_path)):
+                    input_path = self.staging.stage(file_path)
+            if file_path in self.track_info_cache:
+                tracks_info = self.track_info_cache[file_path]
+                error = '未检测到音频轨道'
+            else:
+                tracks_info = self.ffmpeg_processor.probe_audio_tracks(input_path)
+                error = self.ffmpeg_processor.pop_failure_reason() or '未检测到音频轨道'
             if not tracks_info:
                 self._thread_log(f"[WARNING] 未检测到 {os.path.basename(file_path)} 中的任何音频轨道。跳过。", logging.WARNING)
-                self.new_log_message.emit(f"❌ 失败: 文件 '{os.path.basename(file_path)}' (音轨 N/A) - 错误: '未检测到音频轨道' - 输出尝试: 'N/A'", logging.ERROR)
+                self.new_log_message.emit(f"❌ 失败: 文件 '{os.path.basename(file_path)}' (音轨 N/A) - 错误: '{error}' - 输出尝试: 'N/A'", logging.ERROR)
                 return False
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
-            output_dir = os.path.join(os.path.dirname(file_path), "output")
-            os.makedirs(output_dir, exist_ok=True)
+            jobs = build_file_jobs(file_path, tracks_info, self.config, self.ffmpeg_processor.get_common_audio_extension)
+            stage_job_inputs(jobs, file_path, input_path) # 输出仍写到源文件旁的 output 目录
+            fingerprint = file_fingerprint(input_path) if self.result_cache or self.loudness else None
+            for job in jobs:
+                job['fingerprint'] = fingerprint
             file_processed_successfully = True
-            audio_tracks = [t for t in tracks_info if t.get('codec_type') == 'audio']
-            for i, track_info in enumerate(audio_tracks):
-                track_index = track_info['index']
-                audio_track_index = i
-                codec_name = track_info['codec_name']
-                track_language = track_info.get('tags', {}).get('language', '未知')
-                self._thread_log(f"[INFO] 正在处理 {os.path.basename(file_path)} 的音轨 {track_index} (音频流 #{audio_track_index}, 编码: {codec_name}, 语言: {track_language})...")
-                current_output_name_prefix = os.path.join(output_dir, f"{base_name}-Track{track_index}")
-                if self.config['mode'] == 'direct_extract':
-                    if codec_name.lower() == 'aac':
-                        output_file = f"{current_output_name_prefix}.m4a"
-                        self._thread_log(f"[DEBUG] 尝试直接提取 AAC 音轨: {file_path} -> {output_file}")
-                        cmd_success = self.ffmpeg_processor.extract_aac_track(
-                            input_path=file_path,
-                            output_path=output_file,
-                            track_index=audio_track_index
-                        )
-                        if cmd_success:
-                            self.new_log_message.emit(f"✅ 成功: 文件 '{os.path.basename(file_path)}' (音轨 {track_index}) - 操作: '直接提取 AAC' - 输出: '{output_file}'", logging.INFO)
-                        else:
-                            self.new_log_message.emit(f"❌ 失败: 文件 '{os.path.basename(file_path)}' (音轨 {track_index}) - 错误: '直接提取 AAC 失败' - 输出尝试: '{output_file}'", logging.ERROR)
-                            file_processed_successfully = False
-                    else:
-                        raw_ext = self.ffmpeg_processor.get_common_audio_extension(codec_name)
-                        raw_output_file = f"{current_output_name_prefix}.{raw_ext}"
-                        self._thread_log(f"[INFO] 音轨 {track_index} ({codec_name}) 非 AAC，先无损提取到 {raw_output_file}")
-                        cmd_success_raw = self.ffmpeg_processor.extract_raw_audio(
-                            input_path=file_path,
-                            output_path=raw_output_file,
-                            track_index=audio_track_index,
-                            codec_name=codec_name
-                        )
-                        if not cmd_success_raw:
-                            self._thread_log(f"[ERROR] 无损提取原始音频 {raw_output_file} 失败。", logging.ERROR)
-                            self.new_log_message.emit(f"❌ 失败: 文件 '{os.path.basename(file_path)}' (音轨 {track_index}) - 错误: '无损提取原始音频失败' - 输出尝试: '{raw_output_file}'", logging.ERROR)
-                            file_processed_successfully = False
-                            continue
-                        self.new_log_message.emit(f"✅ 成功: 文件 '{os.path.basename(file_path)}' (音轨 {track_index}) - 操作: '无损提取 {codec_name}' - 输出: '{raw_output_file}'", logging.INFO)
-                        output_file_encoded = f"{current_output_name_prefix}.{self.config['output_format']}"
-                        self._thread_log(f"[INFO] 对 {raw_output_file} 重新编码为 {self.config['output_codec']}...")
-                        cmd_success_encode = self.ffmpeg_processor.recode_audio(
-                            input_path=raw_output_file,
-                            output_path=output_file_encoded,
-                            codec=self.config['output_codec'],
-                            bitrate=self.config.get('bitrate'),
-                            samplerate=self.config.get('samplerate'),
-                            channels=self.config.get('channels'),
-                            quality=self.config.get('quality')
-                        )
-                        if cmd_success_encode:
-                            self.new_log_message.emit(f"✅ 成功: 文件 '{os.path.basename(file_path)}' (音轨 {track_index}) - 操作: '重新编码为 {self.config['output_codec']}' - 输出: '{output_file_encoded}'", logging.INFO)
-                        else:
-                            self.new_log_message.emit(f"❌ 失败: 文件 '{os.path.basename(file_path)}' (音轨 {track_index}) - 错误: '重新编码为 {self.config['output_codec']} 失败' - 输出尝试: '{output_file_encoded}'", logging.ERROR)
-                            file_processed_successfully = False
-                elif self.config['mode'] == 'recode':
-                    output_file = f"{current_output_name_prefix}.{self.config['output_format']}"
-                    self._thread_log(f"[INFO] 重新编码音轨 {track_index} 为 {self.config['output_codec']}...")
-                    cmd_success = self.ffmpeg_processor.recode_audio(
-                        input_path=file_path,
-                        output_path=output_file,
-                        track_index=audio_track_index,
-                        codec=self.config['output_codec'],
-                        bitrate=self.config.get('bitrate'),
-                        samplerate=self.config.get('samplerate'),
-                        channels=self.config.get('channels'),
-                        quality=self.config.get('quality')
-                    )
-                    if cmd_success:
-                        self.new_log_message.emit(f"✅ 成功: 文件 '{os.path.basename(file_path)}' (音轨 {track_index}) - 操作: '重新编码为 {self.config['output_codec']}' - 输出: '{output_file}'", logging.INFO)
-                    else:
-                        self.new_log_message.emit(f"❌ 失败: 文件 '{os.path.basename(file_path)}' (音轨 {track_index}) - 错误: '重新编码为 {self.config['output_codec']} 失败' - 输出尝试: '{output_file}'", logging.ERROR)
-                        file_processed_successfully = False
+            self.file_state_changed.emit(file_path, {'tracks': summarize_tracks(tracks_info), 'progress': (0, len(jobs))})
+            for done_count, job in enumerate(jobs, 1):
+                if self.loudness and done_count < len(jobs):
+                    self.loudness.prefetch(jobs[done_count]) # 下一条音轨
+                os.makedirs(job['output_dir'], exist_ok=True)
+                self._thread_log(f"[INFO] 正在处理 {os.path.basename(file_path)} 的音轨 {job['track_index']} (音频流 #{job['audio_track_index']}, 编码: {job['codec_name']}, 语言: {job['language']})...")
+                started_at = time.monotonic()
+                job_succeeded = run_track_job(self.ffmpeg_processor, job, self.config, self._thread_log,
+                                              result_cache=self.result_cache, stats=self.throughput_stats,
+                                              verifier=self.verifier, loudness=self.loudness)
+                if not job_succeeded:
+                    file_processed_successfully = False
+                elif self.concurrency:
+                    # 失败/被终止的任务耗时不代表正常吞吐，不计入自动并发的评估
+                    self.concurrency.record_job(job.get('duration'), time.monotonic() - started_at)
+                self.file_state_changed.emit(file_path, {'progress': (done_count, len(jobs))})
             return file_processed_successfully
         except Exception as e:
             self._thread_log(f"[CRITICAL ERROR] 处理 {os.path.basename(file_path)} 时发生异常: {e}", logging.ERROR)
             self.new_log_message.emit(f"❌ 失败: 文件 '{os.path.basename(file_path)}' (音轨 N/A) - 错误: '程序异常: {e}' - 输出尝试: 'N/A'", logging.ERROR)
             return False
+        finally:
+            if self.staging:
+                self.staging.release(file_path)
+
+class FFmpegCheckThread(QThread):
+    """在后台探测 FFmpeg 能力，结果写入进程级能力缓存。"""
+    checked = Signal(object) # FFmpeg 版本字符串，不可用时为 None
+
+    def run(self):
+        # 详细错误在主线程再次检查时记录，这里不输出日志
+        processor = FFmpegProcessor(log_callback=lambda message, level=logging.INFO: None)
+        capabilities = processor.get_capabilities()
+        self.checked.emit(capabilities['version'] if capabilities else None)
+
+
+class StartupBenchmark(QObject):
+    """
+    启动耗时基准：记录各阶段时间点，主窗口首次绘制后输出耗时并退出。
+    用法: python app.py --benchmark-startup
+    """
+    def __init__(self):
+        super().__init__()
+        self.marks = [("模块导入", time.perf_counter())]
+        self.window = None
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def watch(self, window):
+        self.window = window
+        window.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if obj is self.window and event.type() == QEvent.Type.Paint:
+            self.window.removeEventFilter(self)
+            self.mark("首次绘制")
+            QTimer.singleShot(0, self.report)
+        return False
+
+    def report(self):
+        previous = STARTUP_T0
+        for name, moment in self.marks:
+            print(f"{name}: {(moment - previous) * 1000:.1f} ms")
+            previous = moment
+        print(f"time-to-first-window: {(self.marks[-1][1] - STARTUP_T0) * 1000:.1f} ms (自 app.py 开始执行计)")
+        QApplication.instance().quit()
 
 # --- 主窗口类 ---
 class MainWindow(QMainWindow):
@@ -172,23 +326,56 @@ class MainWindow(QMainWindow):
         author_label.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
         self.statusBar().addPermanentWidget(author_label)
 
-        self.logger = AppLogger("AppLogger", log_to_file=True, gui_log_display=self.ui.log_display_text_edit)
-        # 修正ffmpeg路径传递
-        ffmpeg_dir = resource_path("ffmpeg")
-        self.ffmpeg_processor = FFmpegProcessor(log_callback=self.logger.log_gui_message)
-        self.ffmpeg_processor.ffmpeg_dir = ffmpeg_dir
+        # 日志器和 FFmpeg 处理器在首次使用时才创建，不占用首个窗口显示前的时间
+        self._logger = None
+        self._ffmpeg_processor = None
+        self.ffmpeg_check_thread = None
         self.selected_files = []
         self.processing_thread = None
         self.track_info_cache = {} # 用于缓存文件音轨信息
+        self.plan_thread = None
+        self.probe_thread = None
+        # 文件列表使用模型/视图，状态更新按批合并，支持数万个文件
+        self.file_list_model = FileListModel(self)
+        self.ui.file_list_view.setModel(self.file_list_model)
 
         self.setup_ui_connections()
         self.setup_encoding_parameters()
-        self.update_ui_state()
 
         # 启用拖拽文件到主窗口
         self.setAcceptDrops(True)
 
+        # 其余初始化放到窗口显示之后的事件循环中进行
+        QTimer.singleShot(0, self.finish_startup)
+
+    @property
+    def logger(self):
+        if self._logger is None:
+            self._logger = AppLogger("AppLogger", log_to_file=True, gui_log_display=self.ui.log_display_text_edit)
+        return self._logger
+
+    @property
+    def ffmpeg_processor(self):
+        if self._ffmpeg_processor is None:
+            self._ffmpeg_processor = FFmpegProcessor(log_callback=self.logger.log_gui_message)
+            # 修正ffmpeg路径传递
+            self._ffmpeg_processor.ffmpeg_dir = resource_path("ffmpeg")
+        return self._ffmpeg_processor
+
+    def finish_startup(self):
+        """窗口显示后执行的初始化：输出启动日志，并在后台验证 FFmpeg。"""
         self.logger.log_gui_message("[INFO] 应用程序启动。请选择媒体文件或直接拖入。")
+        self.update_ui_state()
+        self.ffmpeg_check_thread = FFmpegCheckThread(self)
+        self.ffmpeg_check_thread.checked.connect(self.on_ffmpeg_checked)
+        self.ffmpeg_check_thread.start()
+
+    def on_ffmpeg_checked(self, version):
+        """后台 FFmpeg 验证完成。成功时结果已进入能力缓存，之后的检查不再启动子进程。"""
+        if version is None:
+            self.logger.log_gui_message("[WARNING] FFmpeg/ffprobe 未找到或无法运行，开始处理时将再次检查。", logging.WARNING)
+        else:
+            self.logger.log_gui_message(f"[INFO] FFmpeg 已就绪: {version}")
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
@@ -206,21 +393,24 @@ class MainWindow(QMainWindow):
             # 合并去重
             all_files = list(dict.fromkeys(self.selected_files + files))
             self.selected_files = all_files
-            self.track_info_cache.clear()
-            self.ui.file_list_widget.clear()
-            for f in self.selected_files:
-                self.ui.file_list_widget.addItem(os.path.basename(f))
+            self.file_list_model.set_files(self.selected_files)
+            # 已探测的文件保留结果，只探测新加入的文件
+            for file_path, tracks_info in self.track_info_cache.items():
+                self.update_probe_state(file_path, tracks_info)
             self.logger.log_gui_message(f"[INFO] 拖入 {len(files)} 个文件，当前共 {len(self.selected_files)} 个文件。")
-            self.update_ui_state(force_probe=True)
+            self.start_probe()
+            self.update_ui_state()
 
     def setup_ui_connections(self):
         """连接UI控件的信号到对应的槽函数。"""
         self.ui.select_files_button.clicked.connect(self.select_files)
         self.ui.start_processing_button.clicked.connect(self.start_processing)
+        self.ui.plan_button.clicked.connect(self.show_plan)
+        self.ui.publish_queue_button.clicked.connect(self.publish_to_queue)
         
         # 模式选择单选按钮连接到更新UI状态的槽
-        self.ui.direct_extract_radio.toggled.connect(self.update_ui_state)
-        self.ui.recode_radio.toggled.connect(self.update_ui_state)
+        self.ui.direct_extract_radio.toggled.connect(self.on_mode_toggled)
+        self.ui.recode_radio.toggled.connect(self.on_mode_toggled)
 
         # 编码格式选择下拉框连接到更新编码参数提示的槽
         self.ui.codec_combo_box.currentIndexChanged.connect(self.update_codec_parameters)
@@ -231,6 +421,8 @@ class MainWindow(QMainWindow):
         from PySide6.QtGui import QDoubleValidator
         self.ui.samplerate_line_edit.setValidator(QDoubleValidator(1.0, 192.0, 2))
         self.ui.channels_line_edit.setValidator(QIntValidator(1, 8)) # 例如，最多8声道
+        self.ui.max_jobs_line_edit.setValidator(QIntValidator(1, 64))
+        self.ui.stall_timeout_line_edit.setValidator(QIntValidator(0, 86400))
         # 质量参数通常也是数字，但范围因编码器而异，这里也用IntValidator
         self.ui.quality_line_edit.setValidator(QIntValidator(0, 100)) # 质量范围，根据实际编码器调整
 
@@ -262,8 +454,8 @@ class MainWindow(QMainWindow):
                 break
         # 创建采样率下拉框
         self.samplerate_combo_box = QComboBox(self.ui.encoding_params_group_box)
-        self.samplerate_combo_box.addItems(["48", "24", "16", "12", "8"])
-        self.samplerate_combo_box.setCurrentText("48")
+        self.samplerate_combo_box.addItems(["保持源", "48", "24", "16", "12", "8"])
+        self.samplerate_combo_box.setCurrentText("保持源")
         self.samplerate_combo_box.setVisible(False)
         self.samplerate_combo_box.setFixedWidth(70)
         # 插入到采样率输入框右侧
@@ -282,9 +474,7 @@ class MainWindow(QMainWindow):
         else:
             # 如果没找到，直接加到主布局
             self.ui.formLayout_encoding_params.addWidget(self.samplerate_combo_box)
-        # 默认采样率 44.1kHz，声道2
-        self.ui.samplerate_line_edit.setText("44.1")
-        self.ui.channels_line_edit.setText("2")
+        # 采样率和声道默认留空，即保持源音轨的参数，避免无谓的重采样和混音
         self.update_codec_parameters() # 初始化参数显示
 
     def update_codec_parameters(self):
@@ -295,15 +485,15 @@ class MainWindow(QMainWindow):
             self.ui.bitrate_line_edit.setPlaceholderText("默认: 256k(ABR)")
             if hasattr(self, 'samplerate_combo_box'):
                 self.samplerate_combo_box.setVisible(True)
-                self.samplerate_combo_box.setToolTip("Opus编码仅支持采样率: 48, 24, 16, 12, 8 kHz")
-                self.samplerate_combo_box.setCurrentText("48")
+                self.samplerate_combo_box.setToolTip("Opus编码仅支持采样率: 48, 24, 16, 12, 8 kHz；保持源时不支持的源采样率转为 48 kHz 等最接近的支持值")
+                self.samplerate_combo_box.setCurrentText("保持源")
             self.ui.samplerate_line_edit.setVisible(False)
         else:
             self.ui.bitrate_line_edit.setPlaceholderText("默认:aac 256k  mp3 320k (ABR)" if selected_codec in ["aac", "mp3"] else "")
             if hasattr(self, 'samplerate_combo_box'):
                 self.samplerate_combo_box.setVisible(False)
             self.ui.samplerate_line_edit.setVisible(True)
-            self.ui.samplerate_line_edit.setPlaceholderText("采样率 (kHz)，如44.1")
+            self.ui.samplerate_line_edit.setPlaceholderText("留空保持源采样率，如44.1 (kHz)")
             self.ui.samplerate_line_edit.setToolTip("")
         if selected_codec in ["aac", "mp3", "opus"]:
             self.ui.quality_label.setVisible(False)
@@ -315,25 +505,29 @@ class MainWindow(QMainWindow):
             self.ui.quality_line_edit.setVisible(True)
             self.ui.quality_line_edit.setPlaceholderText("0-8 (8最高压缩)")
             self.ui.quality_line_edit.setText("5")
-            self.ui.samplerate_line_edit.setPlaceholderText("采样率 (kHz)，如44.1")
+            self.ui.samplerate_line_edit.setPlaceholderText("留空保持源采样率，如44.1 (kHz)")
             self.ui.samplerate_line_edit.setToolTip("")
         else:
             self.ui.quality_label.setVisible(True)
             self.ui.quality_label.setText("质量:")
             self.ui.quality_line_edit.setVisible(True)
             self.ui.quality_line_edit.setPlaceholderText("")
-            self.ui.samplerate_line_edit.setPlaceholderText("采样率 (kHz)，如44.1")
+            self.ui.samplerate_line_edit.setPlaceholderText("留空保持源采样率，如44.1 (kHz)")
             self.ui.samplerate_line_edit.setToolTip("")
-        self.ui.channels_line_edit.setPlaceholderText("声道数，常用2")
+        self.ui.channels_line_edit.setPlaceholderText("留空保持源声道数，如2")
         # 清空输入框，避免混淆
         self.ui.quality_line_edit.clear()
         self.ui.bitrate_line_edit.clear()
 
-    def update_ui_state(self, force_probe=False):
+    def on_mode_toggled(self, checked):
+        """切换模式时两个单选按钮各触发一次，只响应被选中的一个。"""
+        if checked:
+            self.update_ui_state()
+
+    def update_ui_state(self):
         """
         根据当前选择的处理模式和文件分析结果，更新编码参数区域的可见性。
-        Args:
-            force_probe (bool): 是否强制重新探测文件信息，忽略缓存。
+        探测在后台进行 (见 start_probe)，探测完成后会再次调用本方法。
         """
         is_recode_mode = self.ui.recode_radio.isChecked()
         
@@ -343,20 +537,13 @@ class MainWindow(QMainWindow):
         else: # 直接提取模式
             self.ui.encoding_params_group_box.setVisible(False)
             if self.selected_files:
-                needs_encoding = False
-                for file_path in self.selected_files:
-                    if force_probe or file_path not in self.track_info_cache:
-                        self.logger.log_gui_message(f"[INFO] 正在探测 {os.path.basename(file_path)}...")
-                        tracks_info = self.ffmpeg_processor.probe_audio_tracks(file_path)
-                        self.track_info_cache[file_path] = tracks_info
-                    else:
-                        tracks_info = self.track_info_cache[file_path]
-
-                    if tracks_info:
-                        if any(t['codec_name'].lower() != 'aac' for t in tracks_info):
-                            needs_encoding = True
-                            break
-                
+                if self.probe_thread and self.probe_thread.isRunning():
+                    self.logger.log_gui_message("[INFO] 正在后台探测文件，完成后判断是否需要设置编码参数。")
+                    return
+                needs_encoding = any(
+                    tracks_info and any(t['codec_name'].lower() != 'aac' for t in tracks_info)
+                    for tracks_info in (self.track_info_cache.get(path) for path in self.selected_files)
+                )
                 if needs_encoding:
                     self.ui.encoding_params_group_box.setVisible(True)
                     self.logger.log_gui_message("[INFO] 在 '直接提取' 模式下，检测到非AAC音频，请设置编码参数。")
@@ -365,6 +552,56 @@ class MainWindow(QMainWindow):
             else:
                 self.logger.log_gui_message("[INFO] 请选择文件以开始。")
 
+    def start_probe(self):
+        """在后台探测尚未探测的文件；正在进行的探测 (针对旧的文件列表) 会被中断，其结果不再使用。"""
+        if self.probe_thread and self.probe_thread.isRunning():
+            self.probe_thread.requestInterruption()
+        files = [path for path in self.selected_files if path not in self.track_info_cache]
+        if not files:
+            return
+        self.logger.log_gui_message(f"[INFO] 正在后台探测 {len(files)} 个文件...")
+        for path in files:
+            self.file_list_model.update_file(path, {'status': 'probing'})
+        thread = ProbeThread(files, self)
+        thread.probed.connect(self.on_files_probed)
+        thread.finished.connect(self.on_probe_finished)
+        thread.finished.connect(thread.deleteLater)
+        self.probe_thread = thread
+        thread.start()
+
+    def on_files_probed(self, results):
+        """一批探测结果：写入缓存并更新文件列表。已被新探测取代的线程的结果直接丢弃。"""
+        if self.sender() is not self.probe_thread:
+            return
+        for file_path, tracks_info in results:
+            self.track_info_cache[file_path] = tracks_info
+            self.update_probe_state(file_path, tracks_info)
+
+    def on_probe_finished(self):
+        if self.sender() is not self.probe_thread:
+            return
+        self.probe_thread = None
+        failed = sum(1 for path in self.selected_files if self.track_info_cache.get(path) is None)
+        if failed:
+            self.logger.log_gui_message(f"[WARNING] 探测完成，{failed} 个文件探测失败。", logging.WARNING)
+        else:
+            self.logger.log_gui_message(f"[INFO] 探测完成，共 {len(self.selected_files)} 个文件。")
+        self.update_ui_state()
+
+    def update_probe_state(self, file_path, tracks_info):
+        """在文件列表中显示探测结果。"""
+        if tracks_info is None:
+            self.file_list_model.update_file(file_path, {'status': 'probe_failed'})
+        else:
+            self.file_list_model.update_file(file_path, {'status': 'probed', 'tracks': summarize_tracks(tracks_info)})
+
+    def batch_needs_encoding(self):
+        """根据已缓存的音轨信息判断'直接提取'模式下是否有非AAC音轨需要编码。未探测的文件按需要编码处理。"""
+        for file_path in self.selected_files:
+            tracks_info = self.track_info_cache.get(file_path)
+            if tracks_info is None or any(t['codec_name'].lower() != 'aac' for t in tracks_info):
+                return True
+        return False
 
     def select_files(self):
         """打开文件对话框，允许用户选择多个视频/音频文件。"""
@@ -376,33 +613,30 @@ class MainWindow(QMainWindow):
         if file_dialog.exec():
             self.selected_files = file_dialog.selectedFiles()
             self.track_info_cache.clear() # 清空缓存
-            self.ui.file_list_widget.clear() # 清空文件列表显示
-            for f in self.selected_files:
-                self.ui.file_list_widget.addItem(os.path.basename(f)) # 只显示文件名
-            
-            self.logger.log_gui_message(f"[INFO] 选中 {len(self.selected_files)} 个文件。")
-            self.update_ui_state(force_probe=True) # 强制重新探测
+            self.file_list_model.set_files(self.selected_files) # 列表只显示文件名和状态
 
-    def start_processing(self):
-        """开始处理按钮的槽函数，收集参数并启动处理线程。"""
-        if not self.selected_files:
-            QMessageBox.warning(self, "警告", "请先选择要处理的文件。")
-            return
-        # 防止重复点击，如果线程已在运行
-        if self.processing_thread and self.processing_thread.isRunning():
-            QMessageBox.warning(self, "警告", "已有任务正在运行，请等待其完成。")
-            return
-        # 检查 FFmpeg 是否可用
-        if not self.ffmpeg_processor.check_ffmpeg_available():
-            QMessageBox.critical(self, "错误", "FFmpeg/ffprobe 可执行文件未找到或无法运行。请确保 'ffmpeg' 文件夹存在并包含正确的二进制文件。")
-            self.logger.log_gui_message("[ERROR] FFmpeg/ffprobe 未找到或无法运行。")
-            return
+            self.logger.log_gui_message(f"[INFO] 选中 {len(self.selected_files)} 个文件。")
+            self.start_probe() # 缓存已清空，重新探测全部文件
+            self.update_ui_state()
+
+    def collect_max_jobs(self):
+        """同时处理的文件数：留空时固定为 1，自动调节时以 CPU 核数为上限。"""
+        from concurrency_utils import DEFAULT_MAX_JOBS
+        text = self.ui.max_jobs_line_edit.text().strip()
+        if text:
+            return max(1, int(text))
+        return DEFAULT_MAX_JOBS if self.ui.auto_concurrency_check_box.isChecked() else 1
+
+    def collect_processing_config(self):
+        """从界面收集处理模式和编码参数，返回处理配置字典。"""
+        from planner_utils import encode_profiles
         # 收集用户设置的编码参数
-        # 采集并修正采样率（kHz转Hz），声道默认2
+        # 采集并修正采样率（kHz转Hz）；采样率/声道留空时保持源参数，处理时按探测结果解析
         selected_codec = self.ui.codec_combo_box.currentText()
         # --- 采样率 ---
         if selected_codec == "opus":
-            samplerate = str(int(self.samplerate_combo_box.currentText()) * 1000)
+            opus_samplerate = self.samplerate_combo_box.currentText()
+            samplerate = KEEP_SOURCE if opus_samplerate == "保持源" else str(int(opus_samplerate) * 1000)
         else:
             raw_samplerate = self.ui.samplerate_line_edit.text().strip()
             if raw_samplerate:
@@ -414,45 +648,172 @@ class MainWindow(QMainWindow):
                 except Exception:
                     samplerate = None
             else:
-                samplerate = "44100"
+                samplerate = KEEP_SOURCE
         raw_channels = self.ui.channels_line_edit.text().strip()
-        channels = raw_channels if raw_channels else "2"
+        channels = raw_channels if raw_channels else KEEP_SOURCE
         # --- 码率 ---
         bitrate = self.ui.bitrate_line_edit.text().strip()
         if not bitrate:
-            if selected_codec in ["aac", "opus"]:
-                bitrate = "256"
-            elif selected_codec == "mp3":
-                bitrate = "320"
+            bitrate = self.default_bitrate(selected_codec)
         # 只为aac/mp3传递bitrate，不传quality
         quality = None
         if selected_codec not in ["aac", "mp3"]:
             quality = self.ui.quality_line_edit.text().strip() if self.ui.quality_line_edit.text().strip() else None
         processing_config = {
             'mode': 'direct_extract' if self.ui.direct_extract_radio.isChecked() else 'recode',
+            'split_chapters': self.ui.split_chapters_check_box.isChecked(),
             'output_codec': selected_codec,
             'bitrate': bitrate,
             'samplerate': samplerate,
             'channels': channels,
             'quality': quality,
+            'resampler': self.ui.resampler_combo_box.currentData(),
+            'result_cache': self.ui.result_cache_check_box.isChecked(),
+            'verify_outputs': self.ui.verify_outputs_check_box.isChecked(),
+            'stage_inputs': self.ui.stage_inputs_check_box.isChecked(),
+            'max_jobs': self.collect_max_jobs(),
+            'auto_concurrency': self.ui.auto_concurrency_check_box.isChecked(),
+            'stall_timeout': int(self.ui.stall_timeout_line_edit.text().strip() or STALL_TIMEOUT),
+            'loudnorm': dict(LOUDNORM_TARGET) if self.ui.loudnorm_check_box.isChecked() else None,
+            'start': self.ui.start_time_line_edit.text().strip() or None,
+            'end': self.ui.end_time_line_edit.text().strip() or None,
         }
         # 根据 output_codec 确定最终输出文件后缀
         processing_config['output_format'] = self.get_output_format_suffix(processing_config['output_codec'])
+        # 同时输出的其他格式：与主格式共用一次解码
+        extra_codecs = [c for c in re.split(r"[,，\s]+", self.ui.extra_formats_line_edit.text().strip().lower()) if c]
+        if extra_codecs:
+            profiles = encode_profiles(processing_config)
+            for codec in dict.fromkeys(extra_codecs):
+                if codec == selected_codec:
+                    continue
+                extra_samplerate = samplerate
+                if codec == "opus" and samplerate not in OPUS_SAMPLERATES + (KEEP_SOURCE,):
+                    extra_samplerate = "48000" # Opus 只支持 48/24/16/12/8 kHz
+                profiles.append({
+                    'codec': codec,
+                    'output_format': self.get_output_format_suffix(codec),
+                    'bitrate': self.default_bitrate(codec),
+                    'samplerate': extra_samplerate,
+                    'channels': channels,
+                    'quality': None,
+                })
+            if len(profiles) > 1:
+                processing_config['profiles'] = profiles
+        return processing_config
+
+    @staticmethod
+    def default_bitrate(codec):
+        """界面未填写码率时各编码的默认码率 (k)。"""
+        if codec in ["aac", "opus"]:
+            return "256"
+        if codec == "mp3":
+            return "320"
+        return None
+
+    def start_processing(self):
+        """开始处理按钮的槽函数，收集参数并启动处理线程。输出空间检查在处理线程中进行。"""
+        from planner_utils import encode_profiles
+        if not self.selected_files:
+            QMessageBox.warning(self, "警告", "请先选择要处理的文件。")
+            return
+        # 防止重复点击，如果线程已在运行
+        if self.processing_thread and self.processing_thread.isRunning():
+            QMessageBox.warning(self, "警告", "已有任务正在运行，请等待其完成。")
+            return
+        # 检查 FFmpeg 是否可用
+        if not self.ffmpeg_processor.check_ffmpeg_available():
+            QMessageBox.critical(self, "错误", "FFmpeg/ffprobe 可执行文件未找到或无法运行。请确保 'ffmpeg' 文件夹存在并包含正确的二进制文件。")
+            self.logger.log_gui_message("[ERROR] FFmpeg/ffprobe 未找到或无法运行。")
+            return
+        processing_config = self.collect_processing_config()
+        try:
+            resolve_time_window(processing_config['start'], processing_config['end'])
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", f"截取时间范围无效: {e}")
+            return
+        # 在启动前拒绝当前 FFmpeg 无法完成的编码任务，而不是让每个音轨逐一失败
+        if processing_config['mode'] == 'recode' or self.batch_needs_encoding():
+            profiles = encode_profiles(processing_config)
+            problems = []
+            for profile in profiles:
+                problems.extend(self.ffmpeg_processor.validate_encoding_config(profile['codec'], profile['output_format']))
+            if problems:
+                QMessageBox.critical(self, "错误", "无法开始处理:\n" + "\n".join(problems))
+                for problem in problems:
+                    self.logger.log_gui_message(f"[ERROR] {problem}", level=logging.ERROR)
+                return
+            for profile in profiles:
+                encoder = self.ffmpeg_processor.resolve_encoder(profile['codec'])
+                self.logger.log_gui_message(f"[INFO] {profile['codec']} 将使用编码器: {encoder}")
         self.logger.log_gui_message("[INFO] 开始处理文件...")
         self.ui.start_processing_button.setEnabled(False) # 禁用按钮，避免重复点击
         # 创建并启动处理线程，将 logger 的 log_gui_message 方法作为回调传递
+        # 处理线程先试运行估算输出大小，输出卷空间不足时不处理任何文件
         self.processing_thread = ProcessingThread(
             self.selected_files, 
             processing_config, 
-            log_callback=self.logger.log_gui_message
+            log_callback=self.logger.log_gui_message,
+            track_info_cache=self.track_info_cache
         )
+        self.processing_thread.plan_rejected.connect(self.on_plan_rejected)
         # 连接线程的信号到主窗口的槽函数
         self.processing_thread.processing_started.connect(self.on_processing_started)
         self.processing_thread.processing_finished.connect(self.on_processing_finished)
         self.processing_thread.new_log_message.connect(self.on_thread_log_message)
+        self.processing_thread.file_state_changed.connect(self.file_list_model.update_file)
+        self.file_list_model.mark_all('queued')
         self.processing_thread.finished.connect(self.on_thread_finished)
         self.processing_thread.start()
 
+    def show_plan(self):
+        """试运行按钮的槽函数：在后台线程构建任务列表并输出估算结果，不执行 FFmpeg。"""
+        if not self.selected_files:
+            QMessageBox.warning(self, "警告", "请先选择要处理的文件。")
+            return
+        if self.plan_thread and self.plan_thread.isRunning():
+            return
+        processing_config = self.collect_processing_config()
+        self.ui.plan_button.setEnabled(False)
+        self.logger.log_gui_message(f"[INFO] 正在估算 {len(self.selected_files)} 个文件的处理计划...")
+        self.plan_thread = PlanThread(self.selected_files, processing_config, self.track_info_cache)
+        self.plan_thread.plan_ready.connect(self.on_plan_ready)
+        self.plan_thread.start()
+
+    def on_plan_ready(self, plan, track_info_cache):
+        """试运行线程完成：记录估算结果，并把新的探测结果合并进界面缓存。"""
+        self.track_info_cache.update(track_info_cache)
+        self.ui.plan_button.setEnabled(True)
+        self.log_plan(plan)
+
+    def on_plan_rejected(self):
+        """处理线程的试运行估算发现输出卷空间不足。"""
+        self.file_list_model.mark_all('pending')
+        QMessageBox.critical(self, "错误", "输出卷剩余空间不足，已取消处理。详情见日志。")
+
+    def publish_to_queue(self):
+        """协调模式：把任务发布到共享目录队列，由各节点上的 queue_utils.py worker 执行。"""
+        from queue_utils import publish_batch
+        if not self.selected_files:
+            QMessageBox.warning(self, "警告", "请先选择要处理的文件。")
+            return
+        if not self.ffmpeg_processor.check_ffmpeg_available():
+            QMessageBox.critical(self, "错误", "FFmpeg/ffprobe 可执行文件未找到或无法运行。请确保 'ffmpeg' 文件夹存在并包含正确的二进制文件。")
+            return
+        queue_dir = QFileDialog.getExistingDirectory(self, "选择共享任务队列目录")
+        if not queue_dir:
+            return
+        processing_config = self.collect_processing_config()
+        published = publish_batch(queue_dir, self.selected_files, processing_config, self.ffmpeg_processor,
+                                  log=self.logger.log_gui_message, track_info_cache=self.track_info_cache)
+        self.ui.status_label.setText(f"已发布 {published} 个任务到 {queue_dir}")
+        self.logger.log_gui_message(f"[INFO] 在各节点运行 'python queue_utils.py worker --queue-dir {queue_dir}' 开始处理。")
+
+    def log_plan(self, plan):
+        from planner_utils import format_plan_summary, summary_log_level
+        for line in format_plan_summary(plan):
+            self.logger.log_gui_message(line, level=summary_log_level(line))
+
     def on_thread_log_message(self, msg, lvl):
         """主线程安全地处理子线程日志信号，写入GUI和文件。"""
         self.logger.log_gui_message(msg, level=lvl)
@@ -473,6 +834,9 @@ class MainWindow(QMainWindow):
         self.ui.start_processing_button.setEnabled(True)
         self.ui.status_label.setText("所有任务处理完成。")
         self.logger.log_gui_message("[INFO] 所有处理任务已完成。")
+        tracer = get_tracer()
+        if tracer:
+            self.logger.log_gui_message(f"[INFO] 时间线追踪已写入 (可用 chrome://tracing 或 ui.perfetto.dev 打开): {tracer.export()}")
 
     def get_output_format_suffix(self, codec: str) -> str:
         """
@@ -488,8 +852,13 @@ class MainWindow(QMainWindow):
 
 
 if __name__ == "__main__":
+    # 设置了 VIDEO2ACC_TRACE 环境变量时记录时间线追踪
+    enable_tracing_from_env()
+    benchmark = StartupBenchmark() if "--benchmark-startup" in sys.argv else None
     # 创建 QApplication 实例
     app = QApplication(sys.argv)
+    if benchmark:
+        benchmark.mark("创建 QApplication")
     # 设置全局应用图标，按平台优先级选择，全部用resource_path
     import platform
     from PySide6.QtGui import QIcon
@@ -509,5 +878,8 @@ if __name__ == "__main__":
         app.setWindowIcon(QIcon(icon_path_icns))
     # 创建主窗口实例
     window = MainWindow()
+    if benchmark:
+        benchmark.mark("创建主窗口")
+        benchmark.watch(window)
     window.show()
     sys.exit(app.exec())
\ No newline at end of file
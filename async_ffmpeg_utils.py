@@ -0,0 +1,297 @@
+import asyncio
+import logging
+import os
+import platform
+import subprocess
+import time
+
+from ffmpeg_utils import FFmpegProcessor, PROGRESS_ARGS, is_url, parse_progress_block, resolve_time_window
+from watchdog_utils import STALL_TIMEOUT, WATCHDOG_POLL_INTERVAL, ProgressWatchdog
+
+# 同时运行的 ffmpeg/ffprobe 子进程数量上限的默认值
+DEFAULT_MAX_CONCURRENCY = os.cpu_count() or 4
+
+
+class ProgressStream:
+    """
+    FFmpeg 进度的异步流。把它传给 AsyncFFmpegProcessor 的提取/编码方法，
+    然后用 `async for progress in stream` 读取 parse_progress_block 产生的进度字典，
+    命令结束后迭代自动停止。
+    """
+    def __init__(self):
+        self._queue = asyncio.Queue()
+
+    def put(self, progress):
+        self._queue.put_nowait(progress)
+
+    def close(self):
+        self._queue.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        progress = await self._queue.get()
+        if progress is None:
+            raise StopAsyncIteration
+        return progress
+
+
+class AsyncFFmpegProcessor:
+    """
+    FFmpegProcessor 的 asyncio 版本，基于 asyncio.create_subprocess_exec。
+    命令构建、结果判断和返回值格式与同步版完全一致，并用信号量限制同时运行的子进程数。
+    探测超时和 FFmpeg 看门狗 (无进度/超过总时限时终止) 也与同步版相同。
+    """
+    def __init__(self, log_callback=None, max_concurrency=DEFAULT_MAX_CONCURRENCY, stall_timeout=STALL_TIMEOUT):
+        """
+        Args:
+            log_callback (callable, optional): 日志回调，与 FFmpegProcessor 相同。
+            max_concurrency (int): 同时运行的 ffmpeg/ffprobe 子进程数量上限。
+            stall_timeout (float): 无进度超时 (秒)，与 FFmpegProcessor 相同。
+        """
+        self.processor = FFmpegProcessor(log_callback=log_callback, stall_timeout=stall_timeout)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def ffmpeg_path(self):
+        return self.processor.ffmpeg_path
+
+    @property
+    def ffprobe_path(self):
+        return self.processor.ffprobe_path
+
+    def _log(self, message, level=logging.INFO):
+        self.processor._log(message, level=level)
+
+    @staticmethod
+    def _creation_kwargs():
+        if platform.system() == 'Windows':
+            return {'creationflags': subprocess.CREATE_NO_WINDOW}
+        return {}
+
+    async def check_ffmpeg_available(self):
+        """能力探测结果按进程缓存，首次探测放到线程中执行以免阻塞事件循环。"""
+        capabilities = await asyncio.to_thread(self.processor.get_capabilities)
+        return capabilities is not None
+
+    async def probe_audio_tracks(self, file_path):
+        """异步探测音频轨道，返回值与 FFmpegProcessor.probe_audio_tracks 相同；URL 由 ffprobe 直接读取。"""
+        if not is_url(file_path) and not os.path.exists(file_path):
+            self._log(f"[ERROR] 文件不存在，无法探测: {file_path}")
+            return None
+        command = self.processor._build_probe_command(file_path)
+        try:
+            async with self._semaphore:
+                process = await asyncio.create_subprocess_exec(
+                    *command,
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    **self._creation_kwargs()
+                )
+                try:
+                    stdout, stderr = await asyncio.wait_for(process.communicate(), self.processor.probe_timeout)
+                except asyncio.TimeoutError:
+                    self._log(f"[ERROR] ffprobe 探测 {file_path} 超时 ({self.processor.probe_timeout:g} 秒)，已终止。", logging.ERROR)
+                    return None
+                finally:
+                    await self._reap(process)
+            stdout_text = stdout.decode('utf-8', errors='replace')
+            if process.returncode != 0:
+                self._log(f"[ERROR] ffprobe 探测 {file_path} 失败: {process.returncode}")
+                self._log(f"ffprobe stdout: {stdout_text.strip()}")
+                self._log(f"ffprobe stderr: {stderr.decode('utf-8', errors='replace').strip()}")
+                return None
+            return self.processor._parse_probe_output(stdout_text)
+        except Exception as e:
+            self._log(f"[CRITICAL ERROR] ffprobe 探测时发生未知异常: {e}")
+            return None
+
+    async def _read_progress(self, stdout, progress, watchdog):
+        """逐行读取 -progress 输出，每个进度块解析后交给看门狗，progress 不为 None 时推送到进度流。"""
+        fields = {}
+        async for raw_line in stdout:
+            line = raw_line.decode('utf-8', errors='replace').strip()
+            key, sep, value = line.partition('=')
+            if not sep:
+                continue
+            fields[key] = value
+            if key == 'progress':
+                block = parse_progress_block(fields)
+                watchdog.feed(block)
+                if progress is not None:
+                    progress.put(block)
+                fields = {}
+
+    async def _read_stderr(self, stderr, watchdog):
+        """读取 stderr，同时让看门狗从输入信息中取得媒体时长。"""
+        lines = []
+        async for raw_line in stderr:
+            line = raw_line.decode('utf-8', errors='replace').rstrip('\r\n')
+            lines.append(line)
+            watchdog.feed_stderr_line(line)
+        return "\n".join(lines)
+
+    async def _watch(self, process, watchdog):
+        """定期检查看门狗，需要终止时结束子进程并返回原因。"""
+        while True:
+            await asyncio.sleep(WATCHDOG_POLL_INTERVAL)
+            reason = watchdog.check()
+            if reason:
+                process.kill()
+                return reason
+
+    @staticmethod
+    async def _reap(process, tasks=()):
+        """
+        结束仍在运行的子进程并回收辅助任务。在 finally 中调用，
+        调用方的任务被取消 (CancelledError) 或超时时也不会留下继续运行的 ffmpeg/ffprobe。
+        """
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    def _window_seconds(start, end, duration):
+        """截取窗口的时长 (秒)，用于看门狗总时限；未给出终点或时长时为 None，此时从 stderr 读取输入时长。"""
+        return resolve_time_window(start, end, duration)[1]
+
+    async def _execute_ffmpeg_command(self, cmd_args, input_path, output_path, operation_desc, progress=None,
+                                      media_seconds=None):
+        """异步执行 FFmpeg 命令，返回是否成功。progress 为 ProgressStream 时推送实时进度。"""
+        full_command = [self.ffmpeg_path, '-y'] + PROGRESS_ARGS + cmd_args # 进度总是读取，供看门狗监视
+        self._log(f"[CMD] {' '.join(full_command)}", level=logging.DEBUG)
+        try:
+            async with self._semaphore:
+                process = await asyncio.create_subprocess_exec(
+                    *full_command,
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    **self._creation_kwargs()
+                )
+                watchdog = ProgressWatchdog(self.processor.stall_timeout, media_seconds)
+                watch_task = asyncio.create_task(self._watch(process, watchdog))
+                stderr_task = asyncio.create_task(self._read_stderr(process.stderr, watchdog))
+                try:
+                    await self._read_progress(process.stdout, progress, watchdog)
+                    stderr = await stderr_task
+                    await process.wait()
+                    reason = watch_task.result() if watch_task.done() else None
+                finally:
+                    await self._reap(process, (watch_task, stderr_task))
+            if reason:
+                self.processor._log_watchdog_kill(operation_desc, output_path, {
+                    'reason': reason, 'stderr': stderr, 'elapsed': time.monotonic() - watchdog.started_at})
+                return False
+            return self.processor._check_ffmpeg_result(process.returncode, "", stderr, output_path, operation_desc)
+        except FileNotFoundError:
+            self._log(f"[CRITICAL ERROR] FFmpeg 可执行文件 '{self.ffmpeg_path}' 未找到。请检查路径和权限。")
+            return False
+        except Exception as e:
+            self._log(f"[CRITICAL ERROR] 执行 FFmpeg 命令时发生未知异常 ({operation_desc} {output_path}): {e}")
+            return False
+        finally:
+            if progress is not None:
+                progress.close()
+
+    async def extract_aac_track(self, input_path, output_path, track_index, start=None, end=None, duration=None, progress=None):
+        """直接无损提取 AAC 音轨。"""
+        cmd_args = self.processor._build_extract_aac_args(input_path, output_path, track_index, start, end, duration)
+        if cmd_args is None:
+            if progress is not None:
+                progress.close()
+            return False
+        return await self._execute_ffmpeg_command(cmd_args, input_path, output_path, "直接提取 AAC", progress,
+                                                 media_seconds=self._window_seconds(start, end, duration))
+
+    async def extract_raw_audio(self, input_path, output_path, track_index, codec_name=None, start=None, end=None, duration=None,
+                                progress=None):
+        """无损提取任意格式的原始音频。"""
+        cmd_args = self.processor._build_extract_raw_args(input_path, output_path, track_index, codec_name, start, end, duration)
+        if cmd_args is None:
+            if progress is not None:
+                progress.close()
+            return False
+        return await self._execute_ffmpeg_command(cmd_args, input_path, output_path, f"无损提取原始音频 ({codec_name})", progress,
+                                                 media_seconds=self._window_seconds(start, end, duration))
+
+    async def recode_audio(self, input_path, output_path, codec, bitrate=None, samplerate=None, channels=None,
+                           quality=None, track_index=None, start=None, end=None, duration=None, audio_filter=None,
+                           resampler=None, progress=None):
+        """将音频重新编码为指定格式，参数含义与 FFmpegProcessor.recode_audio 相同。"""
+        # 编码器选择依赖能力探测，首次探测放到线程中执行
+        await asyncio.to_thread(self.processor.get_capabilities)
+        cmd_args = self.processor._build_recode_args(input_path, output_path, codec, bitrate, samplerate,
+                                                     channels, quality, track_index, start, end, duration, audio_filter,
+                                                     resampler)
+        if cmd_args is None:
+            if progress is not None:
+                progress.close()
+            return False
+        return await self._execute_ffmpeg_command(cmd_args, input_path, output_path, f"重新编码为 {codec}", progress,
+                                                 media_seconds=self._window_seconds(start, end, duration))
+
+    async def recode_audio_multi(self, input_path, outputs, track_index=None, start=None, end=None, duration=None,
+                                 audio_filter=None, progress=None):
+        """一次解码、多路编码，返回值与 FFmpegProcessor.recode_audio_multi 相同。"""
+        await asyncio.to_thread(self.processor.get_capabilities)
+        cmd_args, runnable = self.processor._build_recode_multi_args(input_path, outputs, track_index, start, end, duration,
+                                                                     audio_filter)
+        if cmd_args is None:
+            if progress is not None:
+                progress.close()
+            return [False] * len(outputs)
+        codecs = ", ".join(outputs[i]['codec'] for i in runnable)
+        success = await self._execute_ffmpeg_command(cmd_args, input_path, outputs[runnable[0]]['output_path'],
+                                                     f"多路编码为 {codecs}", progress,
+                                                     media_seconds=self._window_seconds(start, end, duration))
+        return self.processor._collect_multi_results(outputs, runnable, success)
+
+    async def split_audio(self, input_path, outputs, track_index=None, start=None, end=None, duration=None,
+                          audio_filter=None, progress=None):
+        """按章节一次读取拆分，返回值与 FFmpegProcessor.split_audio 相同。"""
+        await asyncio.to_thread(self.processor.get_capabilities)
+        cmd_args, runnable = self.processor._build_split_args(input_path, outputs, track_index, start, end, duration,
+                                                              audio_filter)
+        if cmd_args is None:
+            if progress is not None:
+                progress.close()
+            return [False] * len(outputs)
+        success = await self._execute_ffmpeg_command(cmd_args, input_path, outputs[runnable[0]]['output_path'],
+                                                     f"按章节拆分为 {len(runnable)} 个文件", progress,
+                                                     media_seconds=self._window_seconds(start, end, duration))
+        return self.processor._collect_multi_results(outputs, runnable, success)
+
+    def get_common_audio_extension(self, codec_name):
+        return self.processor.get_common_audio_extension(codec_name)
+
+    async def probe_many(self, file_paths):
+        """
+        并发探测多个文件，并发度受 max_concurrency 限制。
+        Returns:
+            dict: 文件路径 -> probe_audio_tracks 的结果。
+        """
+        results = await asyncio.gather(*(self.probe_audio_tracks(path) for path in file_paths))
+        return dict(zip(file_paths, results))
+
+    async def run_batch(self, method_name, kwargs_list):
+        """
+        以 gather 方式并发执行一批提取/编码调用，并发度受 max_concurrency 限制。
+        Args:
+            method_name (str): "extract_aac_track"、"extract_raw_audio"、"recode_audio" 或 "recode_audio_multi"。
+            kwargs_list (list): 每次调用的关键字参数。
+        Returns:
+            list: 与 kwargs_list 顺序一致的结果 (recode_audio_multi 为 bool 列表，其余为 bool)。
+        """
+        if method_name not in ("extract_aac_track", "extract_raw_audio", "recode_audio", "recode_audio_multi"):
+            raise ValueError(f"不支持的批量操作: {method_name}")
+        method = getattr(self, method_name)
+        return await asyncio.gather(*(method(**kwargs) for kwargs in kwargs_list))
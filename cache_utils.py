@@ -0,0 +1,283 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+# 结果缓存默认目录与容量上限
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "video2acc_cache", "results")
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# 索引锁文件超过该秒数未释放视为持有进程已退出；等待锁时的检查间隔 (秒)
+INDEX_LOCK_STALE = 30.0
+INDEX_LOCK_POLL_INTERVAL = 0.05
+
+# 超过该秒数的临时文件视为中断写入的残留
+ORPHAN_TMP_AGE = 3600.0
+
+# 文件指纹的采样参数：在文件中均匀选取若干块参与哈希
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+FINGERPRINT_SAMPLES = 16
+
+# 影响输出内容的配置项，参与缓存键计算
+RESULT_CONFIG_KEYS = ("output_codec", "output_format", "bitrate", "samplerate", "channels", "quality")
+RESULT_PROFILE_KEYS = ("codec", "output_format", "bitrate", "samplerate", "channels", "quality")
+
+
+def file_fingerprint(path, block_size=FINGERPRINT_BLOCK_SIZE, samples=FINGERPRINT_SAMPLES):
+    """
+    计算快速文件指纹：文件大小 + 均匀采样块的哈希。
+    只读取 samples * block_size 字节，与文件总大小无关。
+    Returns:
+        str: 形如 "<size>-<blake2b hex>" 的指纹字符串。
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        if size <= block_size * samples:
+            digest.update(f.read())
+        else:
+            # 首尾块必选，中间块等距分布
+            step = (size - block_size) / (samples - 1)
+            for i in range(samples):
+                f.seek(int(i * step))
+                digest.update(f.read(block_size))
+    return f"{size}-{digest.hexdigest()}"
+
+
+def result_cache_key(fingerprint, job, step, config, output=None, encoder=None, ffmpeg_version=None):
+    """
+    由源文件指纹、音轨索引、步骤类型和编码配置组成的缓存键。
+    多路编码和按章节拆分的步骤按输出分别计算，output 为该路输出的档案 (章节输出另含章节时间段)。
+    encoder 为实际使用的编码器 (如 aac 与 libfdk_aac 输出不同)，ffmpeg_version 为 get_capabilities 的版本行，
+    更换 FFmpeg 或编码器后旧结果不再命中。
+    """
+    payload = {
+        "fingerprint": fingerprint,
+        "audio_track_index": job["audio_track_index"],
+        "action": step["action"],
+        "extension": os.path.splitext((output or step)["output_path"])[1].lower(),
+        "time_range": step.get("time_range") or {},
+    }
+    if step.get("source_time_range"):
+        # 从已截取的中间文件编码：中间文件路径不变，窗口不同则内容不同
+        payload["source_time_range"] = step["source_time_range"]
+    if output is not None:
+        payload["config"] = {k: output.get(k) for k in RESULT_PROFILE_KEYS}
+        if "chapter_start" in output:
+            payload["chapter"] = [output["chapter_start"], output.get("chapter_end"), output.get("chapter_title")]
+    elif step["action"] == "encode":
+        payload["config"] = {k: config.get(k) for k in RESULT_CONFIG_KEYS}
+    payload["ffmpeg_version"] = ffmpeg_version or ""
+    if step["action"] == "encode":
+        payload["encoder"] = encoder
+        payload["loudnorm"] = config.get("loudnorm") or None
+        payload["resampler"] = config.get("resampler") or None
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def link_or_copy(src, dst):
+    """优先创建硬链接，跨卷或文件系统不支持时退回复制。"""
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        shutil.copy2(src, dst)
+        return "copy"
+
+
+class ResultCache:
+    """
+    内容寻址的处理结果缓存，容量有上限并按 LRU 淘汰。
+    同一内容的输入（不论路径和文件名）命中缓存时直接硬链接或复制已有输出，不再运行 FFmpeg。
+    多个进程可以共用同一缓存目录：索引的读改写在锁文件保护下进行，每次修改前重新读取磁盘上的索引。
+    """
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock_path = self.index_path + ".lock"
+        self._lock = threading.Lock()
+        self._entries = {} # key -> {'file', 'size', 'mtime_ns', 'last_used'}
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._lock, self._index_lock():
+            self._load_index()
+            self._remove_orphans()
+
+    @contextlib.contextmanager
+    def _index_lock(self):
+        """
+        跨进程的索引锁 (独占创建锁文件)。持有时间只有读写索引的几毫秒，
+        锁文件超过 INDEX_LOCK_STALE 秒未释放视为持有者已退出；无法创建锁文件时不加锁继续，缓存只是尽力而为。
+        """
+        locked = False
+        while True:
+            try:
+                os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                locked = True
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.lock_path) > INDEX_LOCK_STALE:
+                        os.remove(self.lock_path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(INDEX_LOCK_POLL_INTERVAL)
+            except OSError:
+                break
+        try:
+            yield
+        finally:
+            if locked:
+                try:
+                    os.remove(self.lock_path)
+                except OSError:
+                    pass
+
+    def _load_index(self):
+        """从磁盘重新读取索引 (需持有锁)，其他进程写入的条目随之可见。"""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        # 丢弃文件已不存在的条目
+        self._entries = {
+            key: entry for key, entry in entries.items()
+            if isinstance(entry, dict) and os.path.exists(os.path.join(self.cache_dir, entry.get("file", "")))
+        }
+
+    def _remove_orphans(self):
+        """删除索引之外的缓存文件 (如旧版本各进程互相覆盖索引时遗留的文件) 和中断写入留下的临时文件。"""
+        referenced = {entry["file"] for entry in self._entries.values()}
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name in referenced or path in (self.index_path, self.lock_path) or not os.path.isfile(path):
+                continue
+            try:
+                # 临时文件可能是其他进程正在复制的结果
+                if name.endswith(".tmp") and now - os.path.getmtime(path) < ORPHAN_TMP_AGE:
+                    continue
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _save_index(self):
+        """写入索引；多个进程共用缓存目录时各自使用独立的临时文件，写入失败 (如临时盘已满) 时保留旧索引。"""
+        tmp_path = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(entry["size"] for entry in self._entries.values())
+
+    def lookup(self, key, output_path):
+        """
+        查找缓存并将结果放到 output_path。缓存文件的大小或修改时间与存入时不同
+        (如硬链接出去的输出被就地编辑了标签) 时视为失效并删除。
+        Returns:
+            str: 命中时返回放置方式 ("hardlink" 或 "copy")，未命中返回 None。
+        """
+        with self._lock, self._index_lock():
+            self._load_index()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            cached_path = os.path.join(self.cache_dir, entry["file"])
+            try:
+                st = os.stat(cached_path)
+                if st.st_size != entry["size"] or st.st_mtime_ns != entry.get("mtime_ns", st.st_mtime_ns):
+                    raise OSError("缓存文件已被修改")
+            except OSError:
+                self._remove_entry(key)
+                self._save_index()
+                return None
+        # 复制可能较慢，不持有索引锁
+        try:
+            method = link_or_copy(cached_path, output_path)
+        except OSError:
+            return None
+        with self._lock, self._index_lock():
+            self._load_index()
+            if key in self._entries:
+                self._entries[key]["last_used"] = time.time()
+                self._save_index()
+        return method
+
+    def store(self, key, output_path):
+        """
+        将成功生成的输出复制一份加入缓存，随后按 LRU 淘汰超出容量的条目。
+        不与输出共享硬链接：之后对输出的就地修改不会改变缓存中的结果。
+        """
+        try:
+            size = os.path.getsize(output_path)
+        except OSError:
+            return
+        if size > self.max_bytes:
+            return
+        file_name = key + os.path.splitext(output_path)[1]
+        tmp_path = os.path.join(self.cache_dir, f"{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            shutil.copy2(output_path, tmp_path)
+            st = os.stat(tmp_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock, self._index_lock():
+            self._load_index()
+            try:
+                os.replace(tmp_path, os.path.join(self.cache_dir, file_name))
+            except OSError:
+                return
+            self._entries[key] = {"file": file_name, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                  "last_used": time.time()}
+            self._evict()
+            self._save_index()
+
+    def release(self, output_path):
+        """
+        FFmpeg 以截断方式覆盖已有文件；若该文件与缓存条目共享硬链接，
+        覆盖会破坏缓存内容，因此在写入前先解除链接。
+        """
+        try:
+            if os.stat(output_path).st_nlink > 1:
+                os.remove(output_path)
+        except OSError:
+            pass
+
+    def _remove_entry(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError:
+                pass
+
+    def _evict(self):
+        total = sum(entry["size"] for entry in self._entries.values())
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= self._entries[key]["size"]
+            self._remove_entry(key)
@@ -0,0 +1,221 @@
+import ctypes
+import logging
+import os
+import platform
+import threading
+import time
+
+from trace_utils import get_tracer
+
+# 自动调节的默认上限
+DEFAULT_MAX_JOBS = os.cpu_count() or 4
+
+# 两次评估之间的最短间隔 (秒)
+SAMPLE_INTERVAL = 3.0
+
+# CPU 利用率低于此值且磁盘不忙时尝试增加并发，高于 CPU_HIGH 视为饱和
+CPU_LOW = 0.70
+CPU_HIGH = 0.90
+
+# I/O 等待占比高于此值时减少并发 (磁盘已是瓶颈，更多任务只会互相争抢)，低于 IOWAIT_LOW 视为磁盘空闲
+IOWAIT_HIGH = 0.20
+IOWAIT_LOW = 0.05
+
+# 增加并发后总吞吐至少提高这么多才保留，否则退回
+MIN_THROUGHPUT_GAIN = 0.05
+
+# 退回后暂停尝试增加的评估次数，避免在两个并发数之间来回摆动
+HOLD_EVALUATIONS = 5
+
+
+class _FileTime(ctypes.Structure):
+    _fields_ = [("low", ctypes.c_uint32), ("high", ctypes.c_uint32)]
+
+    @property
+    def value(self):
+        return (self.high << 32) | self.low
+
+
+def read_cpu_times():
+    """
+    读取系统累计 CPU 时间。
+    Returns:
+        tuple: (总时间, 忙碌时间, I/O 等待时间)，单位因平台而异，只用于计算差值；
+               Windows 没有 I/O 等待统计，第三项为 None。无法读取时返回 None。
+    """
+    if os.path.exists("/proc/stat"):
+        try:
+            with open("/proc/stat", "r", encoding="ascii") as f:
+                fields = [int(v) for v in f.readline().split()[1:9]]
+        except (OSError, ValueError):
+            return None
+        # user nice system idle iowait irq softirq steal
+        total = sum(fields)
+        idle, iowait = fields[3], fields[4]
+        return total, total - idle - iowait, iowait
+    if platform.system() == "Windows":
+        idle, kernel, user = _FileTime(), _FileTime(), _FileTime()
+        if not ctypes.windll.kernel32.GetSystemTimes(ctypes.byref(idle), ctypes.byref(kernel), ctypes.byref(user)):
+            return None
+        # 内核时间包含空闲时间
+        total = kernel.value + user.value
+        return total, total - idle.value, None
+    return None
+
+
+class SystemLoadSampler:
+    """按两次调用之间的差值计算 CPU 利用率和 I/O 等待占比。"""
+    def __init__(self):
+        self._last = read_cpu_times()
+
+    def sample(self):
+        """
+        Returns:
+            tuple: (CPU 利用率, I/O 等待占比)，均为 0~1；平台不支持的项为 None。
+        """
+        current = read_cpu_times()
+        last, self._last = self._last, current
+        if current is None or last is None or current[0] <= last[0]:
+            return None, None
+        total = current[0] - last[0]
+        cpu = (current[1] - last[1]) / total
+        iowait = (current[2] - last[2]) / total if current[2] is not None else None
+        return cpu, iowait
+
+
+class ConcurrencyController:
+    """
+    限制同时运行的 FFmpeg 任务数。auto 为 True 时在 [min_jobs, max_jobs] 内自动调节：
+    后台线程定期采样 CPU 利用率、I/O 等待和已完成任务的实时倍速，
+    CPU 与磁盘都有余量时逐个增加并发，I/O 等待过高、或增加并发后总吞吐没有提高时减少并发。
+    每次调整都会记录日志。
+    """
+    def __init__(self, min_jobs=1, max_jobs=DEFAULT_MAX_JOBS, auto=True, interval=SAMPLE_INTERVAL, log=None):
+        """
+        Args:
+            min_jobs (int): 并发下限。
+            max_jobs (int): 并发上限；auto 为 False 时即固定并发数。
+            auto (bool): 是否自动调节。自动调节从下限开始逐步增加。
+            interval (float): 评估间隔 (秒)。
+            log (callable, optional): 日志回调，签名为 log(message, level)，会在监控线程中调用。
+        """
+        self.min_jobs = max(1, min(min_jobs, max_jobs))
+        self.max_jobs = max(1, max_jobs)
+        self.auto = auto
+        self.interval = interval
+        self.log = log
+        self.limit = self.min_jobs if auto else self.max_jobs
+        self._condition = threading.Condition()
+        self._active = 0
+        self._sampler = SystemLoadSampler()
+        self._throughput = {}  # 并发数 -> 该并发数下最近一次测得的总吞吐 (媒体秒/秒)
+        self._last_change = 0  # 上次调整的方向：1 增加，-1 减少
+        self._hold = 0
+        self._reset_period()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _log(self, message, level=logging.INFO):
+        if self.log:
+            self.log(message, level)
+
+    def _reset_period(self):
+        """开始一个新的评估周期 (调用方需持有锁或尚未启动监控线程)。"""
+        self._period_start = time.monotonic()
+        self._period_media = 0.0
+        self._period_jobs = 0
+        self._period_factors = []
+
+    def acquire(self):
+        """占用一个并发名额，名额用完时等待。由分派任务的线程调用，任务按提交顺序开始。"""
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+
+    def release(self):
+        """任务结束后归还名额。"""
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def record_job(self, media_seconds, wall_seconds):
+        """记录一个完成的任务的媒体时长和耗时，用于计算实时倍速和总吞吐。"""
+        if not media_seconds or wall_seconds <= 0:
+            return
+        with self._condition:
+            self._period_media += media_seconds
+            self._period_jobs += 1
+            self._period_factors.append(media_seconds / wall_seconds)
+
+    def start(self):
+        """启动自动调节的监控线程；固定并发时不做任何事。"""
+        if not self.auto or self.min_jobs == self.max_jobs:
+            return
+        self._log(f"[INFO] 自动并发已启用: 范围 {self.min_jobs}-{self.max_jobs}，从 {self.limit} 个任务开始。")
+        self._sampler.sample()
+        self._thread = threading.Thread(target=self._monitor_loop, name="concurrency", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _monitor_loop(self):
+        while not self._stop_event.wait(self.interval):
+            self.evaluate()
+
+    def evaluate(self):
+        """
+        评估当前并发数并按需调整，由监控线程按固定间隔调用。CPU 利用率和 I/O 等待每次都参与判断；
+        总吞吐的比较要等每个并发名额至少完成一个任务后才进行，以免只凭启动阶段的数据做决定。
+        """
+        with self._condition:
+            measured = self._period_jobs >= self.limit
+            if measured:
+                elapsed = time.monotonic() - self._period_start
+                throughput = self._period_media / elapsed if elapsed > 0 else 0.0
+                mean_factor = sum(self._period_factors) / len(self._period_factors)
+        cpu, iowait = self._sampler.sample()
+        limit = self.limit
+        no_gain = False
+        if measured:
+            self._throughput[limit] = throughput
+            lower = self._throughput.get(limit - 1)
+            no_gain = lower is not None and throughput < lower * (1 + MIN_THROUGHPUT_GAIN)
+        else:
+            throughput = mean_factor = None
+        self._hold = max(0, self._hold - 1)
+
+        new_limit, reason = limit, None
+        if iowait is not None and iowait >= IOWAIT_HIGH and limit > self.min_jobs:
+            new_limit, reason = limit - 1, "I/O 等待过高，磁盘已成为瓶颈"
+        elif self._last_change > 0 and no_gain and limit > self.min_jobs:
+            new_limit, reason = limit - 1, "增加并发后总吞吐没有提高"
+            self._hold = HOLD_EVALUATIONS
+        elif cpu is not None and cpu >= CPU_HIGH and no_gain and limit > self.min_jobs:
+            new_limit, reason = limit - 1, "CPU 已饱和"
+        elif (limit < self.max_jobs and not self._hold
+              and (cpu is None or cpu < CPU_LOW) and (iowait is None or iowait < IOWAIT_LOW)):
+            new_limit, reason = limit + 1, "CPU 与磁盘仍有余量"
+
+        tracer = get_tracer()
+        if tracer:
+            now = tracer.now()
+            tracer.record("并发评估", "concurrency", now, now, limit=limit, new_limit=new_limit,
+                          cpu=cpu, iowait=iowait, throughput=throughput)
+        if new_limit == limit:
+            return
+        load = f"CPU {cpu:.0%}" if cpu is not None else "CPU 未知"
+        if iowait is not None:
+            load += f", I/O 等待 {iowait:.0%}"
+        if measured:
+            load += f", 总吞吐 {throughput:.1f}x 实时, 单任务平均 {mean_factor:.1f}x"
+        self._log(f"[INFO] 自动并发: {limit} -> {new_limit} ({load}): {reason}")
+        with self._condition:
+            self.limit = new_limit
+            self._last_change = 1 if new_limit > limit else -1
+            self._reset_period()
+            self._condition.notify_all()
+        self._sampler.sample() # 下次评估只看新并发数下的负载
@@ -1,23 +1,265 @@
 import subprocess
+import io
 import json
 import os
 import re # 用于解析FFmpeg进度信息
 import platform # 用于更精确地判断操作系统
 import logging
+import math
+import threading
+import time
+
+from trace_utils import trace_process
+from watchdog_utils import PROBE_TIMEOUT, STALL_TIMEOUT, WATCHDOG_POLL_INTERVAL, ProgressWatchdog
+
+# FFmpeg 能力探测结果缓存，键为 (ffmpeg路径, mtime, ffprobe路径, mtime)，
+# 同一进程内所有 FFmpegProcessor 实例共享，二进制文件被替换后自动失效
+_CAPABILITY_CACHE = {}
+_CAPABILITY_LOCK = threading.Lock()
+
+# 目标编码 -> 按优先级排列的候选 FFmpeg 编码器（质量/速度更好的排在前面）
+ENCODER_PREFERENCES = {
+    "aac": ["libfdk_aac", "aac_at", "aac"],
+    "mp3": ["libmp3lame", "libshine", "mp3_mf"],
+    "opus": ["libopus", "opus"],
+    "flac": ["flac"],
+    "ac3": ["ac3", "ac3_fixed"],
+}
+
+# 输出文件后缀 -> FFmpeg 按后缀推断出的封装器 (muxer)
+OUTPUT_MUXERS = {
+    "m4a": "ipod",
+    "mp3": "mp3",
+    "opus": "opus",
+    "flac": "flac",
+    "ac3": "ac3",
+}
+
+# 采样率/声道设置为此值时保持源音轨的参数，只在编码器不支持时才转换
+KEEP_SOURCE = "source"
+
+# 只支持部分采样率的编码器 -> 支持的采样率 (升序)；保持源参数而源采样率不在其中时，改用不低于源采样率的最小一个
+ENCODER_SAMPLERATES = {
+    "opus": (8000, 12000, 16000, 24000, 48000),
+    "mp3": (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000),
+    "ac3": (32000, 44100, 48000),
+}
+
+# 声道数有上限的编码器，源声道更多时混音到上限
+ENCODER_MAX_CHANNELS = {
+    "mp3": 2,
+    "ac3": 6,
+}
+
+# 重采样器预设 -> aresample 选项 (None 为 FFmpeg 默认的 swr)。只在确实需要改变采样率时使用
+RESAMPLER_PRESETS = {
+    "swr": None,                                        # 默认，最快
+    "swr_hq": "resampler=swr:filter_size=64:phase_shift=14:cutoff=0.98",  # swr 加长滤波器，较慢
+    "soxr": "resampler=soxr:precision=20",              # SoX 高质量 (需要 --enable-libsoxr)
+    "soxr_vhq": "resampler=soxr:precision=28",          # SoX 极高质量，最慢
+}
+
+# EBU R128 响度标准化的默认目标：综合响度 -23 LUFS、真峰值 -1 dBTP、响度范围 7 LU
+LOUDNORM_TARGET = {'I': -23.0, 'TP': -1.0, 'LRA': 7.0}
+
+# loudnorm 第一遍分析输出中需要保存的测量值
+LOUDNORM_MEASURED_KEYS = ('input_i', 'input_tp', 'input_lra', 'input_thresh', 'target_offset')
+
+# 让 FFmpeg 以 key=value 形式把进度写到 stdout，每个进度块以 progress=continue/end 结束
+PROGRESS_ARGS = ["-progress", "pipe:1", "-nostats"]
+
+# stdout 用于输出媒体数据时改把进度写到 stderr，与日志行混在一起，按 key=value 行格式区分
+STDERR_PROGRESS_ARGS = ["-progress", "pipe:2", "-nostats"]
+_PROGRESS_LINE_PATTERN = re.compile(r"^(\w+)=(\S*)$")
+
+# 流式输入/输出时每次转发的块大小，整个传输过程复用同一块缓冲区
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# 输出到管道时的封装参数：管道不可回写，MP4/M4A 需要分片封装 (moov 在开头，数据以 moof 分片写出)
+STREAM_OUTPUT_ARGS = {
+    "m4a": ["-f", "ipod", "-movflags", "+frag_keyframe+empty_moov+default_base_moof"],
+    "aac": ["-f", "adts"],
+    "mp3": ["-f", "mp3"],
+    "opus": ["-f", "opus"],
+    "flac": ["-f", "flac"],
+    "ac3": ["-f", "ac3"],
+}
+
+# FFmpeg 自行读取的 URL 输入 (http://、https://、rtmp:// 等，以及 pipe:N)
+_URL_PATTERN = re.compile(r'^(?:[a-zA-Z][a-zA-Z0-9+.-]+://|pipe:)')
+
+def is_url(path):
+    """是否为由 FFmpeg 直接读取的 URL；Windows 盘符路径 (C:\\...) 不算。"""
+    return isinstance(path, str) and bool(_URL_PATTERN.match(path))
+
+def _stream_fileno(stream, writable):
+    """
+    可直接作为子进程 stdin/stdout 的文件描述符，此时 FFmpeg 自己读写该描述符，数据不经过本进程。
+    只用于无缓冲的 FileIO 和 (刷新后的) 写缓冲；读缓冲中可能已有预读数据，其余对象返回 None 走转发线程。
+    """
+    if writable and isinstance(stream, io.BufferedWriter):
+        stream.flush()
+        return stream.fileno()
+    if isinstance(stream, io.FileIO):
+        return stream.fileno()
+    return None
+
+def _write_all(writer, data):
+    """写出 memoryview 中的全部数据；无缓冲写可能只写出一部分。"""
+    while data:
+        written = writer.write(data)
+        if written is None:  # 缓冲写对象总是全部写出
+            return
+        data = data[written:]
+
+def forward_stream(reader, writer, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    把 reader 的数据按块转发到 writer，直到 reader 结束。
+    支持 readinto 的对象直接读入复用的缓冲区，以 memoryview 切片写出，不产生中间 bytes 副本；
+    带缓冲的读对象使用 readinto1，有数据即转发，不等缓冲区读满。
+    Returns:
+        int: 转发的字节数。
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    readinto = getattr(reader, "readinto1", None) or getattr(reader, "readinto", None)
+    total = 0
+    while True:
+        if readinto:
+            n = readinto(buffer)
+            chunk = view[:n] if n else None
+        else:
+            data = reader.read(chunk_size)
+            n = len(data) if data else 0
+            chunk = memoryview(data) if n else None
+        if not n:
+            return total
+        _write_all(writer, chunk)
+        total += n
+
+def parse_progress_block(fields):
+    """
+    将一个 -progress 进度块转换为进度字典。
+    Args:
+        fields (dict): 进度块中的 key=value 字段。
+    Returns:
+        dict: 'out_time' (已输出媒体秒数), 'speed' (实时倍速), 'total_size' (字节), 'done' (是否结束)。
+    """
+    out_time_us = _to_float(fields.get('out_time_us') or fields.get('out_time_ms'))
+    speed = fields.get('speed', '').rstrip('x').strip()
+    total_size = _to_float(fields.get('total_size'))
+    return {
+        'out_time': out_time_us / 1000000 if out_time_us is not None and out_time_us >= 0 else None,
+        'speed': _to_float(speed),
+        'total_size': int(total_size) if total_size is not None else None,
+        'done': fields.get('progress') == 'end',
+    }
+
+def parse_time_value(value):
+    """
+    将时间参数转换为秒数。支持数字 (秒) 以及 "SS"、"MM:SS"、"HH:MM:SS.mmm" 形式的字符串。
+    Returns:
+        float: 秒数；value 为空时返回 None。
+    Raises:
+        ValueError: 无法解析或为负数时。
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        seconds = 0.0
+        for part in str(value).strip().split(':'):
+            seconds = seconds * 60 + float(part)
+    if seconds < 0:
+        raise ValueError(f"时间不能为负数: {value}")
+    return seconds
+
+def resolve_time_window(start=None, end=None, duration=None):
+    """
+    将 start/end/duration 统一为 (起点秒数, 时长秒数)。同时给出 end 和 duration 时以 duration 为准。
+    Raises:
+        ValueError: 参数无法解析或结束时间不晚于起点时。
+    """
+    start_seconds = parse_time_value(start) or 0.0
+    length = parse_time_value(duration)
+    if length is None:
+        end_seconds = parse_time_value(end)
+        if end_seconds is not None:
+            length = end_seconds - start_seconds
+    if length is not None and length <= 0:
+        raise ValueError(f"时间范围无效: 起点 {start}, 终点 {end}, 时长 {duration}")
+    return start_seconds, length
+
+def build_loudnorm_filter(measured, target=None):
+    """
+    由第一遍分析的测量值构建第二遍的 loudnorm 滤镜（线性模式，不引入动态压缩）。
+    测量值只取决于源音频；offset 与分析时的目标有关，目标一致时才使用。
+    Returns:
+        str: 滤镜字符串；测量值无效（如整段静音，综合响度为 -inf）时返回 None。
+    """
+    target = target or LOUDNORM_TARGET
+    values = [measured.get(key) for key in LOUDNORM_MEASURED_KEYS[:4]]
+    if any(value is None or not math.isfinite(value) for value in values):
+        return None
+    input_i, input_tp, input_lra, input_thresh = values
+    text = (f"loudnorm=I={target['I']}:TP={target['TP']}:LRA={target['LRA']}"
+            f":measured_I={input_i}:measured_TP={input_tp}:measured_LRA={input_lra}:measured_thresh={input_thresh}")
+    offset = measured.get('target_offset')
+    if measured.get('target') == dict(target) and offset is not None and math.isfinite(offset):
+        text += f":offset={offset}"
+    return text + ":linear=true:print_format=none"
+
+def resolve_output_format(codec, samplerate=None, channels=None, source_samplerate=None, source_channels=None):
+    """
+    把编码参数中的采样率和声道数解析为实际需要传给 FFmpeg 的值，避免无谓的重采样和混音。
+    留空或 KEEP_SOURCE 表示保持源参数，只在编码器不支持时改用 ENCODER_SAMPLERATES/ENCODER_MAX_CHANNELS 中的支持值；
+    显式设置且与源相同时同样不传递。源参数未知时按设置原样传递 (KEEP_SOURCE 视为留空)。
+    Returns:
+        tuple: (采样率字符串或 None, 声道数字符串或 None)，None 表示不传 -ar/-ac。
+    """
+    rate = None if samplerate in (None, "", KEEP_SOURCE) else int(float(samplerate))
+    if source_samplerate:
+        source_samplerate = int(source_samplerate)
+        if rate == source_samplerate:
+            rate = None
+        supported = ENCODER_SAMPLERATES.get(codec)
+        if rate is None and supported and source_samplerate not in supported:
+            rate = next((r for r in supported if r >= source_samplerate), supported[-1])
+    count = None if channels in (None, "", KEEP_SOURCE) else int(float(channels))
+    if source_channels:
+        source_channels = int(source_channels)
+        if count == source_channels:
+            count = None
+        max_channels = ENCODER_MAX_CHANNELS.get(codec)
+        if count is None and max_channels and source_channels > max_channels:
+            count = max_channels
+    return (str(rate) if rate else None), (str(count) if count else None)
+
+def _to_float(value):
+    """将 ffprobe 输出的数值字段转换为 float，'N/A' 或缺失时返回 None。"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
 
 class FFmpegProcessor:
     """
     封装FFmpeg和FFprobe的命令行操作。
     负责探测媒体文件信息、构建FFmpeg命令并执行。
     """
-    def __init__(self, log_callback=None):
+    def __init__(self, log_callback=None, stall_timeout=STALL_TIMEOUT):
         """
         初始化FFmpegProcessor。
         Args:
             log_callback (callable, optional): 用于发送日志消息的回调函数。
                                                 通常是AppLogger实例的log_gui_message方法。
+            stall_timeout (float): FFmpeg 子进程超过该秒数没有进度即终止，0 表示不检测 (见 ProgressWatchdog)。
         """
         self.log_callback = log_callback
+        self.stall_timeout = stall_timeout
+        self.probe_timeout = PROBE_TIMEOUT
+        self._thread_state = threading.local()  # 各线程的取消事件和最近一次被终止的命令的原因
 
         # 获取当前脚本所在目录的绝对路径
         current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -45,71 +287,210 @@ class FFmpegProcessor:
         else:
             print(message) # 如果没有提供回调，则打印到控制台
 
+    def pop_failure_reason(self):
+        """返回并清除当前线程最近一次被看门狗终止或超时的命令的原因，没有时返回 None。"""
+        reason = getattr(self._thread_state, 'reason', None)
+        self._thread_state.reason = None
+        return reason
+
+    def set_cancel_event(self, cancel_event):
+        """
+        为当前线程设置取消事件 (threading.Event，None 表示清除)。事件置位后，
+        当前线程中正在运行的 FFmpeg 命令在下一次检查时被终止，原因记为“任务已取消”。
+        """
+        self._thread_state.cancel_event = cancel_event
+
+    def set_media_duration(self, media_seconds):
+        """
+        为当前线程设置待处理的媒体时长 (秒，None 表示清除)，此后当前线程运行的 FFmpeg 命令按它计算看门狗总时限。
+        截取时间窗口时 stderr 中的时长是整个输入的时长，会使总时限过长，因此由调用方传入窗口内的时长。
+        """
+        self._thread_state.media_seconds = media_seconds
+
     def check_ffmpeg_available(self):
         """
         检查指定路径的FFmpeg和FFprobe可执行文件是否存在且可执行。
+        结果来自缓存的能力探测，重复调用不会重新启动子进程。
+        """
+        return self.get_capabilities() is not None
+
+    def _run_tool(self, args, timeout=5):
+        """短暂运行 ffmpeg/ffprobe 并返回 stdout 文本，失败时抛出异常。"""
+        with trace_process(os.path.basename(args[0]), "capabilities", args=" ".join(args[1:])):
+            result = subprocess.run(
+                args, check=True, capture_output=True, text=True, encoding='utf-8', errors='replace',
+                timeout=timeout,
+                creationflags=subprocess.CREATE_NO_WINDOW if platform.system() == 'Windows' else 0
+            )
+        return result.stdout
+
+    def _capability_cache_key(self):
+        """以二进制路径和修改时间作为缓存键，文件被替换后缓存自动失效。"""
+        return (self.ffmpeg_path, os.path.getmtime(self.ffmpeg_path),
+                self.ffprobe_path, os.path.getmtime(self.ffprobe_path))
+
+    def get_capabilities(self, refresh=False):
+        """
+        探测 FFmpeg 的版本、可用编码器和封装器，按 (路径, mtime) 缓存。
+        Args:
+            refresh (bool): 是否忽略缓存强制重新探测。
+        Returns:
+            dict: 包含 'version', 'ffprobe_version', 'configuration',
+                  'encoders' (set), 'experimental_encoders' (set), 'muxers' (set)。
+                  可执行文件缺失或无法运行时返回 None。
         """
         if not os.path.exists(self.ffmpeg_path) or not os.path.exists(self.ffprobe_path):
             self._log(f"[ERROR] FFmpeg 或 FFprobe 可执行文件未在预期路径找到。")
             self._log(f"预期 FFmpeg 路径: {self.ffmpeg_path}")
             self._log(f"预期 FFprobe 路径: {self.ffprobe_path}")
-            return False
-        
-        # 尝试运行一下，确保是可执行文件且能正常工作
+            return None
+
         try:
-            # 短暂运行命令以验证其功能性
-            subprocess.run([self.ffmpeg_path, "-version"], check=True, capture_output=True, timeout=5, creationflags=subprocess.CREATE_NO_WINDOW if platform.system() == 'Windows' else 0)
-            subprocess.run([self.ffprobe_path, "-version"], check=True, capture_output=True, timeout=5, creationflags=subprocess.CREATE_NO_WINDOW if platform.system() == 'Windows' else 0)
-            self._log("[INFO] FFmpeg 和 FFprobe 已成功验证。")
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired, PermissionError) as e:
-            self._log(f"[ERROR] 验证 FFmpeg/ffprobe 失败: {e}")
-            self._log(f"请确保 '{self.ffmpeg_path}' 和 '{self.ffprobe_path}' 是有效的可执行文件，并且具有执行权限。")
-            return False
-        except Exception as e:
-            self._log(f"[ERROR] 验证 FFmpeg/ffprobe 时发生未知错误: {e}")
-            return False
+            cache_key = self._capability_cache_key()
+        except OSError as e:
+            self._log(f"[ERROR] 读取 FFmpeg/ffprobe 文件信息失败: {e}")
+            return None
+
+        with _CAPABILITY_LOCK:
+            if not refresh and cache_key in _CAPABILITY_CACHE:
+                return _CAPABILITY_CACHE[cache_key]
+
+            # 尝试运行一下，确保是可执行文件且能正常工作
+            try:
+                version_output = self._run_tool([self.ffmpeg_path, "-version"])
+                ffprobe_version_output = self._run_tool([self.ffprobe_path, "-version"])
+                encoders_output = self._run_tool([self.ffmpeg_path, "-hide_banner", "-encoders"])
+                muxers_output = self._run_tool([self.ffmpeg_path, "-hide_banner", "-muxers"])
+            except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired, PermissionError) as e:
+                self._log(f"[ERROR] 验证 FFmpeg/ffprobe 失败: {e}")
+                self._log(f"请确保 '{self.ffmpeg_path}' 和 '{self.ffprobe_path}' 是有效的可执行文件，并且具有执行权限。")
+                return None
+            except Exception as e:
+                self._log(f"[ERROR] 验证 FFmpeg/ffprobe 时发生未知错误: {e}")
+                return None
+
+            encoders, experimental_encoders = self._parse_encoders(encoders_output)
+            capabilities = {
+                'version': version_output.splitlines()[0].strip() if version_output else '',
+                'ffprobe_version': ffprobe_version_output.splitlines()[0].strip() if ffprobe_version_output else '',
+                'configuration': next((line.split(':', 1)[1].strip() for line in version_output.splitlines()
+                                       if line.startswith('configuration:')), ''),
+                'encoders': encoders,
+                'experimental_encoders': experimental_encoders,
+                'muxers': self._parse_muxers(muxers_output),
+            }
+            # 同一路径的旧条目（二进制已被替换）一并清理
+            for key in [k for k in _CAPABILITY_CACHE if k[0] == cache_key[0]]:
+                del _CAPABILITY_CACHE[key]
+            _CAPABILITY_CACHE[cache_key] = capabilities
+
+        self._log("[INFO] FFmpeg 和 FFprobe 已成功验证。")
+        self._log(f"[INFO] {capabilities['version']}，可用音频编码器 {len(encoders)} 个。", level=logging.DEBUG)
+        return capabilities
+
+    @staticmethod
+    def _parse_encoders(output):
+        """
+        解析 `ffmpeg -encoders` 输出，只保留音频编码器。
+        行格式形如 " A....D aac   AAC (Advanced Audio Coding)"，第4位为 X 表示实验性编码器。
+        """
+        encoders, experimental = set(), set()
+        in_list = False
+        for line in output.splitlines():
+            parts = line.split()
+            if not in_list:
+                in_list = line.strip().startswith('------')
+                continue
+            if len(parts) < 2 or len(parts[0]) != 6:
+                continue
+            flags, name = parts[0], parts[1]
+            if flags[0] != 'A':
+                continue
+            encoders.add(name)
+            if flags[3] == 'X':
+                experimental.add(name)
+        return encoders, experimental
+
+    @staticmethod
+    def _parse_muxers(output):
+        """解析 `ffmpeg -muxers` 输出，返回可用封装器名称集合。"""
+        muxers = set()
+        in_list = False
+        for line in output.splitlines():
+            if not in_list:
+                in_list = line.strip().startswith('--')
+                continue
+            parts = line.split()
+            if len(parts) < 2 or 'E' not in parts[0]:
+                continue
+            muxers.update(parts[1].split(','))
+        return muxers
+
+    def resolve_encoder(self, codec):
+        """
+        为目标编码选择当前 FFmpeg 中可用的最佳编码器。
+        Args:
+            codec (str): 用户选择的目标编码 (e.g., "aac", "mp3", "opus", "flac")。
+        Returns:
+            str: FFmpeg 编码器名称；若能力探测失败则退回默认名称，
+                 若 FFmpeg 确实不支持该编码则返回 None。
+        """
+        codec = codec.lower()
+        candidates = ENCODER_PREFERENCES.get(codec, [codec])
+        capabilities = self.get_capabilities()
+        if capabilities is None:
+            # 无法探测时沿用历史默认值，由 FFmpeg 自行报错
+            return {"mp3": "libmp3lame", "opus": "libopus"}.get(codec, codec)
+        for encoder in candidates:
+            if encoder in capabilities['encoders']:
+                return encoder
+        return None
+
+    def validate_encoding_config(self, codec, output_format):
+        """
+        在批处理开始前检查目标编码器和输出封装器是否可用，避免每个音轨逐一失败。
+        Returns:
+            list: 问题描述列表，为空表示配置可行。
+        """
+        capabilities = self.get_capabilities()
+        if capabilities is None:
+            return ["FFmpeg/ffprobe 不可用"]
+        problems = []
+        if self.resolve_encoder(codec) is None:
+            candidates = ", ".join(ENCODER_PREFERENCES.get(codec.lower(), [codec]))
+            problems.append(f"当前 FFmpeg 不支持 {codec} 编码 (需要以下任一编码器: {candidates})")
+        muxer = OUTPUT_MUXERS.get(output_format.lower())
+        if muxer and muxer not in capabilities['muxers']:
+            problems.append(f"当前 FFmpeg 不支持 .{output_format} 输出 (缺少封装器 {muxer})")
+        return problems
 
     def probe_audio_tracks(self, file_path):
         """
         使用 ffprobe 探测指定文件中的所有音频轨道信息。
         Args:
-            file_path (str): 待探测的媒体文件路径。
+            file_path (str): 待探测的媒体文件路径，或 FFmpeg 可直接读取的 URL (如 http://)。
         Returns:
             list: 一个列表，每个元素是一个字典，包含 'index' (音轨索引), 'codec_name' (编码器名称),
-                  'language' (语言标签，如果有的话)。如果失败或无音轨，返回 None 或空列表。
+                  'language' (语言标签，如果有的话)，以及用于估算的 'duration' (秒), 'bit_rate' (bps),
+                  'sample_rate', 'channels'（未知时为 None），以及容器的章节列表 'chapters'
+                  (见 _parse_chapters，无章节时为空列表)。如果失败或无音轨，返回 None 或空列表。
         """
-        if not os.path.exists(file_path):
+        if not is_url(file_path) and not os.path.exists(file_path):
             self._log(f"[ERROR] 文件不存在，无法探测: {file_path}")
             return None
 
-        command = [
-            self.ffprobe_path,
-            "-v", "error", # 只输出错误信息到stderr
-            "-select_streams", "a", # 只选择音频流
-            "-show_entries", "stream=index,codec_name,codec_type,tags", # 增加 codec_type 字段
-            "-of", "json", # 输出为JSON格式
-            file_path
-        ]
+        command = self._build_probe_command(file_path)
+        self._thread_state.reason = None
         try:
-            result = subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8')
-            try:
-                data = json.loads(result.stdout)
-            except json.JSONDecodeError as je:
-                self._log(f"[ERROR] ffprobe 输出 JSON 解析失败: {je}")
-                self._log(f"ffprobe 原始输出: {result.stdout.strip()}")
-                return None
-
-            tracks = []
-            if 'streams' in data:
-                for stream in data['streams']:
-                    tracks.append({
-                        'index': stream['index'],
-                        'codec_name': stream['codec_name'],
-                        'codec_type': stream.get('codec_type', 'audio'),
-                        'language': stream.get('tags', {}).get('language', '未知') # 获取语言标签，如果没有则为'未知'
-                    })
-            return tracks
+            with trace_process("ffprobe", "probe", file=file_path):
+                result = subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8',
+                                        timeout=self.probe_timeout)
+            return self._parse_probe_output(result.stdout)
+        except subprocess.TimeoutExpired:
+            # 损坏的文件或卡住的网络读取，subprocess.run 已终止 ffprobe
+            self._thread_state.reason = f"ffprobe 探测超过 {self.probe_timeout:g} 秒"
+            self._log(f"[ERROR] ffprobe 探测 {file_path} 超时 ({self.probe_timeout:g} 秒)，已终止。", logging.ERROR)
+            return None
         except subprocess.CalledProcessError as cpe:
             self._log(f"[ERROR] ffprobe 探测 {file_path} 失败: {cpe.returncode}")
             self._log(f"ffprobe stdout: {cpe.stdout.strip() if cpe.stdout else ''}")
@@ -119,6 +500,66 @@ class FFmpegProcessor:
             self._log(f"[CRITICAL ERROR] ffprobe 探测时发生未知异常: {e}")
             return None
 
+    def _build_probe_command(self, file_path):
+        """构建探测音轨信息的 ffprobe 命令。"""
+        return [
+            self.ffprobe_path,
+            "-v", "error", # 只输出错误信息到stderr
+            "-select_streams", "a", # 只选择音频流
+            "-show_entries", "stream=index,codec_name,codec_type,sample_rate,channels,bit_rate,duration,tags:format=duration", # 增加 codec_type 及时长/码率字段
+            "-show_chapters", # 章节信息在容器头部，顺带读取几乎没有额外开销
+            "-of", "json", # 输出为JSON格式
+            file_path
+        ]
+
+    def _parse_probe_output(self, stdout):
+        """解析 ffprobe 的 JSON 输出为音轨信息列表，解析失败返回 None。"""
+        try:
+            data = json.loads(stdout)
+        except json.JSONDecodeError as je:
+            self._log(f"[ERROR] ffprobe 输出 JSON 解析失败: {je}")
+            self._log(f"ffprobe 原始输出: {stdout.strip()}")
+            return None
+
+        tracks = []
+        # MKV 等容器的音频流通常没有 duration 字段，退回到容器时长
+        format_duration = _to_float(data.get('format', {}).get('duration'))
+        chapters = self._parse_chapters(data.get('chapters', []))
+        if 'streams' in data:
+            for stream in data['streams']:
+                duration = _to_float(stream.get('duration'))
+                bit_rate = _to_float(stream.get('bit_rate') or stream.get('tags', {}).get('BPS'))
+                sample_rate = _to_float(stream.get('sample_rate'))
+                tracks.append({
+                    'index': stream['index'],
+                    'codec_name': stream['codec_name'],
+                    'codec_type': stream.get('codec_type', 'audio'),
+                    'language': stream.get('tags', {}).get('language', '未知'), # 获取语言标签，如果没有则为'未知'
+                    'duration': duration if duration is not None else format_duration,
+                    'bit_rate': int(bit_rate) if bit_rate is not None else None,
+                    'sample_rate': int(sample_rate) if sample_rate is not None else None,
+                    'channels': stream.get('channels'),
+                    'chapters': chapters,
+                })
+        return tracks
+
+    @staticmethod
+    def _parse_chapters(raw_chapters):
+        """
+        将 ffprobe 的章节列表整理为按起点排序的 [{'index', 'start', 'end', 'title'}]，
+        index 从 1 开始，时间为秒；时间无效的章节被忽略，没有标题时 title 为空字符串。
+        """
+        chapters = []
+        for chapter in raw_chapters:
+            start, end = _to_float(chapter.get('start_time')), _to_float(chapter.get('end_time'))
+            if start is None or end is None or end <= start:
+                continue
+            chapters.append({'start': start, 'end': end, 'title': chapter.get('tags', {}).get('title', '').strip()})
+        chapters.sort(key=lambda c: c['start'])
+        for index, chapter in enumerate(chapters, 1):
+            chapter['index'] = index
+        return chapters
+
     def _execute_ffmpeg_command(self, cmd_args, input_path, output_path, operation_desc):
         """
         执行 FFmpeg 命令并处理输出。
@@ -130,57 +571,178 @@ class FFmpegProcessor:
         Returns:
             bool: 命令执行成功返回 True，否则返回 False。
         """
-        full_command = [self.ffmpeg_path, '-y'] + cmd_args # 添加 -y 选项以自动覆盖输出文件
+        full_command = [self.ffmpeg_path, '-y'] + PROGRESS_ARGS + cmd_args # 添加 -y 选项以自动覆盖输出文件，进度供看门狗监视
         self._log(f"[CMD] {' '.join(full_command)}", level=logging.DEBUG) # 记录完整命令行
 
         try:
-            process = subprocess.Popen(
-                full_command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE, # FFmpeg的进度和错误信息通常在stderr
-                text=True, # 以文本模式处理输出
-                encoding='utf-8',
-                creationflags=subprocess.CREATE_NO_WINDOW if platform.system() == 'Windows' else 0
-            )
-
-            # 使用 communicate() 来安全地获取输出，避免死锁
-            stdout_output, stderr_output = process.communicate()
-
-            if process.returncode != 0:
-                # 如果FFmpeg返回非零码，说明执行失败
-                self._log(f"[ERROR] FFmpeg {operation_desc}失败 ({output_path}): 返回码 {process.returncode}")
-                self._log(f"FFmpeg stdout:\n{stdout_output.strip()}")
-                self._log(f"FFmpeg stderr:\n{stderr_output.strip()}")
-                return False
-            else:
-                self._log(f"[INFO] FFmpeg {operation_desc}成功 ({output_path})")
-                self._log(f"FFmpeg stdout:\n{stdout_output.strip()}")
-                self._log(f"FFmpeg stderr:\n{stderr_output.strip()}")
-                # 检查 stderr 中是否有实际错误，即使返回码为0
-                if 'error' in stderr_output.lower() and not 'error reading' in stderr_output.lower(): # 忽略不重要的读取错误
-                    self._log(f"[WARNING] FFmpeg 操作成功，但 stderr 中包含潜在错误信息:\n{stderr_output.strip()}")
-                return True
+            with trace_process("ffmpeg", "ffmpeg", operation=operation_desc, output=output_path) as trace_args:
+                result = self._run_watched(full_command, trace_args)
         except FileNotFoundError:
             self._log(f"[CRITICAL ERROR] FFmpeg 可执行文件 '{self.ffmpeg_path}' 未找到。请检查路径和权限。")
             return False
         except Exception as e:
             self._log(f"[CRITICAL ERROR] 执行 FFmpeg 命令时发生未知异常 ({operation_desc} {output_path}): {e}")
             return False
+        if result['reason']:
+            self._log_watchdog_kill(operation_desc, output_path, result)
+            return False
+        return self._check_ffmpeg_result(result['returncode'], "", result['stderr'], output_path, operation_desc)
 
-    def extract_aac_track(self, input_path, output_path, track_index):
+    def _run_watched(self, command, trace_args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                     progress_on_stderr=False, start_io=None, media_seconds=None):
         """
-        直接无损提取 AAC 音轨。
+        运行 FFmpeg 命令 (需带 PROGRESS_ARGS，或 progress_on_stderr 时带 STDERR_PROGRESS_ARGS)，
+        读取进度交给 ProgressWatchdog，无进度或超过总时限时终止子进程。
+        Args:
+            start_io (callable, optional): start_io(process) 启动额外的读写线程并返回需要等待的线程列表。
+            media_seconds (float, optional): 待处理的媒体时长，默认取 set_media_duration 设置的值，
+                                             都没有时从 stderr 的输入信息读取。
+        Returns:
+            dict: 'returncode', 'stderr' (不含进度行的文本), 'progress' (最后一个进度块，可能为 None)，
+                  以及 'reason' (被终止时的原因，否则为 None) 和 'elapsed' (秒)。
         """
-        cmd_args = [
-            "-i", input_path,
+        self._thread_state.reason = None
+        if media_seconds is None:
+            media_seconds = getattr(self._thread_state, 'media_seconds', None)
+        watchdog = ProgressWatchdog(self.stall_timeout, media_seconds)
+        state = {'progress': None}
+        stderr_lines = []
+
+        def feed_progress(fields):
+            state['progress'] = parse_progress_block(fields)
+            watchdog.feed(state['progress'])
+
+        def read_progress(stream):
+            fields = {}
+            for raw_line in stream:
+                key, sep, value = raw_line.decode('utf-8', errors='replace').strip().partition('=')
+                if not sep:
+                    continue
+                fields[key] = value
+                if key == 'progress':
+                    feed_progress(fields)
+                    fields = {}
+
+        def read_stderr(stream):
+            fields = {}
+            for raw_line in stream:
+                line = raw_line.decode('utf-8', errors='replace').rstrip('\r\n')
+                match = _PROGRESS_LINE_PATTERN.match(line) if progress_on_stderr else None
+                if match:
+                    fields[match.group(1)] = match.group(2)
+                    if match.group(1) == 'progress':
+                        feed_progress(fields)
+                        fields = {}
+                    continue
+                stderr_lines.append(line)
+                watchdog.feed_stderr_line(line)
+
+        process = subprocess.Popen(
+            command, stdin=stdin, stdout=stdout, stderr=subprocess.PIPE,
+            creationflags=subprocess.CREATE_NO_WINDOW if platform.system() == 'Windows' else 0
+        )
+        trace_args['child_pid'] = process.pid
+        threads = [threading.Thread(target=read_stderr, args=(process.stderr,), daemon=True)]
+        if process.stdout and not progress_on_stderr:
+            threads.append(threading.Thread(target=read_progress, args=(process.stdout,), daemon=True))
+        for thread in threads:
+            thread.start()
+        if start_io:
+            threads.extend(start_io(process))
+
+        cancel_event = getattr(self._thread_state, 'cancel_event', None)
+        reason = None
+        while True:
+            try:
+                process.wait(timeout=WATCHDOG_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                reason = "任务已取消" if cancel_event is not None and cancel_event.is_set() else watchdog.check()
+                if reason:
+                    process.kill() # 只终止这一个子进程，批处理中的其他任务不受影响
+                    process.wait()
+                    break
+        for thread in threads:
+            thread.join()
+        trace_args['returncode'] = process.returncode
+        if reason:
+            trace_args['killed'] = reason
+            self._thread_state.reason = reason
+        return {
+            'returncode': process.returncode,
+            'stderr': "\n".join(stderr_lines),
+            'progress': state['progress'],
+            'reason': reason,
+            'elapsed': time.monotonic() - watchdog.started_at,
+        }
+
+    def _log_watchdog_kill(self, operation_desc, output_path, result):
+        """记录被看门狗终止的命令。"""
+        self._log(f"[ERROR] FFmpeg {operation_desc}已终止 ({output_path}): {result['reason']}，"
+                  f"已运行 {result['elapsed']:.0f} 秒", logging.ERROR)
+        if result['stderr'].strip():
+            self._log(f"FFmpeg stderr:\n{result['stderr'].strip()}")
+
+    def _check_ffmpeg_result(self, returncode, stdout_output, stderr_output, output_path, operation_desc):
+        """根据 FFmpeg 返回码和输出记录日志，返回是否成功。"""
+        if returncode != 0:
+            # 如果FFmpeg返回非零码，说明执行失败
+            self._log(f"[ERROR] FFmpeg {operation_desc}失败 ({output_path}): 返回码 {returncode}")
+            self._log(f"FFmpeg stdout:\n{stdout_output.strip()}")
+            self._log(f"FFmpeg stderr:\n{stderr_output.strip()}")
+            return False
+        self._log(f"[INFO] FFmpeg {operation_desc}成功 ({output_path})")
+        self._log(f"FFmpeg stdout:\n{stdout_output.strip()}")
+        self._log(f"FFmpeg stderr:\n{stderr_output.strip()}")
+        # 检查 stderr 中是否有实际错误，即使返回码为0
+        if 'error' in stderr_output.lower() and not 'error reading' in stderr_output.lower(): # 忽略不重要的读取错误
+            self._log(f"[WARNING] FFmpeg 操作成功，但 stderr 中包含潜在错误信息:\n{stderr_output.strip()}")
+        return True
+
+    def _build_input_args(self, input_path, start=None, end=None, duration=None):
+        """
+        构建输入部分参数。指定时间范围时 -ss/-t 放在 -i 之前做输入端定位，
+        FFmpeg 直接跳到窗口附近读取，窗口外的数据既不读取也不解码：
+        流复制精确到数据包，重新编码时 FFmpeg 默认的 accurate_seek 会丢弃窗口前的解码样本，精确到采样。
+        时间范围无效时返回 None。
+        """
+        try:
+            start_seconds, length = resolve_time_window(start, end, duration)
+        except ValueError as e:
+            self._log(f"[ERROR] {e}")
+            return None
+        cmd_args = []
+        if start_seconds:
+            cmd_args.extend(["-ss", f"{start_seconds:.6f}"])
+        if length is not None:
+            cmd_args.extend(["-t", f"{length:.6f}"])
+        if cmd_args:
+            self._log(f"[INFO] 截取时间范围: 起点 {start_seconds:.3f}s, 时长 {'至结尾' if length is None else f'{length:.3f}s'}")
+        cmd_args.extend(["-i", input_path])
+        return cmd_args
+
+    def extract_aac_track(self, input_path, output_path, track_index, start=None, end=None, duration=None):
+        """
+        直接无损提取 AAC 音轨。可用 start/end/duration 只提取一段时间窗口。
+        """
+        cmd_args = self._build_extract_aac_args(input_path, output_path, track_index, start, end, duration)
+        if cmd_args is None:
+            return False
+        return self._execute_ffmpeg_command(cmd_args, input_path, output_path, "直接提取 AAC")
+
+    def _build_extract_aac_args(self, input_path, output_path, track_index, start=None, end=None, duration=None):
+        """构建直接提取 AAC 音轨的 FFmpeg 参数，时间范围无效时返回 None。"""
+        cmd_args = self._build_input_args(input_path, start, end, duration)
+        if cmd_args is None:
+            return None
+        return cmd_args + [
             "-map", f"0:a:{track_index}", # 明确指定音轨索引
             "-c:a", "copy", # 直接复制音频流，不重新编码
             "-movflags", "faststart", # 用于Web播放优化，适用于MP4/M4A
             output_path
         ]
-        return self._execute_ffmpeg_command(cmd_args, input_path, output_path, "直接提取 AAC")
 
-    def extract_raw_audio(self, input_path, output_path, track_index, codec_name=None):
+    def extract_raw_audio(self, input_path, output_path, track_index, codec_name=None, start=None, end=None, duration=None):
         """
         无损提取任意格式的原始音频。
         Args:
@@ -188,14 +750,24 @@ class FFmpegProcessor:
             output_path (str): 输出文件路径。
             track_index (int): 要提取的音轨索引。
             codec_name (str, optional): 原始音频编码名称，用于某些格式的容器推断。
+            start, end, duration (optional): 时间窗口（秒或 HH:MM:SS），留空表示整条音轨。
         Returns:
             bool: 操作成功返回 True，否则返回 False。
         """
-        cmd_args = [
-            "-i", input_path,
+        cmd_args = self._build_extract_raw_args(input_path, output_path, track_index, codec_name, start, end, duration)
+        if cmd_args is None:
+            return False
+        return self._execute_ffmpeg_command(cmd_args, input_path, output_path, f"无损提取原始音频 ({codec_name})")
+
+    def _build_extract_raw_args(self, input_path, output_path, track_index, codec_name=None, start=None, end=None, duration=None):
+        """构建无损提取原始音频的 FFmpeg 参数，时间范围无效时返回 None。"""
+        cmd_args = self._build_input_args(input_path, start, end, duration)
+        if cmd_args is None:
+            return None
+        cmd_args.extend([
             "-map", f"0:a:{track_index}",
             "-c:a", "copy" # 复制原始音频流
-        ]
+        ])
         
         # 针对特定无损格式（如原始PCM）可能需要额外指定输出容器，否则FFmpeg可能无法推断
         if codec_name:
@@ -208,30 +780,56 @@ class FFmpegProcessor:
             # 其他特殊格式可以按需添加
 
         cmd_args.append(output_path)
-        
-        return self._execute_ffmpeg_command(cmd_args, input_path, output_path, f"无损提取原始音频 ({codec_name})")
+        return cmd_args
 
-    def recode_audio(self, input_path, output_path, codec, bitrate=None, samplerate=None, channels=None, quality=None, track_index=None):
+    def recode_audio(self, input_path, output_path, codec, bitrate=None, samplerate=None, channels=None, quality=None, track_index=None,
+                     start=None, end=None, duration=None, audio_filter=None, resampler=None):
         """
         将音频重新编码为指定格式。
         Args:
             input_path (str): 输入文件路径。
             output_path (str): 输出文件路径。
-            codec (str): 目标音频编码器 (e.g., "aac", "libmp3lame", "libopus", "flac").
-                         注意：FFmpeg可能需要对应的库支持 (例如 mp3 需要 libmp3lame)。
+            codec (str): 目标音频编码 (e.g., "aac", "mp3", "opus", "flac").
+                         实际使用的编码器由 resolve_encoder 根据 FFmpeg 能力自动选择。
             bitrate (str, optional): 音频比特率 (e.g., "192k").
             samplerate (str, optional): 采样率 (e.g., "48000").
             channels (str, optional): 声道数 (e.g., "2").
             quality (str, optional): 质量参数 (具体含义取决于编码器)。
             track_index (int, optional): 如果是从原始媒体文件编码，指定音轨索引。
+            start, end, duration (optional): 时间窗口（秒或 HH:MM:SS），留空表示整条音轨。
+            audio_filter (str, optional): 编码前应用的音频滤镜 (-af)，如 build_loudnorm_filter 的结果。
+            resampler (str, optional): RESAMPLER_PRESETS 中的重采样器预设，只在设置了采样率时生效。
         Returns:
             bool: 操作成功返回 True，否则返回 False。
         """
-        cmd_args = ["-i", input_path]
+        cmd_args = self._build_recode_args(input_path, output_path, codec, bitrate, samplerate, channels, quality, track_index,
+                                           start, end, duration, audio_filter, resampler)
+        if cmd_args is None:
+            return False
+        return self._execute_ffmpeg_command(cmd_args, input_path, output_path, f"重新编码为 {codec}")
+
+    def _build_recode_args(self, input_path, output_path, codec, bitrate=None, samplerate=None, channels=None, quality=None, track_index=None,
+                           start=None, end=None, duration=None, audio_filter=None, resampler=None):
+        """构建重新编码的 FFmpeg 参数，目标编码不可用或时间范围无效时返回 None。"""
+        cmd_args = self._build_input_args(input_path, start, end, duration)
+        if cmd_args is None:
+            return None
         if track_index is not None:
             # 如果是从原始媒体文件直接提取并编码，需要指定音轨
             cmd_args.extend(["-map", f"0:a:{track_index}"]) 
             self._log(f"[INFO] 从音轨 {track_index} 提取并编码。")
+        output_args = self._build_encode_output_args(output_path, codec, bitrate, samplerate, channels, quality, audio_filter, resampler)
+        if output_args is None:
+            return None
+        return cmd_args + output_args
+
+    def _build_encode_output_args(self, output_path, codec, bitrate=None, samplerate=None, channels=None, quality=None,
+                                  audio_filter=None, resampler=None):
+        """
+        构建单个编码输出的参数 (滤镜、编码器、码率、采样率、声道、质量及输出路径)，目标编码不可用时返回 None。
+        samplerate/channels 应为 resolve_output_format 的结果；设置了采样率时按 resampler 预设重采样。
+        """
+        cmd_args = []
 
         # 音频编码器设置
         # 注意：FFmpeg内置的AAC编码器通常是'aac'，但如果编译时支持libfdk_aac，则用'libfdk_aac'
@@ -240,14 +838,16 @@ class FFmpegProcessor:
         # FLAC是内置的，编码器名为'flac'
         # AC3是内置的，编码器名为'ac3'
         
-        # 默认使用通用名称，如果用户安装的FFmpeg不支持，可能需要更精确的名称
-        ffmpeg_codec_name = codec.lower()
-        if ffmpeg_codec_name == "mp3":
-            ffmpeg_codec_name = "libmp3lame" # 推荐使用libmp3lame获取更好质量
-        elif ffmpeg_codec_name == "opus":
-            ffmpeg_codec_name = "libopus" # 推荐使用libopus
+        # 按能力探测结果选择最佳可用编码器（如 libfdk_aac 优先于内置 aac）
+        ffmpeg_codec_name = self.resolve_encoder(codec)
+        if ffmpeg_codec_name is None:
+            self._log(f"[ERROR] 当前 FFmpeg 不支持 {codec} 编码，跳过: {output_path}")
+            return None
         
         cmd_args.extend(["-c:a", ffmpeg_codec_name]) 
+        capabilities = self.get_capabilities()
+        if capabilities and ffmpeg_codec_name in capabilities['experimental_encoders']:
+            cmd_args.extend(["-strict", "experimental"]) # 内置 opus 等实验性编码器需要显式允许
 
         # 比特率设置（自动补全单位）
         if bitrate:
@@ -276,7 +876,11 @@ class FFmpegProcessor:
         
         # 质量参数 (CRF/VBR/压缩级别)
         if quality:
-            if ffmpeg_codec_name == "aac":
+            if ffmpeg_codec_name == "libfdk_aac":
+                # libfdk_aac 的 VBR 模式，-vbr N，N=1-5
+                cmd_args.extend(["-vbr", quality])
+                self._log(f"[INFO] {codec} 编码使用质量参数 -vbr {quality}")
+            elif ffmpeg_codec_name in ("aac", "aac_at"):
                 # 对于FFmpeg内置的AAC编码器，-q:a 是质量参数 (VBR)
                 # 范围通常是 0.1-2 (高到低质量)，但有时也用0-100%或CRF风格值，具体取决于FFmpeg版本和编译选项
                 # 对于libfdk_aac (如果可用且编译支持)，是 -vbr N，N=1-5
@@ -304,10 +908,338 @@ class FFmpegProcessor:
             else:
                 self._log(f"[WARNING] 编码器 {codec} 不支持或不需要 '质量' 参数。")
         
+        # 音频滤镜（如响度标准化），需要重采样时在滤镜链末尾按预设重采样
+        filters = [audio_filter] if audio_filter else []
+        resample_filter = self._build_resample_filter(samplerate, resampler)
+        if resample_filter:
+            filters.append(resample_filter)
+        if filters:
+            cmd_args.extend(["-af", ",".join(filters)])
+
         # 最终输出文件
         cmd_args.append(output_path)
-        
-        return self._execute_ffmpeg_command(cmd_args, input_path, output_path, f"重新编码为 {codec}")
+        return cmd_args
+
+    def _build_resample_filter(self, samplerate, resampler=None):
+        """按重采样器预设构建 aresample 滤镜；未设置采样率或使用默认重采样器时返回 None。"""
+        options = RESAMPLER_PRESETS.get(resampler or "swr")
+        if not samplerate or not options:
+            return None
+        if "soxr" in options:
+            capabilities = self.get_capabilities()
+            if capabilities and "--enable-libsoxr" not in capabilities['configuration']:
+                self._log(f"[WARNING] 当前 FFmpeg 未编译 libsoxr，重采样器 {resampler} 不可用，改用默认重采样器。", logging.WARNING)
+                return None
+        self._log(f"[INFO] 重采样到 {samplerate} Hz，重采样器: {resampler}")
+        return f"aresample={samplerate}:{options}"
+
+    def recode_audio_multi(self, input_path, outputs, track_index=None, start=None, end=None, duration=None, audio_filter=None):
+        """
+        一次解码、多路编码：在同一个 FFmpeg 进程中把音轨同时编码为多个目标格式。
+        FFmpeg 对同一输入流只解码一次，解码后的音频分发给各路输出的编码器。
+        Args:
+            input_path (str): 输入文件路径。
+            outputs (list): 每路输出一个字典，包含 'output_path', 'codec'，
+                            以及可选的 'bitrate', 'samplerate', 'channels', 'quality', 'resampler'。
+            track_index (int, optional): 从原始媒体文件编码时指定音轨索引。
+            start, end, duration (optional): 时间窗口（秒或 HH:MM:SS），对所有输出生效。
+            audio_filter (str, optional): 对所有输出生效的音频滤镜 (-af)。
+        Returns:
+            list: 与 outputs 顺序一致的 bool 列表，表示每路输出是否成功。
+        """
+        cmd_args, runnable = self._build_recode_multi_args(input_path, outputs, track_index, start, end, duration, audio_filter)
+        if cmd_args is None:
+            return [False] * len(outputs)
+        codecs = ", ".join(outputs[i]['codec'] for i in runnable)
+        success = self._execute_ffmpeg_command(cmd_args, input_path, outputs[runnable[0]]['output_path'], f"多路编码为 {codecs}")
+        return self._collect_multi_results(outputs, runnable, success)
+
+    def _build_recode_multi_args(self, input_path, outputs, track_index=None, start=None, end=None, duration=None, audio_filter=None):
+        """
+        构建多路输出的 FFmpeg 参数。当前 FFmpeg 不支持的输出会被剔除，不影响其余输出。
+        Returns:
+            tuple: (参数列表, 实际参与编码的输出下标列表)；没有可执行的输出时参数列表为 None。
+        """
+        cmd_args = self._build_input_args(input_path, start, end, duration)
+        if cmd_args is None:
+            return None, []
+        runnable = []
+        for i, output in enumerate(outputs):
+            output_args = self._build_encode_output_args(
+                output['output_path'], output['codec'], output.get('bitrate'), output.get('samplerate'),
+                output.get('channels'), output.get('quality'), audio_filter, output.get('resampler'))
+            if output_args is None:
+                continue
+            if track_index is not None:
+                cmd_args.extend(["-map", f"0:a:{track_index}"]) # 每路输出都映射同一条音轨
+            cmd_args.extend(output_args)
+            runnable.append(i)
+        if not runnable:
+            return None, []
+        if track_index is not None:
+            self._log(f"[INFO] 从音轨 {track_index} 提取并一次解码编码为 {len(runnable)} 种格式。")
+        return cmd_args, runnable
+
+    def _collect_multi_results(self, outputs, runnable, success):
+        """FFmpeg 成功后逐个确认输出文件非空，得到每路输出的结果。"""
+        results = [False] * len(outputs)
+        for i in runnable:
+            output_path = outputs[i]['output_path']
+            results[i] = success and os.path.exists(output_path) and os.path.getsize(output_path) > 0
+            if success and not results[i]:
+                self._log(f"[ERROR] 多路编码输出为空: {output_path}")
+        return results
+
+    def split_audio(self, input_path, outputs, track_index=None, start=None, end=None, duration=None, audio_filter=None):
+        """
+        按章节拆分：在同一个 FFmpeg 进程中只读取一次输入，每个章节作为一路输出，
+        以输出端 -ss/-to 截取自己的时间段（编码时精确到采样，流复制时精确到数据包）。
+        Args:
+            input_path (str): 输入文件路径。
+            outputs (list): 每路输出一个字典，包含 'output_path', 'codec' ('copy' 表示流复制)，
+                            'chapter_start'/'chapter_end' (相对时间窗口起点的秒数，None 表示从开头/到结尾)，
+                            以及编码时可选的 'bitrate', 'samplerate', 'channels', 'quality', 'resampler'。
+            track_index (int, optional): 从原始媒体文件拆分时指定音轨索引。
+            start, end, duration (optional): 时间窗口（秒或 HH:MM:SS），章节时间以窗口起点为 0。
+            audio_filter (str, optional): 对所有编码输出生效的音频滤镜 (-af)。
+        Returns:
+            list: 与 outputs 顺序一致的 bool 列表，表示每路输出是否成功。
+        """
+        cmd_args, runnable = self._build_split_args(input_path, outputs, track_index, start, end, duration, audio_filter)
+        if cmd_args is None:
+            return [False] * len(outputs)
+        success = self._execute_ffmpeg_command(cmd_args, input_path, outputs[runnable[0]]['output_path'],
+                                               f"按章节拆分为 {len(runnable)} 个文件")
+        return self._collect_multi_results(outputs, runnable, success)
+
+    def _build_split_args(self, input_path, outputs, track_index=None, start=None, end=None, duration=None, audio_filter=None):
+        """
+        构建按章节拆分的 FFmpeg 参数，当前 FFmpeg 不支持的编码输出会被剔除。
+        每路输出不复制源文件的章节列表 (否则每个文件都带有全部章节标记)，标题设为该章节的标题。
+        Returns:
+            tuple: (参数列表, 实际参与的输出下标列表)；没有可执行的输出时参数列表为 None。
+        """
+        cmd_args = self._build_input_args(input_path, start, end, duration)
+        if cmd_args is None:
+            return None, []
+        runnable = []
+        for i, output in enumerate(outputs):
+            seek_args = []
+            if output.get('chapter_start'):
+                seek_args.extend(["-ss", f"{output['chapter_start']:.6f}"])
+            if output.get('chapter_end') is not None:
+                seek_args.extend(["-to", f"{output['chapter_end']:.6f}"])
+            if output['codec'] == 'copy':
+                output_args = ["-c:a", "copy", "-movflags", "faststart", output['output_path']]
+            else:
+                output_args = self._build_encode_output_args(
+                    output['output_path'], output['codec'], output.get('bitrate'), output.get('samplerate'),
+                    output.get('channels'), output.get('quality'), audio_filter, output.get('resampler'))
+                if output_args is None:
+                    continue
+            title = output.get('chapter_title') or (f"第 {output['chapter_index']} 章" if 'chapter_index' in output else None)
+            output_args[-1:-1] = ["-map_chapters", "-1"] + (["-metadata", f"title={title}"] if title else [])
+            if track_index is not None:
+                cmd_args.extend(["-map", f"0:a:{track_index}"])
+            cmd_args.extend(seek_args + output_args)
+            runnable.append(i)
+        if not runnable:
+            return None, []
+        self._log(f"[INFO] 一次读取输入，按章节拆分为 {len(runnable)} 个文件。")
+        return cmd_args, runnable
+
+    def transcode_stream(self, source, sink, codec, output_format=None, track_index=0, bitrate=None, samplerate=None,
+                         channels=None, quality=None, resampler=None, start=None, end=None, duration=None):
+        """
+        流式转换：输入和输出都可以是流，不需要中间文件，便于接在下载和上传之间。
+        Args:
+            source: 输入。文件路径、FFmpeg 可直接读取的 URL (如本地 HTTP 服务)，或可读的二进制文件对象/管道 (经 pipe:0 输入)。
+            sink: 输出。文件路径，或可写的二进制文件对象/管道 (经 pipe:1 输出)。
+            codec (str): 目标编码，"copy" 表示不重新编码。
+            output_format (str, optional): 输出封装 (STREAM_OUTPUT_ARGS 的键)，输出到流时必需；默认按 codec 推断。
+            track_index (int): 音轨索引。
+            bitrate, samplerate, channels, quality, resampler: 同 recode_audio；流输入无法预先探测源参数，留空即保持源参数。
+            start, end, duration (optional): 时间窗口（秒或 HH:MM:SS）。
+        无缓冲文件对象 (FileIO) 和写缓冲直接作为 FFmpeg 的 stdin/stdout，其余对象由转发线程按块复制。
+        Returns:
+            bool: 操作成功返回 True，否则返回 False；FFmpeg 返回 0 但没有输出任何音频 (如管道输入无法解析) 也视为失败。
+        """
+        stream_in = not isinstance(source, str)
+        stream_out = not isinstance(sink, str)
+        output_format = (output_format or {"aac": "m4a"}.get(codec, codec)).lower()
+        if stream_out and output_format not in STREAM_OUTPUT_ARGS:
+            self._log(f"[ERROR] 不支持以 {output_format} 格式输出到流，可用格式: {', '.join(STREAM_OUTPUT_ARGS)}")
+            return False
+        cmd_args = self._build_input_args("pipe:0" if stream_in else source, start, end, duration)
+        if cmd_args is None:
+            return False
+        cmd_args.extend(["-map", f"0:a:{track_index}"])
+        output_path = "pipe:1" if stream_out else sink
+        if codec == "copy":
+            output_args = ["-c:a", "copy", output_path]
+        else:
+            samplerate, channels = resolve_output_format(codec, samplerate, channels)
+            output_args = self._build_encode_output_args(output_path, codec, bitrate, samplerate, channels, quality,
+                                                         resampler=resampler)
+            if output_args is None:
+                return False
+        if stream_out:
+            output_args[-1:-1] = STREAM_OUTPUT_ARGS[output_format]
+        _, media_seconds = resolve_time_window(start, end, duration) # 已由 _build_input_args 校验
+        return self._execute_stream_command(cmd_args + output_args, source if stream_in else None,
+                                            sink if stream_out else None, f"流式转换为 {codec}",
+                                            media_seconds=media_seconds)
+
+    def _execute_stream_command(self, cmd_args, source=None, sink=None, operation_desc="流式转换", media_seconds=None):
+        """
+        执行读写管道的 FFmpeg 命令。source/sink 为流时接到子进程的 stdin/stdout：
+        能直接传递文件描述符时由 FFmpeg 自己读写，否则各用一个线程以 forward_stream 转发。
+        stdout 可能用于媒体数据，进度改写到 stderr 供看门狗监视。media_seconds 为截取窗口的时长 (见 _run_watched)。
+        """
+        full_command = [self.ffmpeg_path, '-y'] + (['-nostdin'] if source is None else []) + STDERR_PROGRESS_ARGS + cmd_args
+        self._log(f"[CMD] {' '.join(full_command)}", level=logging.DEBUG)
+        in_fd = _stream_fileno(source, writable=False) if source is not None else None
+        out_fd = _stream_fileno(sink, writable=True) if sink is not None else None
+        stdin = subprocess.DEVNULL if source is None else (in_fd if in_fd is not None else subprocess.PIPE)
+        stdout = subprocess.DEVNULL if sink is None else (out_fd if out_fd is not None else subprocess.PIPE)
+        target = "pipe:1" if sink is not None else cmd_args[-1]
+        counts = {}
+        errors = []
+
+        def pump_input(process):
+            try:
+                counts['in'] = forward_stream(source, process.stdin)
+            except BrokenPipeError:
+                pass  # FFmpeg 已不再需要输入 (如到达截取终点或出错退出)
+            except Exception as e:
+                errors.append(f"读取输入流失败: {e}")
+                process.kill()
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+        def pump_output(process):
+            try:
+                counts['out'] = forward_stream(process.stdout, sink)
+            except Exception as e:
+                errors.append(f"写入输出流失败: {e}")
+                process.kill()
+
+        def start_io(process):
+            threads = []
+            if process.stdout:
+                threads.append(threading.Thread(target=pump_output, args=(process,), daemon=True))
+                threads[-1].start()
+            if process.stdin:
+                # 不等待输入线程：FFmpeg 提前结束时它在下一次写入时因管道断开退出，不应阻塞在慢速的上游读取上
+                threading.Thread(target=pump_input, args=(process,), daemon=True).start()
+            return threads
+
+        try:
+            with trace_process("ffmpeg", "ffmpeg", operation=operation_desc, output=target) as trace_args:
+                result = self._run_watched(full_command, trace_args, stdin=stdin, stdout=stdout,
+                                           progress_on_stderr=True, start_io=start_io,
+                                           media_seconds=media_seconds)
+        except FileNotFoundError:
+            self._log(f"[CRITICAL ERROR] FFmpeg 可执行文件 '{self.ffmpeg_path}' 未找到。请检查路径和权限。")
+            return False
+        except Exception as e:
+            self._log(f"[CRITICAL ERROR] 执行 FFmpeg 命令时发生未知异常 ({operation_desc} {target}): {e}")
+            return False
+        if result['reason']:
+            self._log_watchdog_kill(operation_desc, target, result)
+            return False
+        if errors:
+            self._log(f"[ERROR] FFmpeg {operation_desc}失败 ({target}): {'; '.join(errors)}")
+            return False
+        if 'out' in counts:
+            self._log(f"[INFO] 输出流写出 {counts['out']} 字节")
+        if not self._check_ffmpeg_result(result['returncode'], "", result['stderr'], target, operation_desc):
+            return False
+        # 管道输入无法读取 (如 moov 在末尾的 MP4) 时 FFmpeg 报告 "Output file is empty" 但仍返回 0
+        progress = result['progress'] or {}
+        if not progress.get('out_time') or counts.get('out') == 0:
+            self._log(f"[ERROR] FFmpeg {operation_desc}没有产生任何音频 ({target}): 输出时长 {progress.get('out_time')}，"
+                      f"输出大小 {progress.get('total_size')}，写出 {counts.get('out', '-')} 字节", logging.ERROR)
+            return False
+        return True
+
+    def analyze_loudness(self, input_path, track_index=None, start=None, end=None, duration=None, target=None,
+                         media_seconds=None):
+        """
+        响度标准化的第一遍：用 loudnorm 分析音轨（EBU R128），不产生输出文件。
+        Args:
+            input_path (str): 输入文件路径。
+            track_index (int, optional): 音轨索引 (0:a:N)。
+            start, end, duration (optional): 时间窗口，应与编码时一致。
+            target (dict, optional): 目标 {'I', 'TP', 'LRA'}，默认 LOUDNORM_TARGET。
+            media_seconds (float, optional): 窗口内的音轨时长，用于看门狗总时限 (见 _run_watched)。
+        Returns:
+            dict: LOUDNORM_MEASURED_KEYS 中的测量值 (float) 及分析时的 'target'；失败时返回 None。
+        """
+        target = dict(target or LOUDNORM_TARGET)
+        cmd_args = self._build_input_args(input_path, start, end, duration)
+        if cmd_args is None:
+            return None
+        if track_index is not None:
+            cmd_args.extend(["-map", f"0:a:{track_index}"])
+        cmd_args.extend([
+            "-af", f"loudnorm=I={target['I']}:TP={target['TP']}:LRA={target['LRA']}:print_format=json",
+            "-f", "null", "-"
+        ])
+        command = [self.ffmpeg_path, '-nostdin', '-hide_banner'] + PROGRESS_ARGS + cmd_args
+        self._log(f"[CMD] {' '.join(command)}", level=logging.DEBUG)
+        try:
+            with trace_process("ffmpeg 响度分析", "loudness", input=input_path, track=track_index) as trace_args:
+                result = self._run_watched(command, trace_args, media_seconds=media_seconds)
+        except Exception as e:
+            self._log(f"[CRITICAL ERROR] 响度分析时发生未知异常 ({input_path}): {e}")
+            return None
+        if result['reason']:
+            self._log_watchdog_kill("响度分析", input_path, result)
+            return None
+        if result['returncode'] != 0:
+            self._log(f"[ERROR] 响度分析失败 ({input_path}): 返回码 {result['returncode']}")
+            self._log(f"FFmpeg stderr:\n{result['stderr'].strip()}")
+            return None
+        # loudnorm 在处理结束时把测量结果以 JSON 打印到 stderr
+        blocks = re.findall(r"\{[^{}]*\}", result['stderr'])
+        try:
+            data = json.loads(blocks[-1])
+        except (IndexError, json.JSONDecodeError):
+            self._log(f"[ERROR] 无法解析响度分析结果 ({input_path}):\n{result['stderr'].strip()}")
+            return None
+        measured = {key: _to_float(data.get(key)) for key in LOUDNORM_MEASURED_KEYS}
+        measured['target'] = target
+        return measured
+
+    def decode_audio_output(self, output_path, media_seconds=None):
+        """
+        将输出文件的第一条音轨完整解码到空输出 (-f null)，用于校验文件是否可完整解码。
+        Args:
+            output_path (str): 待校验的输出文件路径。
+            media_seconds (float, optional): 预期的输出时长，用于看门狗总时限 (-v error 时 stderr 中没有时长信息)。
+        Returns:
+            dict: 'returncode', 'decoded_seconds' (实际解码出的媒体秒数，未知时为 None)
+                  和 'errors' (解码过程中 FFmpeg 报告的错误文本；被看门狗终止时为终止原因)。
+        """
+        command = [self.ffmpeg_path, '-nostdin', '-v', 'error'] + PROGRESS_ARGS + [
+            '-i', output_path,
+            '-map', '0:a:0',
+            '-f', 'null', '-'
+        ]
+        self._log(f"[CMD] {' '.join(command)}", level=logging.DEBUG)
+        with trace_process("ffmpeg 校验解码", "verify", output=output_path) as trace_args:
+            result = self._run_watched(command, trace_args, media_seconds=media_seconds)
+        # 取最后一个进度块的输出时长
+        progress = result['progress']
+        return {
+            'returncode': result['returncode'],
+            'decoded_seconds': progress['out_time'] if progress else None,
+            'errors': f"解码已终止: {result['reason']}" if result['reason'] else result['stderr'].strip(),
+        }
 
     def get_common_audio_extension(self, codec_name):
         """
@@ -0,0 +1,131 @@
+import os
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt, QTimer
+from PySide6.QtGui import QBrush, QColor
+
+# 合并状态更新的间隔 (毫秒)：期间收到的更新只触发一次 dataChanged
+FLUSH_INTERVAL_MS = 100
+
+# 文件状态 -> 显示文本
+STATUS_LABELS = {
+    "pending": "未探测",
+    "probing": "探测中",
+    "probed": "已探测",
+    "probe_failed": "探测失败",
+    "queued": "等待处理",
+    "processing": "处理中",
+    "done": "完成",
+    "failed": "失败",
+}
+
+# 需要醒目显示的状态
+STATUS_COLORS = {
+    "probe_failed": QColor("#c0392b"),
+    "failed": QColor("#c0392b"),
+    "done": QColor("#27ae60"),
+    "processing": QColor("#2980b9"),
+}
+
+
+def summarize_tracks(tracks_info, limit=3):
+    """将探测结果概括为 '2 条音轨: aac(jpn), ac3(eng)'，超过 limit 条时省略其余。"""
+    if not tracks_info:
+        return "无音轨"
+    parts = [f"{t['codec_name']}({t.get('language', '未知')})" for t in tracks_info[:limit]]
+    if len(tracks_info) > limit:
+        parts.append("...")
+    return f"{len(tracks_info)} 条音轨: {', '.join(parts)}"
+
+
+class FileListModel(QAbstractListModel):
+    """
+    文件列表模型，配合 QListView 使用。每行显示文件名、探测/处理状态、音轨概要和进度。
+    只为有状态的文件保存状态字典，显示文本在视图绘制可见行时才生成，适合数万个文件的选择。
+    状态更新 (update_file) 先暂存，由定时器合并后一次性通知视图。
+    """
+    PathRole = Qt.ItemDataRole.UserRole + 1
+    StatusRole = Qt.ItemDataRole.UserRole + 2
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._paths = []
+        self._rows = {}     # 路径 -> 行号
+        self._states = {}   # 路径 -> {'status', 'tracks', 'progress'}
+        self._pending = {}  # 路径 -> 尚未应用的字段
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(FLUSH_INTERVAL_MS)
+        self._flush_timer.timeout.connect(self.flush)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._paths)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._paths):
+            return None
+        path = self._paths[index.row()]
+        state = self._states.get(path, {})
+        status = state.get("status", "pending")
+        if role == Qt.ItemDataRole.DisplayRole:
+            text = f"{os.path.basename(path)}    [{STATUS_LABELS.get(status, status)}]"
+            if state.get("tracks"):
+                text += f"  {state['tracks']}"
+            progress = state.get("progress")
+            if progress and status == "processing":
+                text += f"  ({progress[0]}/{progress[1]})"
+            return text
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return path
+        if role == Qt.ItemDataRole.ForegroundRole:
+            color = STATUS_COLORS.get(status)
+            return QBrush(color) if color else None
+        if role == self.PathRole:
+            return path
+        if role == self.StatusRole:
+            return status
+        return None
+
+    def set_files(self, paths):
+        """替换整个文件列表，清除所有状态。"""
+        self.beginResetModel()
+        self._paths = list(paths)
+        self._rows = {path: row for row, path in enumerate(self._paths)}
+        self._states = {}
+        self._pending = {}
+        self.endResetModel()
+
+    def paths(self):
+        return list(self._paths)
+
+    def update_file(self, path, fields):
+        """
+        记录一个文件的状态变化，可在主线程中频繁调用（通常由工作线程信号触发）。
+        Args:
+            path (str): 文件路径，不在列表中时忽略。
+            fields (dict): 'status'、'tracks' (音轨概要文本)、'progress' ((已完成, 总数)) 中的任意项。
+        """
+        if path not in self._rows:
+            return
+        self._pending.setdefault(path, {}).update(fields)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def mark_all(self, status):
+        """将所有文件设置为同一状态（如开始处理前的“等待处理”），只通知一次视图。"""
+        self._flush_timer.stop()
+        self.flush()
+        for path in self._paths:
+            self._states.setdefault(path, {})["status"] = status
+        if self._paths:
+            self.dataChanged.emit(self.index(0), self.index(len(self._paths) - 1))
+
+    def flush(self):
+        """应用暂存的更新，并以覆盖所有变化行的单个区间通知视图。"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        rows = []
+        for path, fields in pending.items():
+            self._states.setdefault(path, {}).update(fields)
+            rows.append(self._rows[path])
+        self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)))
@@ -5,6 +5,8 @@ from datetime import datetime
 from PySide6.QtWidgets import QTextEdit
 from typing import Optional
 
+from trace_utils import trace_span
+
 class AppLogger:
     def __init__(self, name="AudioProcessor", log_file_name="processing_log.txt", log_to_file=True, gui_log_display: Optional[QTextEdit] = None):
         self.logger = logging.getLogger(name)
@@ -18,7 +20,7 @@ class AppLogger:
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 
         if log_to_file:
-            file_handler = logging.FileHandler(self.log_file_path, encoding='utf-8')
+            file_handler = logging.FileHandler(self.log_file_path, encoding='utf-8', delay=True) # 写入第一条日志时才打开文件
             file_handler.setFormatter(formatter)
             self.logger.addHandler(file_handler)
         
@@ -28,11 +30,12 @@ class AppLogger:
 
     def log_gui_message(self, message, level=logging.INFO):
         """向GUI发送日志消息并同时记录到文件。"""
-        if self.gui_log_display:
-            self.gui_log_display.append(message)
-            self.gui_log_display.verticalScrollBar().setValue(self.gui_log_display.verticalScrollBar().maximum())
+        with trace_span("日志写入", "gui"):
+            if self.gui_log_display:
+                self.gui_log_display.append(message)
+                self.gui_log_display.verticalScrollBar().setValue(self.gui_log_display.verticalScrollBar().maximum())
 
-        self.logger.log(level, message)
+            self.logger.log(level, message)
 
     def log_success(self, original_file, track_index, output_file_path, operation_type):
         log_msg = (
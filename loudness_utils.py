@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from ffmpeg_utils import LOUDNORM_TARGET
+
+# 响度分析结果缓存文件
+LOUDNESS_CACHE_FILE = os.path.join(tempfile.gettempdir(), "video2acc_cache", "loudness.json")
+
+
+def loudness_key(fingerprint, job):
+    """由源文件指纹、音轨索引和时间窗口组成的键；与编码参数无关，改变编码设置后仍可复用。"""
+    time_range = job["steps"][0].get("time_range") or {}
+    return f"{fingerprint}:{job['audio_track_index']}:{json.dumps(time_range, sort_keys=True)}"
+
+
+def job_needs_loudness(job):
+    """只有编码步骤需要响度分析，直接复制/无损提取的音轨保持原样。"""
+    return any(step["action"] == "encode" for step in job["steps"])
+
+
+class LoudnessCache:
+    """以 JSON 持久化的响度测量值缓存，键见 loudness_key。"""
+    def __init__(self, cache_file=LOUDNESS_CACHE_FILE):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, measured):
+        with self._lock:
+            self._entries[key] = measured
+            data = dict(self._entries)
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_path = self.cache_file + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_file)
+        except OSError:
+            pass # 缓存只用于加速，写入失败不影响处理
+
+
+class LoudnessAnalyzer:
+    """
+    两遍响度标准化中的分析遍。测量值按源文件指纹 + 音轨索引缓存，后续运行直接复用；
+    prefetch() 在后台线程分析下一条音轨，与当前音轨的编码重叠。
+    """
+    def __init__(self, processor, cache=None, target=None, log=None):
+        """
+        Args:
+            processor (FFmpegProcessor): 执行分析命令的处理器。
+            cache (LoudnessCache, optional): 测量值缓存，为空时不缓存。
+            target (dict, optional): 响度目标 {'I', 'TP', 'LRA'}，默认 LOUDNORM_TARGET。
+            log (callable, optional): 日志回调，签名为 log(message, level)。
+        """
+        self.processor = processor
+        self.cache = cache
+        self.target = dict(target or LOUDNORM_TARGET)
+        self.log = log
+        self._lock = threading.Lock()
+        self._pending = {}  # 任务标识 -> Future
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="loudness")
+
+    def _log(self, message, level=logging.INFO):
+        if self.log:
+            self.log(message, level)
+
+    @staticmethod
+    def _job_id(job):
+        return (job["file_path"], job["audio_track_index"])
+
+    def prefetch(self, job):
+        """在后台分析任务的音轨；无需分析或已在分析中时不做任何事。"""
+        if not job_needs_loudness(job):
+            return
+        job_id = self._job_id(job)
+        with self._lock:
+            if job_id in self._pending:
+                return
+            future = Future()
+            self._pending[job_id] = future
+        self._executor.submit(self._run, job, future)
+
+    def measure(self, job):
+        """
+        返回任务音轨的测量值：优先取缓存，其次等待进行中的预分析，否则在当前线程分析。
+        Returns:
+            dict: FFmpegProcessor.analyze_loudness 的结果，分析失败时返回 None。
+        """
+        job_id = self._job_id(job)
+        with self._lock:
+            future = self._pending.get(job_id)
+            if future is None:
+                future = Future()
+                self._pending[job_id] = future
+                owner = True
+            else:
+                owner = False
+        if owner:
+            self._run(job, future)
+        measured = future.result()
+        with self._lock:
+            self._pending.pop(job_id, None)
+        return measured
+
+    def _run(self, job, future):
+        try:
+            future.set_result(self._analyze(job))
+        except Exception as e:
+            self._log(f"[ERROR] 响度分析异常 ({os.path.basename(job['file_path'])} 音轨 {job['track_index']}): {e}", logging.ERROR)
+            future.set_result(None)
+
+    def _analyze(self, job):
+        key = loudness_key(job["fingerprint"], job) if self.cache and job.get("fingerprint") else None
+        if key:
+            measured = self.cache.get(key)
+            if measured:
+                self._log(f"[INFO] 使用缓存的响度分析结果: {os.path.basename(job['file_path'])} 音轨 {job['track_index']} "
+                          f"({measured['input_i']} LUFS)")
+                return measured
+        # 总是从源音轨分析（直接提取模式下中间文件此时可能尚未生成），与缓存键一致
+        first_step = job["steps"][0]
+        measured = self.processor.analyze_loudness(
+            first_step["input_path"], job["audio_track_index"], target=self.target,
+            media_seconds=job.get("duration"), **(first_step.get("time_range") or {}))
+        if measured is None:
+            return None
+        self._log(f"[INFO] 响度分析完成: {os.path.basename(job['file_path'])} 音轨 {job['track_index']} "
+                  f"综合响度 {measured['input_i']} LUFS, 真峰值 {measured['input_tp']} dBTP, 响度范围 {measured['input_lra']} LU")
+        if key:
+            self.cache.put(key, measured)
+        return measured
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
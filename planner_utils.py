@@ -0,0 +1,746 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import logging
+
+from cache_utils import result_cache_key
+from ffmpeg_utils import KEEP_SOURCE, build_loudnorm_filter, resolve_output_format, resolve_time_window
+from loudness_utils import LoudnessAnalyzer
+from trace_utils import trace_span
+
+# 历史吞吐量统计文件，与日志放在同一临时目录下
+STATS_FILE = os.path.join(tempfile.gettempdir(), "video2acc_logs", "throughput_stats.json")
+
+# 无历史数据时使用的保守实时倍速 (媒体秒 / 墙钟秒)
+DEFAULT_REALTIME_FACTORS = {
+    "copy": 300.0,
+    "remux": 300.0,
+    "encode:aac": 40.0,
+    "encode:mp3": 35.0,
+    "encode:opus": 45.0,
+    "encode:flac": 120.0,
+}
+FALLBACK_REALTIME_FACTOR = 30.0
+
+# 源码率未知时用于估算复制类操作输出大小的码率 (bps)
+FALLBACK_SOURCE_BITRATE = 192000
+
+# FLAC 相对 16bit PCM 的典型压缩比
+FLAC_COMPRESSION_RATIO = 0.6
+
+# 磁盘空间检查时预留的余量比例
+DISK_SPACE_MARGIN = 1.05
+
+# 章节标题中不能出现在文件名里的字符
+INVALID_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+# 文件名中章节标题的最大长度
+MAX_CHAPTER_TITLE_LENGTH = 60
+
+# 步骤类型对应的日志描述
+ACTION_LABELS = {
+    "copy": "复制",
+    "remux": "无损提取",
+    "encode": "编码",
+}
+
+
+class ThroughputStats:
+    """
+    记录每种操作的实测实时倍速，用于估算后续批处理的耗时。
+    数据以 JSON 形式持久化，使用指数移动平均平滑单次波动。
+    """
+    def __init__(self, stats_file=STATS_FILE, smoothing=0.3):
+        self.stats_file = stats_file
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._factors = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.stats_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._factors = {k: float(v) for k, v in data.items()}
+        except (OSError, ValueError, TypeError, AttributeError):
+            self._factors = {}
+
+    def save(self):
+        with self._lock:
+            data = dict(self._factors)
+        try:
+            os.makedirs(os.path.dirname(self.stats_file), exist_ok=True)
+            with open(self.stats_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        except OSError:
+            pass # 统计数据只用于估算，写入失败不影响处理
+
+    def record(self, key, media_seconds, wall_seconds):
+        """记录一次操作的媒体时长和实际耗时。"""
+        if not media_seconds or not wall_seconds or wall_seconds <= 0:
+            return
+        factor = media_seconds / wall_seconds
+        with self._lock:
+            previous = self._factors.get(key)
+            if previous is None:
+                self._factors[key] = factor
+            else:
+                self._factors[key] = previous + self.smoothing * (factor - previous)
+
+    def realtime_factor(self, key):
+        with self._lock:
+            if key in self._factors:
+                return self._factors[key]
+        return DEFAULT_REALTIME_FACTORS.get(key, FALLBACK_REALTIME_FACTOR)
+
+
+def stats_key(step):
+    """步骤对应的吞吐量统计键，编码按目标编码区分。"""
+    if step["action"] == "encode":
+        return f"encode:{step['codec']}"
+    return step["action"]
+
+
+def time_range_for(config):
+    """
+    返回文件的时间窗口参数 {'start', 'end', 'duration'}（只含已设置的项），取自批量设置 config['start'/'end'/'duration']。
+    """
+    return {key: config[key] for key in ('start', 'end', 'duration') if config.get(key) not in (None, '')}
+
+
+def window_duration(track_duration, time_range):
+    """按时间窗口裁剪音轨时长，用于估算和吞吐量统计。"""
+    if not time_range:
+        return track_duration
+    try:
+        start, length = resolve_time_window(**time_range)
+    except ValueError:
+        return track_duration
+    if track_duration is None:
+        return length
+    remaining = max(0.0, track_duration - start)
+    return remaining if length is None else min(length, remaining)
+
+
+def chapters_in_window(chapters, time_range, total_duration=None):
+    """
+    将章节裁剪到时间窗口内，并把时间改为相对窗口起点的秒数。
+    第一章之前的片头并入第一章（起点为 0）；最后一章的 'end' 为窗口内的结束时间，
+    用于估算和校验，拆分时最后一章总是读到结尾。
+    Args:
+        chapters (list): probe_audio_tracks 返回的 'chapters'。
+        time_range (dict): time_range_for 的结果。
+        total_duration (float, optional): 窗口内的音轨时长 (window_duration 的结果)。
+    Returns:
+        list: [{'index', 'title', 'start', 'end'}]，与窗口没有交集的章节被去掉。
+    """
+    window_start, window_length = 0.0, None
+    if time_range:
+        try:
+            window_start, window_length = resolve_time_window(**time_range)
+        except ValueError:
+            return []
+    window_end = window_start + window_length if window_length is not None else None
+    result = []
+    for chapter in chapters or []:
+        start = max(chapter['start'], window_start)
+        end = chapter['end'] if window_end is None else min(chapter['end'], window_end)
+        if end - start <= 0:
+            continue
+        result.append({'index': chapter['index'], 'title': chapter['title'],
+                       'start': start - window_start, 'end': end - window_start})
+    if result:
+        result[0]['start'] = 0.0
+        if total_duration:
+            result[-1]['end'] = total_duration
+    return result
+
+
+def chapter_label(chapter, count):
+    """章节输出文件名中的部分，如 'Ch03-第三章 出发'；章节编号按章节总数补零。"""
+    width = max(2, len(str(count)))
+    label = f"Ch{chapter['index']:0{width}d}"
+    title = INVALID_FILENAME_CHARS.sub("_", chapter.get('title') or "").strip(" .")[:MAX_CHAPTER_TITLE_LENGTH].strip()
+    return f"{label}-{title}" if title else label
+
+
+def encode_profiles(config):
+    """
+    返回目标编码档案列表。config['profiles'] 为空时由单一编码参数组成一个档案。
+    每个档案包含 'codec', 'output_format'，以及可选的 'bitrate', 'samplerate', 'channels', 'quality', 'name'。
+    """
+    if config.get('profiles'):
+        return config['profiles']
+    return [{
+        'codec': config['output_codec'],
+        'output_format': config['output_format'],
+        'bitrate': config.get('bitrate'),
+        'samplerate': config.get('samplerate'),
+        'channels': config.get('channels'),
+        'quality': config.get('quality'),
+    }]
+
+
+def _profile_suffix(profiles, i):
+    """后缀重复时 (如同一编码的两种码率) 用档案名区分文件名，否则为空。"""
+    profile = profiles[i]
+    if [p['output_format'] for p in profiles].count(profile['output_format']) > 1:
+        return f"-{profile.get('name') or profile['codec'] + str(i + 1)}"
+    return ""
+
+
+def _encode_step(input_path, prefix, track_index, time_range, config):
+    """构建编码步骤；配置了多个档案时一次解码、多路输出。"""
+    profiles = encode_profiles(config)
+    step = {
+        'action': 'encode',
+        'input_path': input_path,
+        'track_index': track_index,
+    }
+    if time_range is not None:
+        step['time_range'] = time_range
+    if len(profiles) == 1:
+        step.update({
+            'output_path': f"{prefix}.{config['output_format']}",
+            'codec': config['output_codec'],
+            'operation': f"重新编码为 {config['output_codec']}",
+            'error': f"重新编码为 {config['output_codec']} 失败",
+        })
+        return step
+    outputs = []
+    for i, profile in enumerate(profiles):
+        outputs.append(dict(profile,
+                            output_path=f"{prefix}{_profile_suffix(profiles, i)}.{profile['output_format']}",
+                            operation=f"重新编码为 {profile['codec']}",
+                            error=f"重新编码为 {profile['codec']} 失败"))
+    codecs = [profile['codec'] for profile in profiles]
+    step.update({
+        'output_path': outputs[0]['output_path'],
+        'outputs': outputs,
+        'codec': "+".join(codecs),
+        'operation': f"一次解码多路编码为 {', '.join(codecs)}",
+        'error': "多路编码失败",
+    })
+    return step
+
+
+def _split_step(action, input_path, prefix, track_index, time_range, chapters, config):
+    """
+    构建按章节拆分的步骤：一次读取输入，每个章节 (多档案时每个章节的每个档案) 一路输出。
+    action 为 'copy' 时直接复制 AAC，为 'encode' 时按编码档案编码。
+    """
+    if action == 'copy':
+        profiles = [{'codec': 'copy', 'output_format': 'm4a'}]
+        operation, error = '直接提取 AAC', '直接提取 AAC 失败'
+    else:
+        profiles = encode_profiles(config)
+    outputs = []
+    for chapter in chapters:
+        label = chapter_label(chapter, len(chapters))
+        last = chapter is chapters[-1]
+        for i, profile in enumerate(profiles):
+            if action == 'encode':
+                operation, error = f"重新编码为 {profile['codec']}", f"重新编码为 {profile['codec']} 失败"
+            outputs.append(dict(profile,
+                                output_path=f"{prefix}-{label}{_profile_suffix(profiles, i)}.{profile['output_format']}",
+                                chapter_start=chapter['start'],
+                                chapter_end=None if last else chapter['end'],
+                                chapter_index=chapter['index'],
+                                chapter_title=chapter.get('title') or "",
+                                duration=chapter['end'] - chapter['start'],
+                                operation=f"{operation} (第 {chapter['index']} 章)",
+                                error=error))
+    codecs = [profile['codec'] for profile in profiles]
+    step = {
+        'action': action,
+        'input_path': input_path,
+        'track_index': track_index,
+        'split': True,
+        'output_path': outputs[0]['output_path'],
+        'outputs': outputs,
+        'operation': f"按 {len(chapters)} 个章节拆分",
+        'error': "按章节拆分失败",
+    }
+    if action == 'encode':
+        step['codec'] = "+".join(codecs)
+    if time_range is not None:
+        step['time_range'] = time_range
+    return step
+
+
+def build_file_jobs(file_path, tracks_info, config, get_extension):
+    """
+    按处理配置为单个文件的每条音轨构建任务，与 ProcessingThread 的执行逻辑一致。
+    Args:
+        file_path (str): 源文件路径。
+        tracks_info (list): probe_audio_tracks 的返回结果。
+        config (dict): 处理配置 (mode/output_codec/output_format/bitrate/...)。
+        get_extension (callable): codec_name -> 原始音频后缀，通常为
+                                  FFmpegProcessor.get_common_audio_extension。
+    Returns:
+        list: 每条音轨一个任务字典，'steps' 为按顺序执行的步骤，
+              后一步依赖前一步，前一步失败时后续步骤不执行。
+              config['split_chapters'] 启用且文件有章节时，最后一步按章节一次读取拆分为多个文件。
+    """
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    output_dir = os.path.join(os.path.dirname(file_path), "output")
+    # 只有直接读取源文件的步骤需要截取；从已截取的原始音频再编码时不再截取
+    time_range = time_range_for(config)
+    audio_tracks = [t for t in tracks_info if t.get('codec_type') == 'audio']
+    jobs = []
+    for audio_track_index, track_info in enumerate(audio_tracks):
+        track_index = track_info['index']
+        codec_name = track_info['codec_name']
+        prefix = os.path.join(output_dir, f"{base_name}-Track{track_index}")
+        duration = window_duration(track_info.get('duration'), time_range)
+        chapters = []
+        if config.get('split_chapters'):
+            chapters = chapters_in_window(track_info.get('chapters'), time_range, duration)
+        steps = []
+        if config['mode'] == 'direct_extract':
+            if codec_name.lower() == 'aac' and chapters:
+                steps.append(_split_step('copy', file_path, prefix, audio_track_index, time_range, chapters, config))
+            elif codec_name.lower() == 'aac':
+                steps.append({
+                    'action': 'copy',
+                    'input_path': file_path,
+                    'output_path': f"{prefix}.m4a",
+                    'track_index': audio_track_index,
+                    'time_range': time_range,
+                    'operation': '直接提取 AAC',
+                    'error': '直接提取 AAC 失败',
+                })
+            else:
+                raw_output = f"{prefix}.{get_extension(codec_name)}"
+                steps.append({
+                    'action': 'remux',
+                    'input_path': file_path,
+                    'output_path': raw_output,
+                    'track_index': audio_track_index,
+                    'time_range': time_range,
+                    'codec_name': codec_name,
+                    'operation': f'无损提取 {codec_name}',
+                    'error': '无损提取原始音频失败',
+                })
+                # 原始音频已按窗口截取，章节时间同样以窗口起点为 0
+                if chapters:
+                    encode_step = _split_step('encode', raw_output, prefix, None, None, chapters, config)
+                else:
+                    encode_step = _encode_step(raw_output, prefix, None, None, config)
+                # 编码时不再截取，但结果取决于源窗口，记录下来供结果缓存键区分
+                encode_step['source_time_range'] = time_range
+                steps.append(encode_step)
+        elif config['mode'] == 'recode':
+            if chapters:
+                steps.append(_split_step('encode', file_path, prefix, audio_track_index, time_range, chapters, config))
+            else:
+                steps.append(_encode_step(file_path, prefix, audio_track_index, time_range, config))
+        jobs.append({
+            'file_path': file_path,
+            'track_index': track_index,
+            'audio_track_index': audio_track_index,
+            'codec_name': codec_name,
+            'language': track_info.get('language', '未知'),
+            'duration': duration,
+            'bit_rate': track_info.get('bit_rate'),
+            'sample_rate': track_info.get('sample_rate'),
+            'channels': track_info.get('channels'),
+            'output_dir': output_dir,
+            'steps': steps,
+        })
+    return jobs
+
+
+def _resolve_output(output, audio_filter, source_samplerate, source_channels):
+    """按源音轨参数解析一路编码输出的采样率和声道数。"""
+    samplerate, channels = resolve_output_format(output['codec'], output.get('samplerate'), output.get('channels'),
+                                                 source_samplerate, source_channels)
+    if audio_filter and not samplerate and source_samplerate:
+        # loudnorm 内部会把音频升采样到 192 kHz，需要显式回到源采样率
+        samplerate = str(source_samplerate)
+    return dict(output, samplerate=samplerate, channels=channels)
+
+
+def execute_step(processor, step, config, audio_filter=None, source_samplerate=None, source_channels=None):
+    """
+    使用 FFmpegProcessor 执行单个任务步骤。
+    Args:
+        audio_filter (str, optional): 编码步骤使用的音频滤镜。
+        source_samplerate (int, optional): 源采样率。
+        source_channels (int, optional): 源声道数。
+            编码输出的采样率/声道按源参数解析 (见 resolve_output_format)，与源相同或保持源参数时不做重采样和混音；
+            使用滤镜且不需要改变采样率时输出源采样率。
+    Returns:
+        bool: 操作成功返回 True，否则返回 False；多路编码和按章节拆分的步骤返回每路输出的 bool 列表。
+    """
+    resampler = config.get('resampler')
+    if step.get('split'):
+        outputs = [
+            output if output['codec'] == 'copy'
+            else dict(_resolve_output(output, audio_filter, source_samplerate, source_channels), resampler=resampler)
+            for output in step['outputs']
+        ]
+        return processor.split_audio(
+            input_path=step['input_path'],
+            outputs=outputs,
+            track_index=step['track_index'],
+            audio_filter=audio_filter,
+            **step.get('time_range', {})
+        )
+    if step['action'] == 'copy':
+        return processor.extract_aac_track(
+            input_path=step['input_path'],
+            output_path=step['output_path'],
+            track_index=step['track_index'],
+            **step.get('time_range', {})
+        )
+    if step['action'] == 'remux':
+        return processor.extract_raw_audio(
+            input_path=step['input_path'],
+            output_path=step['output_path'],
+            track_index=step['track_index'],
+            codec_name=step.get('codec_name'),
+            **step.get('time_range', {})
+        )
+    if step['action'] == 'encode' and step.get('outputs'):
+        outputs = [dict(_resolve_output(output, audio_filter, source_samplerate, source_channels), resampler=resampler)
+                   for output in step['outputs']]
+        return processor.recode_audio_multi(
+            input_path=step['input_path'],
+            outputs=outputs,
+            track_index=step['track_index'],
+            audio_filter=audio_filter,
+            **step.get('time_range', {})
+        )
+    if step['action'] == 'encode':
+        output = _resolve_output({'codec': step['codec'], 'samplerate': config.get('samplerate'), 'channels': config.get('channels')},
+                                 audio_filter, source_samplerate, source_channels)
+        return processor.recode_audio(
+            input_path=step['input_path'],
+            output_path=step['output_path'],
+            track_index=step['track_index'],
+            codec=step['codec'],
+            bitrate=config.get('bitrate'),
+            samplerate=output['samplerate'],
+            channels=output['channels'],
+            quality=config.get('quality'),
+            audio_filter=audio_filter,
+            resampler=resampler,
+            **step.get('time_range', {})
+        )
+    raise ValueError(f"未知的任务步骤类型: {step['action']}")
+
+
+def step_outputs(step):
+    """步骤的输出列表；单一输出的步骤返回只含一项的列表，多路编码步骤返回其 'outputs'。"""
+    if step.get('outputs'):
+        return step['outputs']
+    return [{'output_path': step['output_path'], 'operation': step['operation'], 'error': step['error']}]
+
+
+def _loudnorm_filter(processor, job, config, log, loudness):
+    """
+    编码步骤的响度标准化滤镜。
+    Returns:
+        tuple: (滤镜字符串或 None, 是否可以继续)。分析失败时不能继续，静音音轨不做标准化。
+    """
+    if not config.get('loudnorm'):
+        return None, True
+    loudness = loudness or LoudnessAnalyzer(processor, target=config['loudnorm'], log=log)
+    measured = loudness.measure(job)
+    if measured is None:
+        return None, False
+    audio_filter = build_loudnorm_filter(measured, loudness.target)
+    if audio_filter is None:
+        log(f"[WARNING] {os.path.basename(job['file_path'])} 音轨 {job['track_index']} 响度无法测量 (可能为静音)，不做标准化。", logging.WARNING)
+    return audio_filter, True
+
+
+def _result_cache_keys(processor, job, step, config, outputs):
+    """步骤每路输出的结果缓存键，包含实际使用的编码器和 FFmpeg 版本。"""
+    capabilities = processor.get_capabilities()
+    ffmpeg_version = capabilities['version'] if capabilities else None
+    keys = []
+    for output in outputs:
+        profile = output if step.get('outputs') else step
+        encoder = None
+        if step['action'] == 'encode' and profile.get('codec', 'copy') != 'copy':
+            encoder = processor.resolve_encoder(profile['codec'])
+        keys.append(result_cache_key(job['fingerprint'], job, step, config,
+                                     output=output if step.get('outputs') else None,
+                                     encoder=encoder, ffmpeg_version=ffmpeg_version))
+    return keys
+
+
+def run_track_job(processor, job, config, log, result_cache=None, stats=None, verifier=None, loudness=None,
+                  cancel_event=None):
+    """
+    按顺序执行单条音轨的所有步骤，任一步骤失败则跳过其后续步骤。
+    多路编码步骤按输出逐个报告结果，部分输出失败时成功的输出仍会保留并记录。
+    Args:
+        processor (FFmpegProcessor): 执行命令的处理器。
+        job (dict): build_file_jobs 生成的任务，可带 'fingerprint' 以启用结果缓存。
+        config (dict): 处理配置。
+        log (callable): 日志回调，签名为 log(message, level)。
+        result_cache (ResultCache, optional): 结果缓存。
+        stats (ThroughputStats, optional): 记录实测吞吐量。
+        verifier (OutputVerifier, optional): 成功的输出会提交给它做处理后校验，校验在后台进行。
+        loudness (LoudnessAnalyzer, optional): config['loudnorm'] 启用时提供响度测量值（可缓存/预分析），
+                                               为空时在当前线程分析且不缓存。
+        cancel_event (threading.Event, optional): 置位后立即终止正在运行的 FFmpeg 命令，不再执行后续步骤。
+    Returns:
+        bool: 所有步骤成功返回 True（不等待校验结果）。命令被看门狗终止时原因记录在 job['killed_reason']。
+    """
+    processor.set_cancel_event(cancel_event)
+    processor.set_media_duration(job.get('duration')) # 窗口内的时长，看门狗总时限不按整个输入计算
+    try:
+        return _run_track_steps(processor, job, config, log, result_cache, stats, verifier, loudness, cancel_event)
+    finally:
+        processor.set_cancel_event(None)
+        processor.set_media_duration(None)
+
+
+def _run_track_steps(processor, job, config, log, result_cache, stats, verifier, loudness, cancel_event):
+    file_name = os.path.basename(job['file_path'])
+    for step in job['steps']:
+        if cancel_event is not None and cancel_event.is_set():
+            log(f"[WARNING] 任务已取消，跳过 {file_name} 音轨 {job['track_index']} 的剩余步骤。", logging.WARNING)
+            return False
+        outputs = step_outputs(step)
+        cache_keys = [None] * len(outputs)
+        if result_cache and job.get('fingerprint'):
+            cache_keys = _result_cache_keys(processor, job, step, config, outputs)
+            with trace_span("结果缓存查找", "cache", outputs=len(outputs)):
+                methods = [result_cache.lookup(key, output['output_path']) for key, output in zip(cache_keys, outputs)]
+            if all(methods):
+                for output, method in zip(outputs, methods):
+                    log(f"[INFO] 命中结果缓存 ({'硬链接' if method == 'hardlink' else '复制'})，跳过 FFmpeg: {output['output_path']}", logging.INFO)
+                    log(f"✅ 成功: 文件 '{file_name}' (音轨 {job['track_index']}) - 操作: '{output['operation']} (缓存)' - 输出: '{output['output_path']}'", logging.INFO)
+                    if verifier:
+                        verifier.submit(job, output['output_path'], output.get('duration', job.get('duration')))
+                continue
+            for output in outputs:
+                result_cache.release(output['output_path'])
+        audio_filter = None
+        if step['action'] == 'encode':
+            audio_filter, ok = _loudnorm_filter(processor, job, config, log, loudness)
+            if not ok:
+                for output in outputs:
+                    log(f"❌ 失败: 文件 '{file_name}' (音轨 {job['track_index']}) - 错误: '响度分析失败' - 输出尝试: '{output['output_path']}'", logging.ERROR)
+                return False
+        if step.get('split'):
+            log(f"[INFO] {step['operation']}: {step['input_path']} -> {outputs[0]['output_path']} 等 {len(outputs)} 个文件", logging.INFO)
+        else:
+            log(f"[INFO] {step['operation']}: {step['input_path']} -> {', '.join(output['output_path'] for output in outputs)}", logging.INFO)
+        started_at = time.monotonic()
+        processor.pop_failure_reason() # 只关心本步骤的命令是否被看门狗终止
+        with trace_span(ACTION_LABELS.get(step['action'], step['action']), "step", file=file_name,
+                        track=job['track_index'], operation=step['operation']):
+            result = execute_step(processor, step, config, audio_filter, job.get('sample_rate'), job.get('channels'))
+        results = result if isinstance(result, list) else [result]
+        killed_reason = processor.pop_failure_reason()
+        if killed_reason:
+            job['killed_reason'] = killed_reason
+        for output, cmd_success, cache_key in zip(outputs, results, cache_keys):
+            if not cmd_success:
+                error = f"{output['error']} (已终止: {killed_reason})" if killed_reason else output['error']
+                log(f"❌ 失败: 文件 '{file_name}' (音轨 {job['track_index']}) - 错误: '{error}' - 输出尝试: '{output['output_path']}'", logging.ERROR)
+                continue
+            if cache_key:
+                result_cache.store(cache_key, output['output_path'])
+            log(f"✅ 成功: 文件 '{file_name}' (音轨 {job['track_index']}) - 操作: '{output['operation']}' - 输出: '{output['output_path']}'", logging.INFO)
+            if verifier:
+                verifier.submit(job, output['output_path'], output.get('duration', job.get('duration')))
+        if not all(results):
+            return False
+        if stats:
+            stats.record(stats_key(step), job.get('duration'), time.monotonic() - started_at)
+    return True
+
+
+def _parse_bitrate(bitrate):
+    """将 '256'、'256k'、'1.5m' 等比特率设置转换为 bps，无法解析时返回 None。"""
+    if not bitrate:
+        return None
+    text = str(bitrate).strip().lower().rstrip('bps')
+    multiplier = 1000
+    if text.endswith('k'):
+        text = text[:-1]
+    elif text.endswith('m'):
+        text, multiplier = text[:-1], 1000000
+    try:
+        return float(text) * multiplier
+    except ValueError:
+        return None
+
+
+def _explicit(value):
+    """保持源参数 (KEEP_SOURCE) 视为未设置。"""
+    return None if value == KEEP_SOURCE else value
+
+
+def _encode_bitrate(job, profile):
+    """估算编码输出的码率 (bps)。"""
+    if profile['codec'] == 'flac':
+        sample_rate = float(_explicit(profile.get('samplerate')) or job.get('sample_rate') or 44100)
+        channels = float(_explicit(profile.get('channels')) or job.get('channels') or 2)
+        return sample_rate * channels * 16 * FLAC_COMPRESSION_RATIO
+    return _parse_bitrate(profile.get('bitrate')) or job.get('bit_rate') or FALLBACK_SOURCE_BITRATE
+
+
+def estimate_step(job, step, config, stats):
+    """
+    估算单个步骤的输出大小 (字节) 和耗时 (秒)。时长未知时返回 (None, None)。
+    多路编码步骤的大小为各路输出之和。
+    """
+    duration = job.get('duration')
+    if not duration:
+        return None, None
+    if step['action'] in ('copy', 'remux'):
+        bit_rate = job.get('bit_rate') or FALLBACK_SOURCE_BITRATE
+    elif step.get('outputs'):
+        # 多档案输出各自覆盖整条音轨，章节输出按各自的时长计算
+        size = int(sum(_encode_bitrate(job, output) * output.get('duration', duration) for output in step['outputs']) / 8)
+        return size, duration / stats.realtime_factor(stats_key(step))
+    else:
+        bit_rate = _encode_bitrate(job, encode_profiles(config)[0])
+    size = int(bit_rate * duration / 8)
+    seconds = duration / stats.realtime_factor(stats_key(step))
+    return size, seconds
+
+
+def _existing_parent(path):
+    """返回路径本身或其最近的已存在父目录，用于查询所在卷的剩余空间。"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def build_batch_plan(files, config, processor, stats=None, track_info_cache=None):
+    """
+    试运行：为所选文件构建完整任务列表并估算输出大小、耗时和磁盘空间，不运行 FFmpeg。
+    Args:
+        files (list): 待处理的文件路径列表。
+        config (dict): 处理配置。
+        processor (FFmpegProcessor): 用于 ffprobe 探测的处理器。
+        stats (ThroughputStats, optional): 历史吞吐量统计。
+        track_info_cache (dict, optional): 文件路径 -> 探测结果的缓存，会被补充。
+    Returns:
+        dict: 'jobs' (任务列表), 'unprobed' (探测失败的文件), 'total_size',
+              'total_seconds', 'unknown_estimates' (无法估算的步骤数),
+              'volumes' (按输出卷统计的空间需求) 和 'ok' (空间是否充足)。
+    """
+    stats = stats or ThroughputStats()
+    cache = track_info_cache if track_info_cache is not None else {}
+    jobs, unprobed = [], []
+    total_size, total_seconds, unknown = 0, 0.0, 0
+    volumes = {}
+    for file_path in files:
+        tracks_info = cache.get(file_path)
+        if tracks_info is None:
+            tracks_info = processor.probe_audio_tracks(file_path)
+            cache[file_path] = tracks_info
+        if not tracks_info:
+            unprobed.append(file_path)
+            continue
+        for job in build_file_jobs(file_path, tracks_info, config, processor.get_common_audio_extension):
+            for step in job['steps']:
+                size, seconds = estimate_step(job, step, config, stats)
+                step['estimated_size'] = size
+                step['estimated_seconds'] = seconds
+                if size is None:
+                    unknown += 1
+                    continue
+                total_size += size
+                total_seconds += seconds
+                volume_path = _existing_parent(os.path.dirname(step['output_path']))
+                try:
+                    device = os.stat(volume_path).st_dev
+                except OSError:
+                    device = volume_path
+                volume = volumes.setdefault(device, {'path': volume_path, 'required': 0, 'free': None})
+                volume['required'] += size
+            jobs.append(job)
+
+    ok = True
+    for volume in volumes.values():
+        try:
+            volume['free'] = shutil.disk_usage(volume['path']).free
+        except OSError:
+            continue
+        volume['ok'] = volume['required'] * DISK_SPACE_MARGIN <= volume['free']
+        ok = ok and volume['ok']
+
+    return {
+        'jobs': jobs,
+        'unprobed': unprobed,
+        'total_size': total_size,
+        'total_seconds': total_seconds,
+        'unknown_estimates': unknown,
+        'volumes': list(volumes.values()),
+        'ok': ok,
+    }
+
+
+def format_size(num_bytes):
+    """格式化字节数为易读字符串。"""
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_duration(seconds):
+    """格式化秒数为 时:分:秒。"""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def format_plan_summary(plan):
+    """将计划转换为逐行日志文本。"""
+    lines = ["[INFO] ===== 处理计划 (试运行，未执行 FFmpeg) ====="]
+    for job in plan['jobs']:
+        for step in job['steps']:
+            size = format_size(step['estimated_size']) if step.get('estimated_size') is not None else "未知"
+            seconds = format_duration(step['estimated_seconds']) if step.get('estimated_seconds') is not None else "未知"
+            lines.append(
+                f"[INFO] {os.path.basename(job['file_path'])} 音轨 {job['track_index']} "
+                f"[{ACTION_LABELS.get(step['action'], step['action'])}] {step['operation']} -> "
+                f"{step['output_path']} (预计 {size}, 耗时 {seconds})"
+            )
+    for file_path in plan['unprobed']:
+        lines.append(f"[WARNING] 未检测到 {os.path.basename(file_path)} 中的任何音频轨道，将被跳过。")
+    step_count = sum(len(job['steps']) for job in plan['jobs'])
+    lines.append(
+        f"[INFO] 共 {len(plan['jobs'])} 条音轨、{step_count} 个步骤，"
+        f"预计输出 {format_size(plan['total_size'])}，预计耗时 {format_duration(plan['total_seconds'])}。"
+    )
+    if plan['unknown_estimates']:
+        lines.append(f"[WARNING] {plan['unknown_estimates']} 个步骤缺少时长信息，未计入估算。")
+    for volume in plan['volumes']:
+        if volume['free'] is None:
+            lines.append(f"[WARNING] 无法获取 {volume['path']} 所在卷的剩余空间。")
+        elif volume['ok']:
+            lines.append(f"[INFO] 输出卷 {volume['path']}: 需要 {format_size(volume['required'])}，剩余 {format_size(volume['free'])}。")
+        else:
+            lines.append(f"[ERROR] 输出卷 {volume['path']} 空间不足: 需要 {format_size(volume['required'])}，剩余 {format_size(volume['free'])}。")
+    return lines
+
+
+def summary_log_level(line):
+    """根据行前缀返回对应的日志级别。"""
+    if line.startswith("[ERROR]"):
+        return logging.ERROR
+    if line.startswith("[WARNING]"):
+        return logging.WARNING
+    return logging.INFO
@@ -0,0 +1,447 @@
+"""
+基于共享目录的分布式任务队列。
+
+协调端把 build_file_jobs 生成的音轨任务发布到队列目录，多个工作进程（可位于不同节点，
+只要共享存储在各节点挂载到相同路径）通过原子重命名租用任务、定期心跳，
+并由任一工作进程把心跳超时的任务放回待处理目录。
+
+目录结构:
+    pending/  待处理任务
+    leased/   已被租用的任务，文件名带工作进程标识，文件 mtime 即最近一次心跳
+    done/     已完成任务 (含执行结果)
+    failed/   失败任务 (FFmpeg 失败或超过最大重试次数)
+
+用法:
+    python queue_utils.py publish --queue-dir Q --mode recode --codec aac 文件...
+    python queue_utils.py worker --queue-dir Q --processes 4
+    python queue_utils.py status --queue-dir Q
+    python queue_utils.py worker --queue-dir Q --trace trace.json   # 导出时间线
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+
+from cache_utils import file_fingerprint
+from ffmpeg_utils import LOUDNORM_TARGET, RESAMPLER_PRESETS, FFmpegProcessor
+from loudness_utils import LoudnessAnalyzer, LoudnessCache
+from planner_utils import ThroughputStats, build_file_jobs, run_track_job
+from trace_utils import enable_tracing, get_tracer, trace_span
+from watchdog_utils import STALL_TIMEOUT
+
+QUEUE_STATES = ("pending", "leased", "done", "failed")
+
+DEFAULT_LEASE_TIMEOUT = 60.0      # 心跳超过该秒数未更新即认为工作进程已死
+DEFAULT_HEARTBEAT_INTERVAL = 10.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+# 完成或回收任务时先把租约文件改名为这些后缀占住；进程在改名后崩溃留下的文件超时后同样会被回收
+CLAIM_SUFFIXES = (".completing", ".reaping")
+IDLE_POLL_INTERVAL = 2.0
+
+# 只对本机处理有效的界面设置及其在工作进程中的等效取值：工作进程的并发数和超时由其命令行参数决定
+# (--processes、--stall-timeout)，结果缓存、校验和暂存不在队列任务中进行。发布时从任务配置中去掉
+LOCAL_CONFIG_DEFAULTS = {
+    "result_cache": False,
+    "verify_outputs": False,
+    "stage_inputs": False,
+    "max_jobs": 1,
+    "auto_concurrency": False,
+    "stall_timeout": STALL_TIMEOUT,
+}
+LOCAL_CONFIG_LABELS = {
+    "result_cache": "复用处理结果",
+    "verify_outputs": "处理后校验输出",
+    "stage_inputs": "先复制到本地",
+    "max_jobs": "同时处理",
+    "auto_concurrency": "自动调节",
+    "stall_timeout": "无进度超时",
+}
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue:
+    """共享目录任务队列的基本操作，所有状态转换都通过同一文件系统内的原子重命名完成。"""
+
+    def __init__(self, queue_dir, lease_timeout=DEFAULT_LEASE_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.queue_dir = queue_dir
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        for state in QUEUE_STATES:
+            os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+
+    def _path(self, state, name):
+        return os.path.join(self.queue_dir, state, name)
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_json(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def publish(self, job, config):
+        """发布一个任务，任务 ID 以时间戳开头以保证大致先进先出。"""
+        job_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        payload = {"id": job_id, "attempts": 0, "job": job, "config": config}
+        # 先写到队列根目录再移入 pending，避免工作进程读到写了一半的文件
+        tmp_path = os.path.join(self.queue_dir, f"{job_id}.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._path("pending", f"{job_id}.json"))
+        return job_id
+
+    def lease(self, worker_id):
+        """
+        租用一个待处理任务。
+        Returns:
+            tuple: (租约文件路径, 任务数据)；队列为空时返回 (None, None)。
+        """
+        for name in sorted(os.listdir(os.path.join(self.queue_dir, "pending"))):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-len(".json")]
+            pending_path = self._path("pending", name)
+            leased_path = self._path("leased", f"{job_id}@{worker_id}.json")
+            try:
+                # 重命名不更新 mtime：先刷新再改名，租约出现在 leased/ 时即带有第一次心跳，
+                # 不会因发布时间过早而被其他工作进程立即回收
+                os.utime(pending_path)
+                os.rename(pending_path, leased_path)
+            except OSError:
+                continue # 已被其他工作进程抢先租用
+            try:
+                payload = self._read_json(leased_path)
+            except (OSError, ValueError):
+                continue
+            return leased_path, payload
+        return None, None
+
+    def heartbeat(self, leased_path):
+        """刷新租约。租约已被回收时返回 False，调用方应放弃该任务。"""
+        try:
+            os.utime(leased_path)
+            return True
+        except OSError:
+            return False
+
+    def complete(self, leased_path, payload, success, worker_id, reason=None):
+        """把已租用任务移入 done/ 或 failed/，并记录执行结果。"""
+        payload["result"] = {
+            "success": success,
+            "worker": worker_id,
+            "finished_at": time.time(),
+            "reason": reason,
+        }
+        state = "done" if success else "failed"
+        target = self._path(state, f"{payload['id']}.json")
+        # 先原子地占住租约文件；租约已被回收时重命名失败，结果以重新执行的为准
+        claim_path = f"{leased_path}.completing"
+        try:
+            os.utime(leased_path) # 占位文件带有新的 mtime，写入结果期间不会被当作超时回收
+            os.rename(leased_path, claim_path)
+        except OSError:
+            return False
+        self._write_json(claim_path, payload)
+        os.replace(claim_path, target)
+        return True
+
+    def requeue_expired(self, log=None):
+        """
+        把心跳超时的任务放回 pending/，超过最大尝试次数的移入 failed/。
+        完成/回收过程中崩溃留下的占位文件 (CLAIM_SUFFIXES) 超时后一并处理：已记录结果的直接移入 done/ 或 failed/。
+        """
+        requeued = 0
+        now = time.time()
+        for name in os.listdir(os.path.join(self.queue_dir, "leased")):
+            if not name.endswith((".json",) + CLAIM_SUFFIXES):
+                continue
+            leased_path = self._path("leased", name)
+            try:
+                if now - os.path.getmtime(leased_path) < self.lease_timeout:
+                    continue
+            except OSError:
+                continue
+            base_name = name[:name.index(".json") + len(".json")] if ".json" in name else name
+            job_id, _, dead_worker = base_name[:-len(".json")].partition("@")
+            # 先把文件改名占住，避免多个工作进程同时回收同一任务；名字带随机串，回收者自己崩溃后仍可再次回收
+            claim_path = self._path("leased", f"{base_name}.{uuid.uuid4().hex[:8]}.reaping")
+            try:
+                os.rename(leased_path, claim_path)
+                payload = self._read_json(claim_path)
+            except (OSError, ValueError):
+                continue
+            result = payload.get("result")
+            if result:
+                target = self._path("done" if result.get("success") else "failed", f"{job_id}.json")
+            else:
+                payload["attempts"] = payload.get("attempts", 0) + 1
+                if payload["attempts"] >= self.max_attempts:
+                    payload["result"] = {"success": False, "worker": dead_worker, "finished_at": now,
+                                         "reason": f"工作进程心跳超时 {payload['attempts']} 次"}
+                    target = self._path("failed", f"{job_id}.json")
+                else:
+                    target = self._path("pending", f"{job_id}.json")
+            self._write_json(claim_path, payload)
+            os.replace(claim_path, target)
+            requeued += 1
+            if log:
+                if result:
+                    log(f"[WARNING] 任务 {job_id} 的结果记录被中断，已补记为{'完成' if result.get('success') else '失败'}。", logging.WARNING)
+                else:
+                    log(f"[WARNING] 工作进程 {dead_worker} 心跳超时，任务 {job_id} 已{'放回队列' if target.startswith(self._path('pending', '')) else '标记失败'}。", logging.WARNING)
+        return requeued
+
+    def status(self):
+        """统计各状态的任务数量；leased/ 中尚未回收的占位文件也计为已租用。"""
+        counts = {}
+        for state in QUEUE_STATES:
+            suffixes = (".json",) + CLAIM_SUFFIXES if state == "leased" else (".json",)
+            counts[state] = sum(1 for name in os.listdir(os.path.join(self.queue_dir, state)) if name.endswith(suffixes))
+        return counts
+
+
+def publish_batch(queue_dir, files, config, processor, log=None, track_info_cache=None):
+    """
+    协调端：探测文件并把每条音轨任务发布到队列。只对本机处理有效的设置 (LOCAL_CONFIG_DEFAULTS) 不随任务发布。
+    Args:
+        track_info_cache (dict, optional): 文件路径 -> 探测结果的缓存 (如界面的后台探测结果)，已有结果的文件不再探测。
+    Returns:
+        int: 已发布的任务数量。
+    """
+    queue = JobQueue(queue_dir)
+    cache = track_info_cache if track_info_cache is not None else {}
+    dropped = [LOCAL_CONFIG_LABELS[key] for key, default in LOCAL_CONFIG_DEFAULTS.items()
+               if key in config and config[key] != default]
+    config = {key: value for key, value in config.items() if key not in LOCAL_CONFIG_DEFAULTS}
+    if dropped and log:
+        log(f"[WARNING] 以下设置只对本机处理有效，队列工作进程不会使用: {', '.join(dropped)}。", logging.WARNING)
+    published = 0
+    for file_path in files:
+        tracks_info = cache.get(file_path)
+        file_path = os.path.abspath(file_path)
+        if tracks_info is None:
+            tracks_info = processor.probe_audio_tracks(file_path)
+        if not tracks_info:
+            if log:
+                log(f"[WARNING] 未检测到 {os.path.basename(file_path)} 中的任何音频轨道。跳过。", logging.WARNING)
+            continue
+        for job in build_file_jobs(file_path, tracks_info, config, processor.get_common_audio_extension):
+            queue.publish(job, config)
+            published += 1
+    if log:
+        log(f"[INFO] 已向任务队列 {queue_dir} 发布 {published} 个音轨任务。", logging.INFO)
+    return published
+
+
+class QueueWorker:
+    """
+    工作进程：循环回收过期租约、租用任务、后台心跳并执行任务。
+    """
+    def __init__(self, queue_dir, worker_id=None, lease_timeout=DEFAULT_LEASE_TIMEOUT,
+                 heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL, log_callback=None, stall_timeout=STALL_TIMEOUT):
+        self.queue = JobQueue(queue_dir, lease_timeout=lease_timeout)
+        self.worker_id = worker_id or default_worker_id()
+        self.heartbeat_interval = heartbeat_interval
+        self.log_callback = log_callback
+        self.ffmpeg_processor = FFmpegProcessor(log_callback=log_callback, stall_timeout=stall_timeout)
+        self.throughput_stats = ThroughputStats()
+        self.loudness = None  # 首个需要响度标准化的任务到来时创建
+        self._stop_event = threading.Event()
+
+    def _log(self, message, level=logging.INFO):
+        message = f"[{self.worker_id}] {message}"
+        if self.log_callback:
+            self.log_callback(message, level=level)
+        else:
+            print(message)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _heartbeat_loop(self, leased_path, done_event, lost_event):
+        while not done_event.wait(self.heartbeat_interval):
+            if not self.queue.heartbeat(leased_path):
+                lost_event.set()
+                return
+
+    def run_one(self):
+        """
+        租用并执行一个任务。
+        Returns:
+            bool: 是否租到了任务。
+        """
+        with trace_span("租用任务", "queue"):
+            leased_path, payload = self.queue.lease(self.worker_id)
+        if payload is None:
+            return False
+        job, config = payload["job"], payload["config"]
+        self._log(f"[INFO] 租用任务 {payload['id']}: {os.path.basename(job['file_path'])} 音轨 {job['track_index']}")
+
+        done_event, lost_event = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, args=(leased_path, done_event, lost_event), daemon=True)
+        heartbeat.start()
+        try:
+            os.makedirs(job["output_dir"], exist_ok=True)
+            if config.get("loudnorm"):
+                if self.loudness is None:
+                    self.loudness = LoudnessAnalyzer(self.ffmpeg_processor, cache=LoudnessCache(),
+                                                     target=config["loudnorm"], log=self._log)
+                if not job.get("fingerprint"):
+                    job["fingerprint"] = file_fingerprint(job["file_path"])
+            # 租约被回收时 (任务已交给其他工作进程) 立即终止 FFmpeg，避免两个进程同时写同一输出
+            success = run_track_job(self.ffmpeg_processor, job, config, self._log, stats=self.throughput_stats,
+                                    loudness=self.loudness, cancel_event=lost_event)
+            reason = None if success else (f"FFmpeg 已终止: {job['killed_reason']}" if job.get('killed_reason')
+                                           else "FFmpeg 执行失败")
+        except Exception as e:
+            success, reason = False, f"程序异常: {e}"
+            self._log(f"[CRITICAL ERROR] 执行任务 {payload['id']} 时发生异常: {e}", logging.ERROR)
+        finally:
+            done_event.set()
+            heartbeat.join()
+
+        if lost_event.is_set() or not self.queue.complete(leased_path, payload, success, self.worker_id, reason):
+            self._log(f"[WARNING] 任务 {payload['id']} 的租约已被回收，结果丢弃。", logging.WARNING)
+        return True
+
+    def run(self, exit_when_empty=False):
+        """工作循环。exit_when_empty 为 True 时，队列中没有待处理和已租用任务后退出。"""
+        self._log("[INFO] 工作进程启动。")
+        while not self._stop_event.is_set():
+            self.queue.requeue_expired(log=self._log)
+            if self.run_one():
+                continue
+            if exit_when_empty:
+                counts = self.queue.status()
+                if counts["pending"] == 0 and counts["leased"] == 0:
+                    break
+            with trace_span("等待新任务", "queue_wait"):
+                self._stop_event.wait(IDLE_POLL_INTERVAL)
+        self.throughput_stats.save()
+        if self.loudness:
+            self.loudness.close()
+        tracer = get_tracer()
+        if tracer:
+            self._log(f"[INFO] 时间线追踪已写入: {tracer.export()}")
+        self._log("[INFO] 工作进程结束。")
+
+
+def _worker_process_main(queue_dir, lease_timeout, heartbeat_interval, exit_when_empty, trace_path=None,
+                         stall_timeout=STALL_TIMEOUT):
+    if trace_path:
+        # 每个进程写各自的追踪文件
+        root, ext = os.path.splitext(trace_path)
+        enable_tracing(f"{root}-{os.getpid()}{ext or '.json'}")
+    QueueWorker(queue_dir, lease_timeout=lease_timeout, heartbeat_interval=heartbeat_interval,
+                stall_timeout=stall_timeout).run(exit_when_empty=exit_when_empty)
+
+
+def run_local_workers(queue_dir, processes, lease_timeout=DEFAULT_LEASE_TIMEOUT,
+                      heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL, exit_when_empty=True, trace_path=None,
+                      stall_timeout=STALL_TIMEOUT):
+    """在本机启动多个工作进程并等待其结束。trace_path 非空时每个进程写出 <trace_path>-<pid>.json。"""
+    workers = [
+        multiprocessing.Process(target=_worker_process_main,
+                                args=(queue_dir, lease_timeout, heartbeat_interval, exit_when_empty, trace_path,
+                                      stall_timeout))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return [worker.exitcode for worker in workers]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="video2acc 分布式任务队列")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    publish_parser = subparsers.add_parser("publish", help="探测文件并发布任务")
+    publish_parser.add_argument("--queue-dir", required=True)
+    publish_parser.add_argument("--mode", choices=["direct_extract", "recode"], default="direct_extract")
+    publish_parser.add_argument("--codec", default="aac")
+    publish_parser.add_argument("--format", dest="output_format")
+    publish_parser.add_argument("--bitrate")
+    publish_parser.add_argument("--samplerate", help="输出采样率 (Hz)，留空或 source 保持源采样率")
+    publish_parser.add_argument("--channels", help="输出声道数，留空或 source 保持源声道数")
+    publish_parser.add_argument("--resampler", choices=list(RESAMPLER_PRESETS), default="swr",
+                                help="需要重采样时使用的重采样器预设")
+    publish_parser.add_argument("--quality")
+    publish_parser.add_argument("--start", help="截取起点 (秒或 HH:MM:SS)")
+    publish_parser.add_argument("--end", help="截取终点 (秒或 HH:MM:SS)")
+    publish_parser.add_argument("--duration", help="截取时长 (秒或 HH:MM:SS)")
+    publish_parser.add_argument("--split-chapters", action="store_true", help="有章节标记的文件按章节拆分输出")
+    publish_parser.add_argument("--loudnorm", action="store_true", help="编码时进行 EBU R128 响度标准化")
+    publish_parser.add_argument("files", nargs="+")
+
+    worker_parser = subparsers.add_parser("worker", help="启动工作进程")
+    worker_parser.add_argument("--queue-dir", required=True)
+    worker_parser.add_argument("--processes", type=int, default=1)
+    worker_parser.add_argument("--lease-timeout", type=float, default=DEFAULT_LEASE_TIMEOUT)
+    worker_parser.add_argument("--heartbeat-interval", type=float, default=DEFAULT_HEARTBEAT_INTERVAL)
+    worker_parser.add_argument("--forever", action="store_true", help="队列为空时继续等待新任务")
+    worker_parser.add_argument("--trace", metavar="PATH", help="记录时间线并导出为 Chrome trace JSON")
+    worker_parser.add_argument("--stall-timeout", type=float, default=STALL_TIMEOUT,
+                               help="FFmpeg 超过该秒数没有进度即终止该任务，0 表示不检测")
+
+    status_parser = subparsers.add_parser("status", help="查看队列状态")
+    status_parser.add_argument("--queue-dir", required=True)
+
+    args = parser.parse_args(argv)
+    if args.command == "publish":
+        config = {
+            'mode': args.mode,
+            'split_chapters': args.split_chapters,
+            'output_codec': args.codec,
+            'output_format': args.output_format or {"aac": "m4a"}.get(args.codec, args.codec),
+            'bitrate': args.bitrate,
+            'samplerate': args.samplerate,
+            'channels': args.channels,
+            'quality': args.quality,
+            'resampler': args.resampler,
+            'start': args.start,
+            'end': args.end,
+            'duration': args.duration,
+            'loudnorm': dict(LOUDNORM_TARGET) if args.loudnorm else None,
+        }
+        processor = FFmpegProcessor()
+        if not processor.check_ffmpeg_available():
+            return 1
+        published = publish_batch(args.queue_dir, args.files, config, processor,
+                                  log=lambda message, level=logging.INFO: print(message))
+        return 0 if published else 1
+    if args.command == "worker":
+        exit_when_empty = not args.forever
+        if args.processes <= 1:
+            if args.trace:
+                enable_tracing(args.trace)
+            QueueWorker(args.queue_dir, lease_timeout=args.lease_timeout, heartbeat_interval=args.heartbeat_interval,
+                        stall_timeout=args.stall_timeout).run(exit_when_empty=exit_when_empty)
+            return 0
+        exit_codes = run_local_workers(args.queue_dir, args.processes, args.lease_timeout,
+                                       args.heartbeat_interval, exit_when_empty, args.trace, args.stall_timeout)
+        return 0 if all(code == 0 for code in exit_codes) else 1
+    if args.command == "status":
+        print(json.dumps(JobQueue(args.queue_dir).status(), ensure_ascii=False))
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
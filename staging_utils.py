@@ -0,0 +1,235 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from trace_utils import trace_span
+
+# 输入暂存目录与容量上限
+STAGING_DIR = os.path.join(tempfile.gettempdir(), "video2acc_cache", "staging")
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024 * 1024
+
+# 顺序复制的单次读取大小：大块读对 SMB/NFS 的吞吐远好于 FFmpeg 的小块随机读
+COPY_CHUNK_SIZE = 16 * 1024 * 1024
+
+# 处理当前文件时预取其后的文件数
+PREFETCH_AHEAD = 2
+
+
+def copy_sequential(src, dst, chunk_size=COPY_CHUNK_SIZE):
+    """以大块顺序读复制文件，复用同一块缓冲区。"""
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(src, "rb", buffering=0) as fin, open(dst, "wb") as fout:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fin.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while True:
+            n = fin.readinto(buffer)
+            if not n:
+                break
+            fout.write(view[:n])
+    shutil.copystat(src, dst)
+
+
+class StagingCache:
+    """
+    输入暂存：把位于慢速或网络存储上的源文件一次性顺序复制到本地缓存目录，
+    同一文件的多个 FFmpeg 任务（多音轨、先提取再编码）都从本地副本读取。
+    后台线程预取后续文件，与当前文件的编码重叠；容量有上限并按 LRU 淘汰，正在使用的副本不会被淘汰。
+    """
+    def __init__(self, cache_dir=STAGING_DIR, max_bytes=DEFAULT_MAX_BYTES, log=None):
+        """
+        Args:
+            cache_dir (str): 本地缓存目录。
+            max_bytes (int): 缓存容量上限 (字节)。
+            log (callable, optional): 日志回调，签名为 log(message, level)，会在预取线程中调用。
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.log = log
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> {'file', 'size', 'last_used'}
+        self._pins = {}     # key -> 正在使用的次数
+        self._pending = {}  # key -> 正在复制的 Future
+        self._reserved = 0  # 正在复制的文件占用的空间
+        self._staged_keys = {}  # 源文件路径 -> key
+        self._prefetch_queued = set()
+        # 单线程预取：对同一共享存储并发读取只会互相拖慢
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="staging")
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _log(self, message, level=logging.INFO):
+        if self.log:
+            self.log(message, level)
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        self._entries = {
+            key: entry for key, entry in entries.items()
+            if isinstance(entry, dict) and os.path.exists(os.path.join(self.cache_dir, entry.get("file", "")))
+        }
+
+    def _save_index(self):
+        """写入索引；失败 (如临时盘已满) 只记录警告，索引只用于下次启动时复用副本。"""
+        tmp_path = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            self._log(f"[WARNING] 写入暂存索引失败: {e}", logging.WARNING)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _key(source_path):
+        """以源路径、大小和修改时间作为键，源文件被修改后自动重新暂存。"""
+        st = os.stat(source_path)
+        text = f"{os.path.abspath(source_path)}|{st.st_size}|{st.st_mtime_ns}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest(), st.st_size
+
+    def stage(self, source_path):
+        """
+        返回源文件的本地副本路径（必要时先复制，若已在预取则等待预取完成），并将其标记为使用中。
+        副本放不下或复制失败时返回源路径本身，处理照常直接读取源文件。
+        用完后调用 release()。
+        """
+        try:
+            key, size = self._key(source_path)
+        except OSError:
+            return source_path
+        local_path = self._materialize(source_path, key, size)
+        if local_path is None:
+            return source_path
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+            self._staged_keys[source_path] = key
+        return local_path
+
+    def release(self, source_path):
+        """源文件的任务全部结束后解除使用标记，副本此后可被淘汰。"""
+        with self._lock:
+            key = self._staged_keys.pop(source_path, None)
+            if key is None:
+                return
+            self._pins[key] -= 1
+            if self._pins[key] <= 0:
+                del self._pins[key]
+
+    def prefetch(self, source_paths):
+        """在后台按顺序预取文件，已在缓存或已排队的文件会被跳过。"""
+        for source_path in source_paths:
+            with self._lock:
+                if source_path in self._prefetch_queued:
+                    continue
+                self._prefetch_queued.add(source_path)
+            self._executor.submit(self._prefetch_one, source_path)
+
+    def _prefetch_one(self, source_path):
+        try:
+            key, size = self._key(source_path)
+        except OSError:
+            return
+        self._materialize(source_path, key, size)
+
+    def _materialize(self, source_path, key, size):
+        """确保 key 对应的副本存在。同一文件同时只复制一次，其他调用方等待结果。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                entry["last_used"] = time.time()
+                return os.path.join(self.cache_dir, entry["file"])
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                if not self._make_room(size):
+                    return None
+                future = Future()
+                self._pending[key] = future
+                self._reserved += size
+        if not owner:
+            return future.result()
+
+        file_name = key + os.path.splitext(source_path)[1]
+        local_path = os.path.join(self.cache_dir, file_name)
+        part_path = local_path + ".part"
+        result = None
+        try:
+            started_at = time.monotonic()
+            with trace_span("暂存复制", "staging", file=os.path.basename(source_path), size=size):
+                copy_sequential(source_path, part_path)
+            os.replace(part_path, local_path)
+            elapsed = max(time.monotonic() - started_at, 1e-6)
+            self._log(f"[INFO] 已暂存到本地 ({size / elapsed / 1024 / 1024:.1f} MB/s): {source_path}")
+            result = local_path
+        except OSError as e:
+            self._log(f"[WARNING] 暂存 {source_path} 失败，将直接读取源文件: {e}", logging.WARNING)
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+        finally:
+            with self._lock:
+                self._reserved -= size
+                self._pending.pop(key, None)
+                if result is not None:
+                    self._entries[key] = {"file": file_name, "size": size, "last_used": time.time()}
+            # 先唤醒等待同一文件的调用方，再写索引
+            future.set_result(result)
+        if result is not None:
+            with self._lock:
+                self._save_index()
+        return result
+
+    def _make_room(self, size):
+        """按 LRU 淘汰未在使用的副本，为 size 字节腾出空间；无法腾出时返回 False。调用方需持有锁。"""
+        if size > self.max_bytes:
+            return False
+        total = sum(entry["size"] for entry in self._entries.values()) + self._reserved
+        if total + size <= self.max_bytes:
+            return True
+        # 使用中的副本不能淘汰；即使淘汰其余全部副本也放不下时不删除任何东西
+        freeable = sum(entry["size"] for key, entry in self._entries.items() if key not in self._pins)
+        if total - freeable + size > self.max_bytes:
+            return False
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["last_used"]):
+            if total + size <= self.max_bytes:
+                break
+            if key in self._pins:
+                continue
+            total -= self._entries[key]["size"]
+            entry = self._entries.pop(key)
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError:
+                pass
+        self._save_index()
+        return total + size <= self.max_bytes
+
+    def close(self):
+        """停止预取：取消尚未开始的预取并等待正在进行的复制结束。"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def stage_job_inputs(jobs, source_path, staged_path):
+    """把任务中直接读取源文件的步骤改为读取本地副本，输出位置和后续步骤不变。"""
+    if staged_path == source_path:
+        return
+    for job in jobs:
+        for step in job["steps"]:
+            if step["input_path"] == source_path:
+                step["input_path"] = staged_path
@@ -0,0 +1,54 @@
+"""
+流式转换命令行：从标准输入、文件或 URL 读取媒体，把音轨转换后写到标准输出或文件，不产生中间文件，
+可直接接在下载和上传之间。日志写到标准错误，标准输出只有媒体数据。
+
+标准输入/输出以无缓冲文件对象交给 FFmpeg 直接读写，数据不经过本进程。
+
+用法:
+    curl -s URL | python stream_utils.py --codec opus --format opus > out.opus
+    python stream_utils.py --input http://127.0.0.1:8000/a.mkv --codec aac | uploader
+    python stream_utils.py --input a.mkv --codec copy --format m4a --track 1 --output a.m4a
+"""
+import argparse
+import logging
+import sys
+
+from ffmpeg_utils import RESAMPLER_PRESETS, STREAM_OUTPUT_ARGS, FFmpegProcessor
+
+
+def _log_to_stderr(message, level=logging.INFO):
+    print(message, file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="video2acc 流式转换 (stdin/URL -> stdout)")
+    parser.add_argument("--input", default="-", help="输入文件路径或 URL，- 表示标准输入")
+    parser.add_argument("--output", default="-", help="输出文件路径，- 表示标准输出")
+    parser.add_argument("--codec", default="aac", help="目标编码，copy 表示不重新编码")
+    parser.add_argument("--format", dest="output_format", choices=list(STREAM_OUTPUT_ARGS),
+                        help="输出封装，默认按编码推断 (aac -> m4a)")
+    parser.add_argument("--track", type=int, default=0, help="音轨索引")
+    parser.add_argument("--bitrate")
+    parser.add_argument("--samplerate", help="输出采样率 (Hz)，留空保持源采样率")
+    parser.add_argument("--channels", help="输出声道数，留空保持源声道数")
+    parser.add_argument("--resampler", choices=list(RESAMPLER_PRESETS), default="swr")
+    parser.add_argument("--quality")
+    parser.add_argument("--start", help="截取起点 (秒或 HH:MM:SS)")
+    parser.add_argument("--end", help="截取终点 (秒或 HH:MM:SS)")
+    parser.add_argument("--duration", help="截取时长 (秒或 HH:MM:SS)")
+    args = parser.parse_args(argv)
+
+    processor = FFmpegProcessor(log_callback=_log_to_stderr)
+    if not processor.check_ffmpeg_available():
+        return 1
+    source = open(sys.stdin.fileno(), "rb", buffering=0, closefd=False) if args.input == "-" else args.input
+    sink = open(sys.stdout.fileno(), "wb", buffering=0, closefd=False) if args.output == "-" else args.output
+    success = processor.transcode_stream(
+        source, sink, args.codec, output_format=args.output_format, track_index=args.track,
+        bitrate=args.bitrate, samplerate=args.samplerate, channels=args.channels, quality=args.quality,
+        resampler=args.resampler, start=args.start, end=args.end, duration=args.duration)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
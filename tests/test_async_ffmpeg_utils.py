@@ -0,0 +1,65 @@
+import asyncio
+import os
+import platform
+import stat
+
+import pytest
+
+import async_ffmpeg_utils
+from async_ffmpeg_utils import AsyncFFmpegProcessor
+
+pytestmark = pytest.mark.skipif(platform.system() == "Windows", reason="用 shell 脚本模拟卡住的子进程")
+
+
+@pytest.fixture
+def hanging_processor(tmp_path, monkeypatch):
+    """ffmpeg/ffprobe 都替换为一直不退出的脚本，并记录启动的子进程。"""
+    stub = tmp_path / "hang"
+    stub.write_text("#!/bin/sh\nexec sleep 60\n")
+    stub.chmod(stub.stat().st_mode | stat.S_IEXEC)
+    processor = AsyncFFmpegProcessor(log_callback=lambda message, level=None: None)
+    processor.processor.ffmpeg_path = str(stub)
+    processor.processor.ffprobe_path = str(stub)
+
+    started = []
+    create = asyncio.create_subprocess_exec
+
+    async def recording_create(*args, **kwargs):
+        process = await create(*args, **kwargs)
+        started.append(process)
+        return process
+
+    monkeypatch.setattr(async_ffmpeg_utils.asyncio, "create_subprocess_exec", recording_create)
+    source = tmp_path / "input.mkv"
+    source.write_bytes(b"")
+    return processor, started, str(source), str(tmp_path / "out.m4a")
+
+
+def _assert_reaped(process):
+    assert process.returncode is not None
+    with pytest.raises(ProcessLookupError):
+        os.kill(process.pid, 0)
+
+
+async def _cancel_when_started(coro, started):
+    task = asyncio.create_task(coro)
+    while not started:
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.2)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+def test_cancelled_extract_kills_ffmpeg(hanging_processor):
+    processor, started, source, output = hanging_processor
+    asyncio.run(_cancel_when_started(processor.extract_aac_track(source, output, 0), started))
+    assert len(started) == 1
+    _assert_reaped(started[0])
+
+
+def test_cancelled_probe_kills_ffprobe(hanging_processor):
+    processor, started, source, _ = hanging_processor
+    asyncio.run(_cancel_when_started(processor.probe_audio_tracks(source), started))
+    assert len(started) == 1
+    _assert_reaped(started[0])
@@ -0,0 +1,116 @@
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+import pytest
+
+import queue_utils
+from queue_utils import JobQueue, publish_batch, run_local_workers
+
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != "fork" or not hasattr(signal, "SIGKILL"),
+                                reason="工作进程需继承测试中替换的 run_track_job")
+
+
+def _append(path, line):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def _read_lines(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().split()
+
+
+def _publish_jobs(queue, output_dir, count):
+    job_ids = []
+    for i in range(count):
+        job = {"file_path": f"/media/{i}.mkv", "track_index": 0, "output_dir": output_dir, "steps": []}
+        job_ids.append(queue.publish(job, {"mode": "direct_extract"}))
+    return job_ids
+
+
+def test_killed_worker_job_is_requeued_and_completed_once(tmp_path, monkeypatch):
+    queue_dir = str(tmp_path / "queue")
+    queue = JobQueue(queue_dir)
+    job_ids = _publish_jobs(queue, str(tmp_path / "out"), 6)
+    victim = job_ids[2]
+    runs, completions = str(tmp_path / "runs"), str(tmp_path / "completions")
+    killed_marker = tmp_path / "killed"
+
+    def stub_run_track_job(processor, job, config, log, **kwargs):
+        job_id = job_ids[int(os.path.splitext(os.path.basename(job["file_path"]))[0])]
+        _append(runs, job_id)
+        if job_id == victim and not killed_marker.exists():
+            killed_marker.touch()
+            os.kill(os.getpid(), signal.SIGKILL)  # 持有租约时被杀，心跳随之停止
+        time.sleep(0.2)
+        return True
+
+    original_complete = JobQueue.complete
+
+    def recording_complete(self, leased_path, payload, success, worker_id, reason=None):
+        completed = original_complete(self, leased_path, payload, success, worker_id, reason)
+        if completed:
+            _append(completions, payload["id"])
+        return completed
+
+    monkeypatch.setattr(queue_utils, "run_track_job", stub_run_track_job)
+    monkeypatch.setattr(JobQueue, "complete", recording_complete)
+    monkeypatch.setattr(queue_utils, "IDLE_POLL_INTERVAL", 0.2)
+
+    exit_codes = run_local_workers(queue_dir, 3, lease_timeout=1.0, heartbeat_interval=0.2)
+
+    assert sorted(exit_codes) == [-signal.SIGKILL, 0, 0]
+    assert queue.status() == {"pending": 0, "leased": 0, "done": 6, "failed": 0}
+    assert sorted(_read_lines(completions)) == sorted(job_ids)  # 每个任务恰好完成一次
+    runs_per_job = {job_id: _read_lines(runs).count(job_id) for job_id in job_ids}
+    assert runs_per_job.pop(victim) == 2
+    assert set(runs_per_job.values()) == {1}
+    with open(os.path.join(queue_dir, "done", f"{victim}.json"), encoding="utf-8") as f:
+        assert json.load(f)["attempts"] == 1
+
+
+def test_expired_lease_is_requeued_and_stale_completion_rejected(tmp_path):
+    queue = JobQueue(str(tmp_path), lease_timeout=1.0)
+    [job_id] = _publish_jobs(queue, str(tmp_path / "out"), 1)
+    stale_path, payload = queue.lease("worker-a")
+    assert payload["id"] == job_id
+    assert queue.requeue_expired() == 0  # 租约刚刚建立，未超时
+    old = time.time() - 10
+    os.utime(stale_path, (old, old))
+    assert queue.requeue_expired() == 1
+    assert queue.status()["pending"] == 1
+
+    leased_path, payload = queue.lease("worker-b")
+    assert payload["attempts"] == 1
+    assert not queue.complete(stale_path, payload, True, "worker-a")
+    assert queue.complete(leased_path, payload, True, "worker-b")
+    assert queue.status() == {"pending": 0, "leased": 0, "done": 1, "failed": 0}
+
+
+def test_publish_batch_drops_local_only_settings(tmp_path):
+    class Processor:
+        def probe_audio_tracks(self, path):
+            return [{"codec_type": "audio", "codec_name": "aac", "index": 1}]
+
+        def get_common_audio_extension(self, codec_name):
+            return codec_name
+
+    messages = []
+    config = {"mode": "direct_extract", "output_codec": "aac", "output_format": "m4a",
+              "result_cache": True, "verify_outputs": True, "stage_inputs": False, "max_jobs": 1}
+    published = publish_batch(str(tmp_path), [str(tmp_path / "a.mkv")], config, Processor(),
+                              log=lambda message, level=logging.INFO: messages.append((message, level)))
+    assert published == 1
+    [name] = os.listdir(tmp_path / "pending")
+    with open(tmp_path / "pending" / name, encoding="utf-8") as f:
+        published_config = json.load(f)["config"]
+    assert not set(published_config) & set(queue_utils.LOCAL_CONFIG_DEFAULTS)
+    warnings = [message for message, level in messages if level == logging.WARNING]
+    assert len(warnings) == 1 and "复用处理结果" in warnings[0] and "处理后校验输出" in warnings[0]
+    assert "先复制到本地" not in warnings[0]
@@ -0,0 +1,137 @@
+"""
+可选的批处理时间线追踪，导出为 Chrome/Perfetto 可打开的 trace JSON (chrome://tracing 或 ui.perfetto.dev)。
+
+追踪默认关闭，关闭时 trace_span/trace_process 只返回空上下文，开销可以忽略。
+启用方式：设置环境变量 VIDEO2ACC_TRACE（值为输出路径，或 "1" 使用日志目录下的默认文件名），
+或在工作进程命令行中传 --trace。
+
+每个线程在时间线中是一条泳道，记录的区间包括 ffprobe 探测、每个 FFmpeg 子进程、
+任务步骤、队列等待和 GUI 日志写入；另有一条计数器曲线显示同时运行的子进程数。
+"""
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+TRACE_ENV = "VIDEO2ACC_TRACE"
+TRACE_DIR = os.path.join(tempfile.gettempdir(), "video2acc_logs")
+
+_TRACER = None
+
+
+class Tracer:
+    """收集 Chrome trace 事件（时间单位为微秒），线程安全。"""
+    def __init__(self, path):
+        self.path = path
+        self.pid = os.getpid()
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._events = []
+        self._thread_names = {}
+        self._active_processes = 0
+
+    def now(self):
+        """相对追踪开始的微秒数。"""
+        return (time.perf_counter() - self._origin) * 1000000
+
+    def _tid(self):
+        tid = threading.get_native_id()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        return tid
+
+    def record(self, name, category, start, end, **args):
+        """记录一个已结束的区间，start/end 为 now() 的返回值。"""
+        event = {
+            "name": name, "cat": category, "ph": "X",
+            "ts": start, "dur": max(0.0, end - start),
+            "pid": self.pid, "tid": self._tid(), "args": args,
+        }
+        with self._lock:
+            self._events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name, category, **args):
+        """记录代码块的耗时。产出的 args 字典可在块内补充字段（如子进程 pid）。"""
+        start = self.now()
+        try:
+            yield args
+        finally:
+            self.record(name, category, start, self.now(), **args)
+
+    def _count_process(self, delta):
+        with self._lock:
+            self._active_processes += delta
+            self._events.append({
+                "name": "运行中的子进程", "ph": "C", "ts": self.now(), "pid": self.pid,
+                "args": {"count": self._active_processes},
+            })
+
+    @contextlib.contextmanager
+    def process(self, name, category, **args):
+        """子进程区间：在 span 的基础上更新同时运行的子进程计数。"""
+        self._count_process(1)
+        try:
+            with self.span(name, category, **args) as span_args:
+                yield span_args
+        finally:
+            self._count_process(-1)
+
+    def export(self, path=None):
+        """写出 trace JSON，返回写入的路径。可多次调用，每次写出截至当前的全部事件。"""
+        path = path or self.path
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+        metadata = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": f"video2acc ({self.pid})"}}]
+        metadata += [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+            for tid, name in thread_names.items()
+        ]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+
+def default_trace_path():
+    return os.path.join(TRACE_DIR, f"trace-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}.json")
+
+
+def enable_tracing(path=None):
+    """启用本进程的追踪并返回 Tracer；path 为空时使用日志目录下的默认文件名。"""
+    global _TRACER
+    _TRACER = Tracer(path or default_trace_path())
+    return _TRACER
+
+
+def enable_tracing_from_env():
+    """按环境变量 VIDEO2ACC_TRACE 启用追踪，未设置时返回 None。"""
+    value = os.environ.get(TRACE_ENV, "").strip()
+    if not value or value == "0":
+        return None
+    return enable_tracing(None if value == "1" else value)
+
+
+def get_tracer():
+    """当前进程的 Tracer，未启用追踪时为 None。"""
+    return _TRACER
+
+
+def trace_span(name, category, **args):
+    """追踪启用时记录代码块耗时，否则为空上下文。"""
+    if _TRACER is None:
+        return contextlib.nullcontext(args)
+    return _TRACER.span(name, category, **args)
+
+
+def trace_process(name, category, **args):
+    """追踪启用时记录子进程区间并更新子进程计数，否则为空上下文。"""
+    if _TRACER is None:
+        return contextlib.nullcontext(args)
+    return _TRACER.process(name, category, **args)
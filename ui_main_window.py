@@ -13,8 +13,8 @@ from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
     QFont, QFontDatabase, QGradient, QIcon,
     QImage, QKeySequence, QLinearGradient, QPainter,
     QPalette, QPixmap, QRadialGradient, QTransform)
-from PySide6.QtWidgets import (QApplication, QComboBox, QGroupBox, QHBoxLayout,
-    QLabel, QLineEdit, QListWidget, QListWidgetItem,
+from PySide6.QtWidgets import (QApplication, QCheckBox, QComboBox, QGroupBox, QHBoxLayout,
+    QLabel, QLineEdit, QListView, QListWidget, QListWidgetItem,
     QMainWindow, QPushButton, QRadioButton, QSizePolicy,
     QSlider, QSpacerItem, QTextEdit, QVBoxLayout,
     QWidget)
@@ -43,10 +43,13 @@ class Ui_MainWindow(object):
         self.select_files_button.setText(QCoreApplication.translate("MainWindow", u"选择媒体文件...", None))
         self.verticalLayout_file_selection.addWidget(self.select_files_button)
 
-        self.file_list_widget = QListWidget(self.file_selection_groupbox)
-        self.file_list_widget.setObjectName(u"file_list_widget")
-        self.file_list_widget.setSelectionMode(QListWidget.SelectionMode.NoSelection) # 不允许在列表中选择，只用于显示
-        self.verticalLayout_file_selection.addWidget(self.file_list_widget)
+        self.file_list_view = QListView(self.file_selection_groupbox)
+        self.file_list_view.setObjectName(u"file_list_view")
+        self.file_list_view.setSelectionMode(QListView.SelectionMode.NoSelection) # 不允许在列表中选择，只用于显示
+        self.file_list_view.setUniformItemSizes(True) # 行高一致，视图无需逐行计算尺寸
+        self.file_list_view.setLayoutMode(QListView.LayoutMode.Batched) # 大量文件时分批布局，避免界面卡住
+        self.file_list_view.setBatchSize(500)
+        self.verticalLayout_file_selection.addWidget(self.file_list_view)
 
         self.verticalLayout_main.addWidget(self.file_selection_groupbox)
 
@@ -68,11 +71,42 @@ class Ui_MainWindow(object):
         self.recode_radio.setText(QCoreApplication.translate("MainWindow", u"重新编码音频 (强制转码)", None))
         self.horizontalLayout_mode.addWidget(self.recode_radio)
 
+        self.split_chapters_check_box = QCheckBox(self.processing_mode_groupbox)
+        self.split_chapters_check_box.setObjectName(u"split_chapters_check_box")
+        self.split_chapters_check_box.setText(QCoreApplication.translate("MainWindow", u"按章节拆分", None))
+        self.split_chapters_check_box.setToolTip(QCoreApplication.translate("MainWindow", u"有章节标记的文件 (有声书、讲座) 每章输出一个文件，按章节序号和标题命名；只读取一次源文件", None))
+        self.horizontalLayout_mode.addWidget(self.split_chapters_check_box)
+
         self.horizontalSpacer_mode = QSpacerItem(40, 20, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
         self.horizontalLayout_mode.addItem(self.horizontalSpacer_mode)
 
         self.verticalLayout_main.addWidget(self.processing_mode_groupbox)
 
+        # --- 2.1 时间范围 (可选) ---
+        self.time_range_groupbox = QGroupBox(self.centralwidget)
+        self.time_range_groupbox.setObjectName(u"time_range_groupbox")
+        self.time_range_groupbox.setTitle(QCoreApplication.translate("MainWindow", u"截取时间范围 (可选，留空处理整条音轨)", None))
+        self.horizontalLayout_time_range = QHBoxLayout(self.time_range_groupbox)
+        self.horizontalLayout_time_range.setObjectName(u"horizontalLayout_time_range")
+        self.start_time_label = QLabel(self.time_range_groupbox)
+        self.start_time_label.setObjectName(u"start_time_label")
+        self.start_time_label.setText(QCoreApplication.translate("MainWindow", u"起点:", None))
+        self.horizontalLayout_time_range.addWidget(self.start_time_label)
+        self.start_time_line_edit = QLineEdit(self.time_range_groupbox)
+        self.start_time_line_edit.setObjectName(u"start_time_line_edit")
+        self.start_time_line_edit.setPlaceholderText(QCoreApplication.translate("MainWindow", u"秒或 时:分:秒，如 1:30:00", None))
+        self.horizontalLayout_time_range.addWidget(self.start_time_line_edit)
+        self.end_time_label = QLabel(self.time_range_groupbox)
+        self.end_time_label.setObjectName(u"end_time_label")
+        self.end_time_label.setText(QCoreApplication.translate("MainWindow", u"终点:", None))
+        self.horizontalLayout_time_range.addWidget(self.end_time_label)
+        self.end_time_line_edit = QLineEdit(self.time_range_groupbox)
+        self.end_time_line_edit.setObjectName(u"end_time_line_edit")
+        self.end_time_line_edit.setPlaceholderText(QCoreApplication.translate("MainWindow", u"留空表示到结尾", None))
+        self.horizontalLayout_time_range.addWidget(self.end_time_line_edit)
+
+        self.verticalLayout_main.addWidget(self.time_range_groupbox)
+
         # --- 3. 编码参数设置区 ---
         self.encoding_params_group_box = QGroupBox(self.centralwidget)
         self.encoding_params_group_box.setObjectName(u"encoding_params_group_box")
@@ -153,14 +187,106 @@ class Ui_MainWindow(object):
         self.horizontalSpacer_channels = QSpacerItem(40, 20, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
         self.horizontalLayout_channels.addItem(self.horizontalSpacer_channels)
         self.formLayout_encoding_params.addLayout(self.horizontalLayout_channels)
+
+        # 重采样器 (只在需要改变采样率时使用)
+        self.horizontalLayout_resampler = QHBoxLayout()
+        self.horizontalLayout_resampler.setObjectName(u"horizontalLayout_resampler")
+        self.resampler_label = QLabel(self.encoding_params_group_box)
+        self.resampler_label.setObjectName(u"resampler_label")
+        self.resampler_label.setText(QCoreApplication.translate("MainWindow", u"重采样器:", None))
+        self.horizontalLayout_resampler.addWidget(self.resampler_label)
+        self.resampler_combo_box = QComboBox(self.encoding_params_group_box)
+        self.resampler_combo_box.setObjectName(u"resampler_combo_box")
+        self.resampler_combo_box.addItem(QCoreApplication.translate("MainWindow", u"swr 默认 (最快)", None), "swr")
+        self.resampler_combo_box.addItem(QCoreApplication.translate("MainWindow", u"swr 高质量", None), "swr_hq")
+        self.resampler_combo_box.addItem(QCoreApplication.translate("MainWindow", u"soxr 高质量", None), "soxr")
+        self.resampler_combo_box.addItem(QCoreApplication.translate("MainWindow", u"soxr 极高质量 (最慢)", None), "soxr_vhq")
+        self.resampler_combo_box.setToolTip(QCoreApplication.translate("MainWindow", u"只在输出采样率与源不同时使用；soxr 需要 FFmpeg 编译了 libsoxr", None))
+        self.horizontalLayout_resampler.addWidget(self.resampler_combo_box)
+        self.horizontalSpacer_resampler = QSpacerItem(40, 20, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
+        self.horizontalLayout_resampler.addItem(self.horizontalSpacer_resampler)
+        self.formLayout_encoding_params.addLayout(self.horizontalLayout_resampler)
+
+        # 同时输出的其他格式 (一次解码多路编码)
+        self.horizontalLayout_extra_formats = QHBoxLayout()
+        self.horizontalLayout_extra_formats.setObjectName(u"horizontalLayout_extra_formats")
+        self.extra_formats_label = QLabel(self.encoding_params_group_box)
+        self.extra_formats_label.setObjectName(u"extra_formats_label")
+        self.extra_formats_label.setText(QCoreApplication.translate("MainWindow", u"同时输出:", None))
+        self.horizontalLayout_extra_formats.addWidget(self.extra_formats_label)
+        self.extra_formats_line_edit = QLineEdit(self.encoding_params_group_box)
+        self.extra_formats_line_edit.setObjectName(u"extra_formats_line_edit")
+        self.extra_formats_line_edit.setPlaceholderText(QCoreApplication.translate("MainWindow", u"其他格式，逗号分隔，如 mp3,flac (只解码一次)", None))
+        self.horizontalLayout_extra_formats.addWidget(self.extra_formats_line_edit)
+        self.horizontalSpacer_extra_formats = QSpacerItem(40, 20, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
+        self.horizontalLayout_extra_formats.addItem(self.horizontalSpacer_extra_formats)
+        self.formLayout_encoding_params.addLayout(self.horizontalLayout_extra_formats)
+
+        # 响度标准化 (两遍 loudnorm)
+        self.loudnorm_check_box = QCheckBox(self.encoding_params_group_box)
+        self.loudnorm_check_box.setObjectName(u"loudnorm_check_box")
+        self.loudnorm_check_box.setText(QCoreApplication.translate("MainWindow", u"响度标准化 (EBU R128, -23 LUFS)", None))
+        self.loudnorm_check_box.setToolTip(QCoreApplication.translate("MainWindow", u"只作用于需要编码的音轨；分析结果会缓存，改变编码参数后无需重新分析", None))
+        self.formLayout_encoding_params.addWidget(self.loudnorm_check_box)
         
         self.verticalLayout_main.addWidget(self.encoding_params_group_box)
 
         # --- 4. 操作按钮区 ---
+        self.horizontalLayout_actions = QHBoxLayout()
+        self.horizontalLayout_actions.setObjectName(u"horizontalLayout_actions")
+        self.verify_outputs_check_box = QCheckBox(self.centralwidget)
+        self.verify_outputs_check_box.setObjectName(u"verify_outputs_check_box")
+        self.verify_outputs_check_box.setText(QCoreApplication.translate("MainWindow", u"处理后校验输出", None))
+        self.verify_outputs_check_box.setToolTip(QCoreApplication.translate("MainWindow", u"完整解码每个输出并与源时长比对，校验与后续编码并行进行", None))
+        self.horizontalLayout_actions.addWidget(self.verify_outputs_check_box)
+        self.stage_inputs_check_box = QCheckBox(self.centralwidget)
+        self.stage_inputs_check_box.setObjectName(u"stage_inputs_check_box")
+        self.stage_inputs_check_box.setText(QCoreApplication.translate("MainWindow", u"先复制到本地", None))
+        self.stage_inputs_check_box.setToolTip(QCoreApplication.translate("MainWindow", u"源文件在网络共享上时，先顺序复制到本地缓存再处理，并在编码时预取后续文件", None))
+        self.horizontalLayout_actions.addWidget(self.stage_inputs_check_box)
+        self.result_cache_check_box = QCheckBox(self.centralwidget)
+        self.result_cache_check_box.setObjectName(u"result_cache_check_box")
+        self.result_cache_check_box.setText(QCoreApplication.translate("MainWindow", u"复用处理结果", None))
+        self.result_cache_check_box.setToolTip(QCoreApplication.translate("MainWindow", u"相同的源文件和参数直接复用缓存中的输出，不再调用 FFmpeg；缓存位于临时目录，与输出不在同一磁盘时每个输出会多复制一次", None))
+        self.horizontalLayout_actions.addWidget(self.result_cache_check_box)
+        self.max_jobs_label = QLabel(self.centralwidget)
+        self.max_jobs_label.setObjectName(u"max_jobs_label")
+        self.max_jobs_label.setText(QCoreApplication.translate("MainWindow", u"同时处理:", None))
+        self.horizontalLayout_actions.addWidget(self.max_jobs_label)
+        self.max_jobs_line_edit = QLineEdit(self.centralwidget)
+        self.max_jobs_line_edit.setObjectName(u"max_jobs_line_edit")
+        self.max_jobs_line_edit.setMaximumWidth(40)
+        self.max_jobs_line_edit.setPlaceholderText(QCoreApplication.translate("MainWindow", u"1", None))
+        self.max_jobs_line_edit.setToolTip(QCoreApplication.translate("MainWindow", u"同时处理的文件数；启用自动调节时为上限，留空则为 CPU 核数", None))
+        self.horizontalLayout_actions.addWidget(self.max_jobs_line_edit)
+        self.auto_concurrency_check_box = QCheckBox(self.centralwidget)
+        self.auto_concurrency_check_box.setObjectName(u"auto_concurrency_check_box")
+        self.auto_concurrency_check_box.setText(QCoreApplication.translate("MainWindow", u"自动调节", None))
+        self.auto_concurrency_check_box.setToolTip(QCoreApplication.translate("MainWindow", u"处理时根据 CPU 利用率、磁盘 I/O 等待和实测速度自动增减同时处理的文件数，调整记录在日志中", None))
+        self.horizontalLayout_actions.addWidget(self.auto_concurrency_check_box)
+        self.stall_timeout_label = QLabel(self.centralwidget)
+        self.stall_timeout_label.setObjectName(u"stall_timeout_label")
+        self.stall_timeout_label.setText(QCoreApplication.translate("MainWindow", u"无进度超时(秒):", None))
+        self.horizontalLayout_actions.addWidget(self.stall_timeout_label)
+        self.stall_timeout_line_edit = QLineEdit(self.centralwidget)
+        self.stall_timeout_line_edit.setObjectName(u"stall_timeout_line_edit")
+        self.stall_timeout_line_edit.setMaximumWidth(50)
+        self.stall_timeout_line_edit.setPlaceholderText(QCoreApplication.translate("MainWindow", u"60", None))
+        self.stall_timeout_line_edit.setToolTip(QCoreApplication.translate("MainWindow", u"FFmpeg 超过该秒数没有进度，或运行时间远超音轨时长时终止该任务并记录原因，其余任务继续；0 表示不检测", None))
+        self.horizontalLayout_actions.addWidget(self.stall_timeout_line_edit)
+        self.plan_button = QPushButton(self.centralwidget)
+        self.plan_button.setObjectName(u"plan_button")
+        self.plan_button.setText(QCoreApplication.translate("MainWindow", u"生成处理计划 (试运行)", None))
+        self.horizontalLayout_actions.addWidget(self.plan_button)
+        self.publish_queue_button = QPushButton(self.centralwidget)
+        self.publish_queue_button.setObjectName(u"publish_queue_button")
+        self.publish_queue_button.setText(QCoreApplication.translate("MainWindow", u"发布到任务队列...", None))
+        self.horizontalLayout_actions.addWidget(self.publish_queue_button)
         self.start_processing_button = QPushButton(self.centralwidget)
         self.start_processing_button.setObjectName(u"start_processing_button")
         self.start_processing_button.setText(QCoreApplication.translate("MainWindow", u"开始处理", None))
-        self.verticalLayout_main.addWidget(self.start_processing_button)
+        self.horizontalLayout_actions.addWidget(self.start_processing_button)
+        self.verticalLayout_main.addLayout(self.horizontalLayout_actions)
 
         # --- 5. 状态/日志显示区 ---
         self.status_label = QLabel(self.centralwidget)
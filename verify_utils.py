@@ -0,0 +1,140 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from trace_utils import get_tracer
+
+# 校验工作线程数的默认值：解码比编码轻，占用一半核心，给并行的编码留出余量
+DEFAULT_VERIFY_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+# 解码时长与源时长允许的偏差：取绝对值和相对比例中较大者
+# (有损编码会引入编码延迟/补齐，时长通常相差几十毫秒)
+DURATION_TOLERANCE_SECONDS = 0.5
+DURATION_TOLERANCE_RATIO = 0.01
+
+
+def duration_tolerance(expected_seconds):
+    """给定源时长允许的解码时长偏差 (秒)。"""
+    return max(DURATION_TOLERANCE_SECONDS, expected_seconds * DURATION_TOLERANCE_RATIO)
+
+
+def check_decoded_output(decode_result, expected_seconds):
+    """
+    根据解码结果判断输出是否完整。
+    Args:
+        decode_result (dict): FFmpegProcessor.decode_audio_output 的返回值。
+        expected_seconds (float): 探测到的源音轨时长 (已按时间窗口裁剪)，未知时为 None。
+    Returns:
+        str: 不通过的原因，通过时返回 None。
+    """
+    errors = decode_result['errors'].splitlines()
+    if decode_result['returncode'] != 0:
+        # FFmpeg 的最后一行错误通常是概括性的原因
+        return f"解码失败 (返回码 {decode_result['returncode']}): {errors[-1] if errors else '无错误输出'}"
+    if errors:
+        return f"解码时出现错误: {errors[0]}"
+    decoded = decode_result['decoded_seconds']
+    if not decoded:
+        return "未解码出任何音频"
+    if expected_seconds:
+        tolerance = duration_tolerance(expected_seconds)
+        if abs(decoded - expected_seconds) > tolerance:
+            return f"时长不符: 解码 {decoded:.2f}s，源 {expected_seconds:.2f}s (允许偏差 {tolerance:.2f}s)"
+    return None
+
+
+class OutputVerifier:
+    """
+    处理后校验：在独立的线程池中把输出完整解码到空输出，检查能否解码以及时长是否与源一致。
+    校验与后续文件的编码并行进行，全部提交后调用 wait() 取得汇总。
+    """
+    def __init__(self, processor, log=None, max_workers=DEFAULT_VERIFY_WORKERS):
+        """
+        Args:
+            processor (FFmpegProcessor): 执行解码命令的处理器。
+            log (callable, optional): 日志回调，签名为 log(message, level)，会在校验线程中调用。
+            max_workers (int): 同时运行的校验解码进程数。
+        """
+        self.processor = processor
+        self.log = log
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="verify")
+        self._lock = threading.Lock()
+        self._futures = []
+        self._results = []
+
+    def _log(self, message, level=logging.INFO):
+        if self.log:
+            self.log(message, level)
+
+    def submit(self, job, output_path, expected_seconds=None):
+        """提交一个输出文件的校验，期望时长默认取任务的源音轨时长（按章节拆分的输出传入章节时长）。"""
+        tracer = get_tracer()
+        submitted_at = tracer.now() if tracer else None
+        future = self._executor.submit(self._verify, job['file_path'], job['track_index'], output_path,
+                                       expected_seconds if expected_seconds is not None else job.get('duration'),
+                                       submitted_at)
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def _verify(self, file_path, track_index, output_path, expected_seconds, submitted_at=None):
+        tracer = get_tracer()
+        if tracer and submitted_at is not None:
+            # 提交到开始执行之间在线程池队列中等待的时间
+            tracer.record("校验排队", "queue_wait", submitted_at, tracer.now(), output=output_path)
+        try:
+            decode_result = self.processor.decode_audio_output(output_path, media_seconds=expected_seconds)
+            reason = check_decoded_output(decode_result, expected_seconds)
+            decoded_seconds = decode_result['decoded_seconds']
+        except Exception as e:
+            reason, decoded_seconds = f"校验异常: {e}", None
+        result = {
+            'file_path': file_path,
+            'track_index': track_index,
+            'output_path': output_path,
+            'expected_seconds': expected_seconds,
+            'decoded_seconds': decoded_seconds,
+            'ok': reason is None,
+            'reason': reason,
+        }
+        if reason is None:
+            self._log(f"[INFO] 校验通过: {output_path}", logging.INFO)
+        else:
+            self._log(f"❌ 校验失败: 文件 '{os.path.basename(file_path)}' (音轨 {track_index}) - 原因: '{reason}' - 输出: '{output_path}'", logging.ERROR)
+        with self._lock:
+            self._results.append(result)
+        return result
+
+    def wait(self):
+        """等待所有已提交的校验完成并关闭线程池，返回 summary()。"""
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.result()
+        self._executor.shutdown(wait=True)
+        return self.summary()
+
+    def summary(self):
+        """
+        Returns:
+            dict: 'total', 'passed', 'failed' 以及 'failures' (不通过的校验结果列表)。
+        """
+        with self._lock:
+            results = list(self._results)
+        failures = [result for result in results if not result['ok']]
+        return {
+            'total': len(results),
+            'passed': len(results) - len(failures),
+            'failed': len(failures),
+            'failures': failures,
+        }
+
+
+def format_verify_summary(summary):
+    """将校验汇总格式化为日志行列表。"""
+    level = "[WARNING]" if summary['failed'] else "[INFO]"
+    lines = [f"{level} 输出校验: 共 {summary['total']} 个，通过 {summary['passed']} 个，失败 {summary['failed']} 个。"]
+    for failure in summary['failures']:
+        lines.append(f"[ERROR]   {failure['output_path']}: {failure['reason']}")
+    return lines
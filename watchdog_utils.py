@@ -0,0 +1,74 @@
+import re
+import time
+
+# 子进程超过该秒数没有进度即视为卡住并终止；0 或 None 表示不检测
+STALL_TIMEOUT = 60.0
+
+# 总时限 = DEADLINE_BASE + 媒体时长 / DEADLINE_MIN_SPEED，即整体慢于该倍速实时也会被终止
+DEADLINE_BASE = 120.0
+DEADLINE_MIN_SPEED = 0.5
+
+# ffprobe 探测的时限 (秒)：探测只读容器头部，正常情况下不到一秒
+PROBE_TIMEOUT = 30.0
+
+# 检查间隔 (秒)
+WATCHDOG_POLL_INTERVAL = 1.0
+
+# FFmpeg 打印输入信息时的时长行，如 "  Duration: 00:23:40.12, start: 0.000000, bitrate: 320 kb/s"
+_DURATION_PATTERN = re.compile(r"Duration:\s*(\d+):(\d{2}):(\d{2}(?:\.\d+)?)")
+
+
+class ProgressWatchdog:
+    """
+    单个 FFmpeg 子进程的看门狗。只记录状态，由调用方定期调用 check() 并在返回原因时终止进程：
+    - 输出时间 (out_time) 或已写出大小超过 stall_timeout 秒没有增长 (打开输入、读取卡住、解码死循环等)；
+    - 运行时间超过按媒体时长计算的总时限 (见 DEADLINE_BASE/DEADLINE_MIN_SPEED)。
+    媒体时长未知时可从 stderr 的输入信息中读取 (feed_stderr_line)，读不到时只检测无进度。
+    """
+    def __init__(self, stall_timeout=STALL_TIMEOUT, media_seconds=None):
+        """
+        Args:
+            stall_timeout (float): 无进度超时 (秒)，0 或 None 表示不检测。
+            media_seconds (float, optional): 待处理的媒体时长 (秒)，用于计算总时限。
+        """
+        self.stall_timeout = stall_timeout
+        self.media_seconds = media_seconds
+        self.started_at = time.monotonic()
+        self._last_progress_at = self.started_at
+        self._last_position = (None, None)
+
+    @property
+    def deadline(self):
+        """总时限 (秒)，媒体时长未知时为 None。"""
+        if not self.media_seconds:
+            return None
+        return DEADLINE_BASE + self.media_seconds / DEADLINE_MIN_SPEED
+
+    def feed(self, progress):
+        """记录一个 parse_progress_block 产生的进度字典，输出时间或大小增长时视为有进度。"""
+        position = (progress.get('out_time'), progress.get('total_size'))
+        if position != self._last_position:
+            self._last_position = position
+            self._last_progress_at = time.monotonic()
+
+    def feed_stderr_line(self, line):
+        """从 stderr 的输入信息中读取媒体时长 (只取第一个输入)。"""
+        if self.media_seconds:
+            return
+        match = _DURATION_PATTERN.search(line)
+        if match:
+            hours, minutes, seconds = match.groups()
+            self.media_seconds = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    def check(self):
+        """
+        Returns:
+            str: 需要终止时返回原因，否则返回 None。
+        """
+        now = time.monotonic()
+        if self.stall_timeout and now - self._last_progress_at > self.stall_timeout:
+            return f"超过 {self.stall_timeout:g} 秒没有进度"
+        deadline = self.deadline
+        if deadline and now - self.started_at > deadline:
+            return f"运行超过时限 {deadline:.0f} 秒 (媒体时长 {self.media_seconds:.0f} 秒)"
+        return None